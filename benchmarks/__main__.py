@@ -0,0 +1,183 @@
+"""
+Run the benchmarks without asv:
+
+    python -m benchmarks [--quick] [--filter REGEX] [--output results.json]
+                         [--compare baseline.json]
+
+Benchmarks follow asv's conventions: `time_*` methods are timed (best of
+`--repeat` calls) and `peakmem_*` methods report the peak memory allocated while
+they run, as traced by `tracemalloc`. Data is generated once per benchmark
+class, in a temporary directory. With `--compare`, results more than
+`--threshold` times slower or larger than the baseline are flagged.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import tracemalloc
+
+from . import bench_parsing, bench_runs
+
+MODULES = [bench_parsing, bench_runs]
+
+
+def iter_benchmark_classes():
+    for module in MODULES:
+        for name in dir(module):
+            cls = getattr(module, name)
+            if isinstance(cls, type) and cls.__module__ == module.__name__:
+                yield module.__name__.rsplit(".", 1)[-1], cls
+
+
+def parameter_sets(cls, quick=False):
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    if not isinstance(params, tuple):
+        params = (params,)
+    if quick:
+        params = tuple(values[:1] for values in params)
+    return list(itertools.product(*params))
+
+
+def measure(method, args, repeat):
+    if method.__name__.startswith("peakmem_"):
+        tracemalloc.start()
+        try:
+            method(*args)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        method(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(args):
+    pattern = re.compile(args.filter) if args.filter else None
+    results = []
+    for module_name, cls in iter_benchmark_classes():
+        methods = [
+            name
+            for name in dir(cls)
+            if name.startswith(("time_", "peakmem_"))
+            and (
+                pattern is None
+                or pattern.search(f"{module_name}.{cls.__name__}.{name}")
+            )
+        ]
+        if not methods:
+            continue
+
+        with tempfile.TemporaryDirectory(prefix="motevowrapper-bench-") as directory:
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                benchmark = cls()
+                cache = (
+                    benchmark.setup_cache()
+                    if hasattr(benchmark, "setup_cache")
+                    else None
+                )
+                prefix = (cache,) if hasattr(benchmark, "setup_cache") else ()
+                for name in methods:
+                    for params in parameter_sets(cls, args.quick):
+                        if hasattr(benchmark, "setup"):
+                            benchmark.setup(*prefix, *params)
+                        try:
+                            value = measure(
+                                getattr(benchmark, name), prefix + params, args.repeat
+                            )
+                        finally:
+                            if hasattr(benchmark, "teardown"):
+                                benchmark.teardown(*prefix, *params)
+                        result = {
+                            "benchmark": f"{module_name}.{cls.__name__}.{name}",
+                            "params": list(params),
+                            "unit": (
+                                "bytes" if name.startswith("peakmem_") else "seconds"
+                            ),
+                            "value": value,
+                        }
+                        print(format_result(result), flush=True)
+                        results.append(result)
+            finally:
+                os.chdir(cwd)
+    return results
+
+
+def format_result(result, baseline=None):
+    value = result["value"]
+    if result["unit"] == "bytes":
+        text = f"{value / 2 ** 20:10.1f} MiB"
+    else:
+        text = f"{value * 1000:10.2f} ms "
+    params = ", ".join(str(param) for param in result["params"])
+    line = f"{result['benchmark']}({params}) {text}"
+    if baseline is not None:
+        line += f"  {value / baseline:5.2f}x baseline"
+    return line
+
+
+def key(result):
+    return result["benchmark"], tuple(result["params"])
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {key(result): result["value"] for result in json.load(f)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(key(result))
+        if not previous:
+            continue
+        print(format_result(result, previous))
+        if result["value"] > previous * threshold:
+            regressions.append(result)
+
+    for result in regressions:
+        print(f"REGRESSION {format_result(result, baseline[key(result)])}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="only run the smallest parameters"
+    )
+    parser.add_argument(
+        "--filter", help="only run benchmarks matching this regular expression"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="calls per timing benchmark"
+    )
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare results to this JSON file")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="regression factor for --compare"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
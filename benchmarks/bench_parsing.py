@@ -0,0 +1,101 @@
+import os
+import shutil
+
+from motevowrapper.motevowrapper import parse_output_dir, parse_priors, parse_sites
+
+from .common import SIZES
+from .generators import write_priors, write_sites
+
+
+class ParseSites:
+    params = (SIZES, ["python", "columnar"])
+    param_names = ["nr_of_sites", "engine"]
+    timeout = 900
+
+    def setup_cache(self):
+        return {
+            size: os.path.abspath(write_sites(f"sites_{size}.wm", size))
+            for size in SIZES
+        }
+
+    def time_parse_sites(self, paths, size, engine):
+        parse_sites(paths[size], engine=engine)
+
+    def peakmem_parse_sites(self, paths, size, engine):
+        parse_sites(paths[size], engine=engine)
+
+    def time_parse_sites_filtered(self, paths, size, engine):
+        parse_sites(
+            paths[size],
+            engine=engine,
+            min_posterior=0.9,
+            species="danRer11",
+            columns=["reference_promoter", "posterior"],
+        )
+
+    def peakmem_parse_sites_filtered(self, paths, size, engine):
+        parse_sites(
+            paths[size],
+            engine=engine,
+            min_posterior=0.9,
+            species="danRer11",
+            columns=["reference_promoter", "posterior"],
+        )
+
+    def time_parse_sites_in_chunks(self, paths, size, engine):
+        for _ in parse_sites(paths[size], engine=engine, chunksize=100_000):
+            pass
+
+
+class ParsePriors:
+    params = [1, 100, 10_000]
+    param_names = ["nr_of_matrices"]
+
+    def setup_cache(self):
+        paths = {
+            n: os.path.abspath(write_priors(f"priors_{n}.wm", n)) for n in self.params
+        }
+        os.makedirs("priors_files", exist_ok=True)
+        paths["files"] = [
+            os.path.abspath(
+                write_priors(os.path.join("priors_files", f"priors_{i}.wm"), seed=i)
+            )
+            for i in range(1000)
+        ]
+        return paths
+
+    def time_parse_priors(self, paths, nr_of_matrices):
+        parse_priors(paths[nr_of_matrices])
+
+    def time_parse_priors_files(self, paths, nr_of_matrices):
+        # The many-files case doesn't depend on the parameter
+        if nr_of_matrices == 1:
+            parse_priors(paths["files"])
+
+
+class ParseOutputDir:
+    params = [1, 4]
+    param_names = ["jobs"]
+    timeout = 600
+
+    def setup_cache(self):
+        # A scan of 100 motifs with 10^4 sites each
+        output_dir = os.path.abspath("scan")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        for i in range(100):
+            directory = os.path.join(output_dir, f"MOTIF{i}")
+            os.makedirs(directory)
+            write_sites(
+                os.path.join(directory, f"sites_MOTIF{i}.wm"),
+                10_000,
+                f"MOTIF{i}",
+                seed=i,
+            )
+            write_priors(os.path.join(directory, f"priors_MOTIF{i}.wm"), seed=i)
+        return output_dir
+
+    def time_parse_output_dir(self, output_dir, jobs):
+        parse_output_dir(output_dir, jobs=jobs)
+
+    def peakmem_parse_output_dir(self, output_dir, jobs):
+        parse_output_dir(output_dir, jobs=jobs)
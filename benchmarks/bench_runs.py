@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+
+from motevowrapper.motevowrapper import run_motevo, run_motevo_many
+
+from .common import use_stubs
+from .generators import write_alignments, write_pwm_dir
+
+
+class RunMotevo:
+    """
+    Overhead of the wrapper around a single MotEvo run, with the stand-in
+    `motevo` which returns immediately.
+    """
+
+    params = [100, 1000]
+    param_names = ["nr_of_alignments"]
+    timeout = 600
+
+    def setup_cache(self):
+        paths = {
+            n: os.path.abspath(write_alignments(f"alignments_{n}.aln", n))
+            for n in self.params
+        }
+        paths["pwm_dir"] = os.path.abspath(write_pwm_dir("pwms", 32))
+        return paths
+
+    def setup(self, paths, nr_of_alignments):
+        use_stubs()
+        os.environ["MOTEVO_STUB_DELAY"] = "0"
+        self.working_directory = tempfile.mkdtemp(prefix="run_motevo_")
+
+    def teardown(self, paths, nr_of_alignments):
+        shutil.rmtree(self.working_directory, ignore_errors=True)
+
+    def time_run_motevo(self, paths, nr_of_alignments):
+        run_motevo(
+            paths[nr_of_alignments],
+            os.path.join(paths["pwm_dir"], "MOTIF0.wm"),
+            working_directory=self.working_directory,
+            refspecies="danRer11",
+        )
+
+    def time_run_motevo_prefiltered(self, paths, nr_of_alignments):
+        run_motevo(
+            paths[nr_of_alignments],
+            os.path.join(paths["pwm_dir"], "MOTIF0.wm"),
+            working_directory=self.working_directory,
+            refspecies="danRer11",
+            prefilter_score=15,
+        )
+
+
+class RunMotevoMany:
+    """
+    Fan-out of a scan of 32 PWMs over worker processes, with runs that take
+    0.1 seconds each.
+    """
+
+    params = [1, 4, 8]
+    param_names = ["jobs"]
+    timeout = 600
+
+    def setup_cache(self):
+        return {
+            "alignments": os.path.abspath(write_alignments("alignments.aln", 100)),
+            "pwm_dir": os.path.abspath(write_pwm_dir("pwms", 32)),
+        }
+
+    def setup(self, paths, jobs):
+        use_stubs()
+        os.environ["MOTEVO_STUB_DELAY"] = "0.1"
+        self.working_directory = tempfile.mkdtemp(prefix="run_motevo_many_")
+
+    def teardown(self, paths, jobs):
+        os.environ["MOTEVO_STUB_DELAY"] = "0"
+        shutil.rmtree(self.working_directory, ignore_errors=True)
+
+    def time_run_motevo_many(self, paths, jobs):
+        run_motevo_many(
+            paths["alignments"],
+            paths["pwm_dir"],
+            jobs=jobs,
+            working_directory=self.working_directory,
+            refspecies="danRer11",
+        )
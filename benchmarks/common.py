@@ -0,0 +1,18 @@
+import os
+
+# Directory of the `motevo` and `runUFE` stand-ins
+STUB_BIN = os.path.join(os.path.abspath(os.path.dirname(__file__)), "bin")
+
+# Data sizes, in sites; 10^7 sites take several GB and are only run on request
+SIZES = [10**4, 10**5, 10**6]
+if os.environ.get("MOTEVOWRAPPER_BENCH_LARGE"):
+    SIZES.append(10**7)
+
+
+def use_stubs():
+    """
+    Put the stand-in executables first on the PATH, so the wrapper runs them
+    instead of any installed MotEvo.
+    """
+    if not os.environ["PATH"].startswith(STUB_BIN + os.pathsep):
+        os.environ["PATH"] = STUB_BIN + os.pathsep + os.environ["PATH"]
@@ -0,0 +1,141 @@
+"""
+Generators of synthetic MotEvo inputs and outputs, in the formats of the fixtures
+in `motevowrapper/tests/data`, at any size.
+"""
+
+import os
+import numpy as np
+
+SPECIES = ("danRer11", "ictPun", "astMex", "pygNat", "esoLuc")
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+# Fixture REST matrix, used as the template of generated matrices
+REST_COUNTS = np.array(
+    [
+        [54, 7, 308, 38],
+        [21, 89, 263, 33],
+        [108, 226, 7, 67],
+        [32, 43, 292, 37],
+        [2, 397, 2, 6],
+        [5, 0, 0, 402],
+        [9, 36, 362, 0],
+        [16, 5, 25, 361],
+        [0, 401, 0, 6],
+        [1, 399, 0, 7],
+        [188, 40, 141, 35],
+        [76, 65, 39, 227],
+        [9, 4, 391, 3],
+        [0, 0, 408, 0],
+        [4, 0, 0, 403],
+        [19, 55, 312, 22],
+        [0, 395, 6, 6],
+        [3, 11, 0, 393],
+        [16, 6, 382, 4],
+        [319, 25, 59, 4],
+        [226, 104, 36, 40],
+    ]
+)
+
+
+def _promoter(rng, species, i):
+    strand = "+-"[rng.integers(2)]
+    start = rng.integers(1, 50_000_000)
+    return f"{species}_chr{i % 25 + 1}_{start}_{start + 1000}_{strand}"
+
+
+def _random_sequences(rng, nr_of_sequences, length):
+    codes = rng.integers(0, 4, size=(nr_of_sequences, length))
+    return [row.tobytes().decode("ascii") for row in BASES[codes]]
+
+
+def write_sites(path, nr_of_sites, motif="REST", nr_of_species=5, seed=0):
+    """
+    Write a sites file with `nr_of_sites` aligned sites. Each site header is
+    followed by the reference species line and, at random, lines of the other
+    species.
+    """
+    rng = np.random.default_rng(seed)
+    width = len(REST_COUNTS)
+    with open(path, "w") as f:
+        written = 0
+        promoter = None
+        while written < nr_of_sites:
+            batch = min(nr_of_sites - written, 100_000)
+            lines = []
+            sequences = _random_sequences(rng, batch, width)
+            scores = rng.uniform(0, 25, size=batch)
+            i = 0
+            while i < batch:
+                if promoter is None or rng.random() < 0.3:
+                    promoter = _promoter(rng, SPECIES[0], written + i)
+                start = rng.integers(0, 1000 - width)
+                aligned = min(int(rng.integers(1, nr_of_species + 1)), batch - i)
+                lines.append(
+                    f"{start}-{start + width - 1} {'+-'[rng.integers(2)]} "
+                    f"{rng.random():.6g} {motif} {promoter}\n"
+                )
+                for j in range(aligned):
+                    name = promoter if j == 0 else _promoter(rng, SPECIES[j], i)
+                    lines.append(f"{sequences[i]} {scores[i]:.6g} {name}\n")
+                    i += 1
+            f.writelines(lines)
+            written += batch
+    return path
+
+
+def write_priors(path, nr_of_matrices=1, ufe=True, seed=0):
+    """
+    Write a priors file with `nr_of_matrices` weight matrix rows, followed by
+    the background and, when `ufe` is set, the UFE rows.
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as f:
+        f.write("WM_name final_prior nr_of_sites density\n")
+        for i in range(nr_of_matrices):
+            f.write(
+                f"MOTIF{i} {rng.uniform(0, 0.01):.6g} {rng.uniform(0, 100):.6g} "
+                f"{rng.uniform(0, 0.05):.6g}\n"
+            )
+        f.write("background 0.828626 1875.85 0.187155\n")
+        if ufe:
+            f.write("UFEwm 0.168265 380.919 0.798095\n")
+    return path
+
+
+def write_alignments(path, nr_of_blocks, length=1000, nr_of_species=5, seed=0):
+    """
+    Write an alignments file of `nr_of_blocks` blocks: a `>>` reference species
+    record and up to `nr_of_species - 1` aligned records with gaps, each of
+    `length` columns.
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as f:
+        for i in range(nr_of_blocks):
+            aligned = int(rng.integers(1, nr_of_species + 1))
+            sequences = _random_sequences(rng, aligned, length)
+            f.write(f">>{_promoter(rng, SPECIES[0], i)}\n{sequences[0]}\n")
+            for j in range(1, aligned):
+                gapped = np.frombuffer(sequences[j].encode("ascii"), dtype=np.uint8)
+                gapped = np.where(rng.random(length) < 0.2, ord("-"), gapped)
+                f.write(
+                    f">{_promoter(rng, SPECIES[j], i)}\n"
+                    f"{gapped.astype(np.uint8).tobytes().decode('ascii')}\n"
+                )
+    return path
+
+
+def write_pwm_dir(path, nr_of_pwms, seed=0):
+    """
+    Write `nr_of_pwms` PWM files, shuffled versions of the REST matrix, to the
+    directory `path`.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+    for i in range(nr_of_pwms):
+        counts = rng.permuted(REST_COUNTS, axis=1)
+        with open(os.path.join(path, f"MOTIF{i}.wm"), "w") as f:
+            f.write(f"//\nNA  MOTIF{i}\nP0  A  C  G  T\n")
+            for j, row in enumerate(counts, start=1):
+                f.write(f"{j:02d}  {'  '.join(str(value) for value in row)}\n")
+            f.write("//\n")
+    return path
@@ -1,4 +1,6 @@
-from motevowrapper import print_help
+import sys
+
+from motevowrapper.cli import main
 
 if __name__ == "__main__":
-    print_help()
+    sys.exit(main())
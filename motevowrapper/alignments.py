@@ -0,0 +1,211 @@
+import os
+import mmap
+import numpy as np
+
+
+def species_of(name):
+    """
+    Species of a promoter or alignment record, the assembly prefix of its name,
+    e.g. "danRer11" for "danRer11_chr21_11468142_11469142_+".
+    """
+    return name.partition("_")[0]
+
+
+class AlignmentFile:
+    """
+    Memory-mapped MotEvo sequences or alignments file (`>` headers followed by
+    sequence lines) with a byte-offset index of its records.
+
+    Records are grouped into alignment blocks, which start at reference species
+    headers (`>>`), or at every header when the file has no reference species
+    headers. Blocks are addressed by position or by the promoter ID of their
+    first record, and any record by its ID. Blocks and records are returned as
+    bytes copied out of the mapping; `write` copies ranges of blocks from the
+    mapping to a file without decoding them, merging adjacent blocks into a single
+    write.
+
+    Building the index reads the headers only once, so opening a file costs one
+    pass over it and later subsets are served from the page cache or the disk
+    without parsing again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # Empty files can't be memory-mapped
+            self._data = b""
+        self._index()
+
+    def _index(self):
+        data = self._data
+        size = len(data)
+
+        starts = []
+        sequence_starts = []
+        names = []
+        position = 0 if data[:1] == b">" else data.find(b"\n>")
+        if position > 0:
+            position += 1
+        while position != -1:
+            header_end = data.find(b"\n", position)
+            if header_end == -1:
+                header_end = size
+            header = data[position:header_end].lstrip(b">").split()
+            starts.append(position)
+            sequence_starts.append(min(header_end + 1, size))
+            names.append(header[0].decode("ascii") if header else "")
+
+            position = data.find(b"\n>", header_end)
+            if position != -1:
+                position += 1
+
+        self.names = names
+        self._starts = np.array(starts + [size], dtype=np.int64)
+        self._sequence_starts = np.array(sequence_starts, dtype=np.int64)
+        self._by_name = {}
+        for i, name in enumerate(names):
+            self._by_name.setdefault(name, i)
+
+        # Blocks start at `>>` headers when the first header is one
+        if starts and data[starts[0] : starts[0] + 2] == b">>":
+            block_records = [
+                i
+                for i, start in enumerate(starts)
+                if data[start + 1 : start + 2] == b">"
+            ]
+        else:
+            block_records = list(range(len(starts)))
+        self._block_records = np.array(block_records + [len(starts)], dtype=np.int64)
+        self._blocks = {names[i]: block for block, i in enumerate(block_records)}
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._block_records) - 1
+
+    def __repr__(self):
+        return (
+            f"AlignmentFile({self.path!r}, {len(self)} blocks, "
+            f"{len(self.names)} records)"
+        )
+
+    @property
+    def nr_of_records(self):
+        return len(self.names)
+
+    @property
+    def block_ids(self):
+        """
+        Promoter IDs of the first (reference) record of each block.
+        """
+        return [self.names[i] for i in self._block_records[:-1]]
+
+    def species(self):
+        """
+        Sorted species names of all records, see `species_of`.
+        """
+        return sorted({species_of(name) for name in self.names})
+
+    def records(self, species=None):
+        """
+        IDs of all records, or of the records of the given species.
+        """
+        if species is None:
+            return list(self.names)
+        if isinstance(species, str):
+            species = [species]
+        species = set(species)
+        return [name for name in self.names if species_of(name) in species]
+
+    def block_index(self, key):
+        """
+        Position of the block at position `key` or with the promoter ID `key`.
+        """
+        if isinstance(key, str):
+            return self._blocks[key]
+        if not -len(self) <= key < len(self):
+            raise IndexError(f"Block {key} out of range")
+        return key % len(self)
+
+    def block_range(self, key):
+        """
+        Byte range `(start, end)` of a block in the file.
+        """
+        i = self.block_index(key)
+        records = self._block_records
+        return int(self._starts[records[i]]), int(self._starts[records[i + 1]])
+
+    def __getitem__(self, key):
+        start, end = self.block_range(key)
+        return self._data[start:end]
+
+    def __contains__(self, promoter_id):
+        return promoter_id in self._blocks
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def iter_blocks(self):
+        """
+        Yield `(promoter_id, block)` pairs in file order.
+        """
+        for promoter_id, i in zip(self.block_ids, range(len(self))):
+            yield promoter_id, self[i]
+
+    def record(self, name):
+        """
+        The header and sequence lines of the record with ID `name`.
+        """
+        i = self._by_name[name]
+        return self._data[self._starts[i] : self._starts[i + 1]]
+
+    def sequence(self, name):
+        """
+        Sequence of the record with ID `name`, without line breaks.
+        """
+        i = self._by_name[name]
+        return self._sequence(i)
+
+    def _sequence(self, i):
+        sequence = self._data[self._sequence_starts[i] : self._starts[i + 1]]
+        return sequence.translate(None, b"\r\n")
+
+    def reference_sequence(self, key):
+        """
+        Sequence of the first (reference) record of a block.
+        """
+        return self._sequence(self._block_records[self.block_index(key)])
+
+    def write(self, path, blocks):
+        """
+        Write the given blocks (positions or promoter IDs), in the given order, to
+        `path`. Runs of consecutive blocks are copied from the mapping in one
+        write. Returns `path`.
+        """
+        ranges = []
+        for key in blocks:
+            start, end = self.block_range(key)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+
+        with open(path, "wb") as f:
+            if isinstance(self._data, mmap.mmap):
+                with memoryview(self._data) as view:
+                    for start, end in ranges:
+                        f.write(view[start:end])
+        return path
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import uuid
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Digests of files already hashed by this process, keyed by path, size and mtime
+_digests = {}
+
+
+def default_cache_directory():
+    """
+    Directory for persistent caches: `$MOTEVOWRAPPER_CACHE_DIR` when set, otherwise
+    `~/.cache/motevowrapper`.
+    """
+    return os.environ.get(
+        "MOTEVOWRAPPER_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "motevowrapper"),
+    )
+
+
+def temporary_path(path):
+    """
+    Unique temporary path in the directory of `path`, for atomic replacement.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+
+def write_atomic(path, data):
+    """
+    Write `data` (bytes) to `path` through a temporary file in the same directory,
+    so readers see either the old file or the complete new one.
+    """
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def copy_atomic(source, destination):
+    """
+    Copy `source` to `destination` through a temporary file, see `write_atomic`.
+    """
+    tmp_path = temporary_path(destination)
+    try:
+        with open(tmp_path, "xb") as f, open(source, "rb") as g:
+            shutil.copyfileobj(g, f)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    SHA-256 hex digest of the contents of the file at `path`. Digests are
+    remembered for as long as the file's size and modification time don't change.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        _digests[memo_key] = digest.hexdigest()
+    return _digests[memo_key]
+
+
+def run_key(sequences_file, wm_path, parameters, UFEwmfile=None):
+    """
+    Cache key of a MotEvo run: a hash of the contents of the sequences, PWM and
+    UFE model files, and of the text of the generated parameters file.
+    """
+    digest = hashlib.sha256()
+    for path in (sequences_file, wm_path, UFEwmfile):
+        digest.update((file_digest(path) if path else "-").encode("utf-8"))
+    digest.update(parameters.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def normalize_newick(tree):
+    """
+    Strip the whitespace that Newick allows between tokens, so equivalent tree
+    strings compare equal.
+    """
+    return "".join(tree.split())
+
+
+def ufe_key(tree, bg_A, bg_C, bg_G, bg_T):
+    """
+    Cache key of a UFE model, which only depends on the tree and the background.
+    """
+    background = " ".join(repr(float(value)) for value in (bg_A, bg_C, bg_G, bg_T))
+    text = f"{normalize_newick(tree)}\n{background}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of MotEvo sites and priors files, keyed by `run_key`.
+
+    Each entry is a directory named after its key. Entries are used in least
+    recently used order: when `max_size` (in bytes) is set, the least recently
+    used entries are evicted whenever a new entry makes the cache exceed it.
+    """
+
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_entry(self, key):
+        try:
+            with open(os.path.join(self._entry_path(key), "entry.json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        """
+        Return the cached `(sites_file, priors_file)` of `key`, or None on a miss.
+        """
+        entry = self._read_entry(key)
+        if entry is None:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted in the meantime
+            return None
+        return (os.path.join(path, entry["sites"]), os.path.join(path, entry["priors"]))
+
+    def put(self, key, sites_file, priors_file):
+        """
+        Copy a sites and priors file into the cache under `key` and return their
+        paths in the cache.
+        """
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.directory)
+        try:
+            entry = {
+                "sites": os.path.basename(sites_file),
+                "priors": os.path.basename(priors_file),
+                "created": time.time(),
+            }
+            shutil.copyfile(sites_file, os.path.join(staging, entry["sites"]))
+            shutil.copyfile(priors_file, os.path.join(staging, entry["priors"]))
+            with open(os.path.join(staging, "entry.json"), "w") as f:
+                json.dump(entry, f)
+
+            # Publish the entry atomically. If another process cached the same
+            # run in the meantime, its entry is kept.
+            try:
+                os.rename(staging, self._entry_path(key))
+            except OSError:
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        if self.max_size is not None:
+            self.evict(keep=key)
+        return self.get(key)
+
+    def entries(self):
+        """
+        Data frame with one row per cache entry, least recently used first.
+        """
+        rows = []
+        for key in os.listdir(self.directory):
+            if key.startswith("."):
+                continue
+            entry = self._read_entry(key)
+            if entry is None:
+                continue
+            path = self._entry_path(key)
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(path, name))
+                    for name in os.listdir(path)
+                )
+                last_used = os.path.getmtime(path)
+            except OSError:
+                continue
+            rows.append(
+                {
+                    "key": key,
+                    "sites": os.path.join(path, entry["sites"]),
+                    "priors": os.path.join(path, entry["priors"]),
+                    "size": size,
+                    "created": pd.to_datetime(entry["created"], unit="s"),
+                    "last_used": pd.to_datetime(last_used, unit="s"),
+                }
+            )
+
+        columns = ["key", "sites", "priors", "size", "created", "last_used"]
+        df = pd.DataFrame(rows, columns=columns)
+        return df.sort_values("last_used").reset_index(drop=True)
+
+    def size(self):
+        return int(self.entries()["size"].sum())
+
+    def purge(self, keys=None):
+        """
+        Remove the entries with the given keys, or all entries when `keys` is None.
+        """
+        if keys is None:
+            keys = list(self.entries()["key"])
+        for key in keys:
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits in `max_size`.
+        """
+        if self.max_size is None:
+            return
+
+        entries = self.entries()
+        total = entries["size"].sum()
+        for row in entries.itertuples(index=False):
+            if total <= self.max_size:
+                break
+            if row.key == keep:
+                continue
+            logger.info(f"Evicting MotEvo result {row.key} from the cache.")
+            self.purge([row.key])
+            total -= row.size
@@ -0,0 +1,534 @@
+"""
+Command-line interface of motevowrapper:
+
+    motevowrapper scan --sequences alignments.aln --pwm-dir pwms/ --jobs 16 \
+        --out sites.parquet -p refspecies=danRer11 -p bgprior=0.8
+    motevowrapper parse scan/ --out sites.tsv --jobs 8
+    motevowrapper ufe tree_file --out UFE_model
+    motevowrapper submit spool/ --sequences alignments.aln --pwm-dir pwms/ \
+        -p refspecies=danRer11
+    motevowrapper worker spool/ --workers 8 --scratch /tmp
+
+`scan` runs MotEvo for every PWM of a directory on a pool of worker processes
+and streams the sites and priors of each motif into a single output table as
+its run finishes. Finished motifs are recorded in a journal next to the output,
+so an interrupted scan continues where it stopped with `--resume`.
+
+`submit` and `worker` spread a scan over several nodes through a job spool on a
+shared filesystem, see `motevowrapper.spool`.
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+
+import pandas as pd
+
+from motevowrapper._version import version
+from motevowrapper.metrics import JSONLinesWriter
+from motevowrapper.motevowrapper import (
+    MOTEVO_PARAMETERS,
+    _CATEGORICAL_SITES_COLUMNS,
+    _columnar_frame,
+    _new_columnar_buffers,
+    _resolve_inputs,
+    check_installation,
+    find_executable,
+    iter_motevo_many,
+    parse_output_dir,
+    parse_priors,
+    parse_sites,
+    run_ufe,
+)
+from motevowrapper.retry import RetryPolicy
+from motevowrapper.spool import JobSpool, run_worker, start_workers
+from motevowrapper.ufe import check_ufe_model
+
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = {".tsv": "tsv", ".txt": "tsv", ".parquet": "parquet", ".pq": "parquet"}
+
+
+def output_format(path):
+    """
+    Format of the output file at `path`, from its extension.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format of {path!r}, use one of {list(OUTPUT_FORMATS)}"
+        )
+    return OUTPUT_FORMATS[extension]
+
+
+def priors_output_path(path):
+    """
+    Default path of the priors table written next to the sites table at `path`.
+    """
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_priors{extension}"
+
+
+def _plain(df):
+    """
+    `df` with categorical columns turned into strings, so tables of all motifs
+    share one schema.
+    """
+    return df.astype(
+        {
+            column: str
+            for column, dtype in df.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+        }
+    )
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exp:
+        raise ImportError(
+            "Parquet output needs pyarrow. Install it with "
+            "`pip install motevowrapper[arrow]`."
+        ) from exp
+    return pyarrow, pyarrow.parquet
+
+
+class TableWriter:
+    """
+    Write data frames with the same columns to a TSV or Parquet file, one after
+    the other, so tables larger than memory are written as they are produced.
+    Parquet files get a row group per data frame and need pyarrow.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = output_format(path)
+        self.writer = None
+        self.empty = None
+        self.rows = 0
+        if self.format == "tsv":
+            self.writer = open(path, "w")
+        else:
+            self.pyarrow, self.parquet = _import_pyarrow()
+
+    def write(self, df):
+        df = _plain(df)
+        if self.format == "tsv":
+            df.to_csv(
+                self.writer, sep="\t", index=False, header=self.writer.tell() == 0
+            )
+            self.writer.flush()
+        elif len(df):
+            table = self._table(df)
+            if self.writer is None:
+                self.writer = self.parquet.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table.cast(self.writer.schema))
+        else:
+            # Columns of empty frames have no type to write yet
+            self.empty = df
+        self.rows += len(df)
+
+    def _table(self, df):
+        table = self.pyarrow.Table.from_pandas(df, preserve_index=False)
+        if not len(df):
+            # Without values, text columns would get pyarrow's null type
+            table = table.cast(
+                self.pyarrow.schema(
+                    (
+                        self.pyarrow.field(field.name, self.pyarrow.string())
+                        if self.pyarrow.types.is_null(field.type)
+                        else field
+                    )
+                    for field in table.schema
+                )
+            )
+        return table
+
+    def close(self):
+        if self.writer is None and self.empty is not None:
+            self.parquet.write_table(self._table(self.empty), self.path)
+        if self.writer is not None:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_value(text):
+    """
+    Value of a `NAME=VALUE` parameter: an int or a float when it reads as one,
+    otherwise the text itself.
+    """
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_parameters(pairs):
+    """
+    MotEvo parameters from `NAME=VALUE` strings.
+    """
+    parameters = {}
+    for pair in pairs or []:
+        name, separator, value = pair.partition("=")
+        if not separator:
+            raise ValueError(f"Parameters are given as NAME=VALUE, got {pair!r}")
+        if name not in MOTEVO_PARAMETERS:
+            raise ValueError(f"Unknown MotEvo parameter {name!r}")
+        parameters[name] = parse_value(value)
+    return parameters
+
+
+def read_journal(path):
+    """
+    Motifs recorded as finished in the journal at `path`, mapping motif names to
+    their `(sites_file, priors_file)`, in the order they finished.
+    """
+    finished = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short when the scan was interrupted
+                    continue
+                finished[entry["motif"]] = (entry["sites_file"], entry["priors_file"])
+    return finished
+
+
+def _motif_tables(motif, sites_file, priors_file, min_posterior=None):
+    if not (os.path.exists(sites_file) and os.path.exists(priors_file)):
+        return None
+    sites = parse_sites(sites_file, engine="columnar", min_posterior=min_posterior)
+    priors = parse_priors(priors_file)
+    if priors is None:
+        return None
+    sites.insert(0, "pwm", motif)
+    priors.insert(0, "pwm", motif)
+    return sites, priors
+
+
+def scan(args):
+    # Input files are given relative to the current directory, not to the
+    # working directory the runs resolve them against
+    sequences_file, parameters = _resolve_inputs(
+        args.sequences, parse_parameters(args.param), "./"
+    )
+    sites_path = args.out
+    priors_path = args.priors_out or priors_output_path(sites_path)
+    journal_path = f"{sites_path}.journal"
+    for path in (sites_path, priors_path):
+        output_format(path)
+
+    finished = read_journal(journal_path) if args.resume else {}
+    if finished:
+        logger.info(f"Resuming scan, {len(finished)} motifs already finished.")
+
+    retry = None
+    if args.retries or args.timeout:
+        retry = RetryPolicy(max_attempts=args.retries + 1, timeout=args.timeout)
+    if args.metrics:
+        parameters["on_metrics"] = JSONLinesWriter(args.metrics)
+
+    os.makedirs(args.working_directory, exist_ok=True)
+    failed = []
+    with TableWriter(sites_path) as sites_writer, TableWriter(
+        priors_path
+    ) as priors_writer, open(journal_path, "w") as journal:
+
+        def publish(motif, sites_file, priors_file):
+            tables = _motif_tables(motif, sites_file, priors_file, args.min_posterior)
+            if tables is None:
+                logger.error(f"MotEvo run of {motif} failed.")
+                failed.append(motif)
+                return
+            sites_writer.write(tables[0])
+            priors_writer.write(tables[1])
+            journal.write(
+                json.dumps(
+                    {
+                        "motif": motif,
+                        "sites_file": sites_file,
+                        "priors_file": priors_file,
+                    }
+                )
+                + "\n"
+            )
+            journal.flush()
+
+        # Outputs are rewritten in full, starting with the motifs already done
+        for motif, (sites_file, priors_file) in finished.items():
+            publish(motif, sites_file, priors_file)
+
+        runs = iter_motevo_many(
+            sequences_file,
+            os.path.abspath(args.pwm_dir),
+            jobs=args.jobs,
+            working_directory=args.working_directory,
+            motifs=None if not finished else _remaining(args.pwm_dir, finished),
+            prefilter_score=args.prefilter_score,
+            retry=retry,
+            **parameters,
+        )
+        for motif, (sites_file, priors_file) in runs:
+            publish(motif, sites_file, priors_file)
+            logger.info(f"Finished {motif}.")
+
+    if failed:
+        logger.error(f"{len(failed)} motifs failed: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+def _remaining(pwm_dir, finished):
+    return [
+        os.path.splitext(name)[0]
+        for name in os.listdir(pwm_dir)
+        if os.path.splitext(name)[0] not in finished
+    ]
+
+
+def parse(args):
+    if os.path.isdir(args.path):
+        sites, priors = parse_output_dir(
+            args.path, jobs=args.jobs, min_posterior=args.min_posterior
+        )
+        with TableWriter(args.out) as writer:
+            writer.write(sites)
+        with TableWriter(args.priors_out or priors_output_path(args.out)) as writer:
+            writer.write(priors)
+    elif args.priors:
+        df = parse_priors(args.path)
+        if df is None:
+            return 1
+        with TableWriter(args.out) as writer:
+            writer.write(df)
+    else:
+        # Sites files are read and written in chunks
+        with TableWriter(args.out) as writer:
+            for df in parse_sites(
+                args.path,
+                chunksize=args.chunksize,
+                engine="columnar",
+                min_posterior=args.min_posterior,
+            ):
+                writer.write(df)
+            if not writer.rows:
+                # Nothing was parsed, the table still gets the columns
+                writer.write(_empty_sites())
+    return 0
+
+
+def _empty_sites():
+    return _columnar_frame(
+        _new_columnar_buffers(), {column: {} for column in _CATEGORICAL_SITES_COLUMNS}
+    )
+
+
+def ufe(args):
+    output_path = run_ufe(
+        args.tree, *args.background, output_path=args.out, use_cache=not args.no_cache
+    )
+    check_ufe_model(output_path, cache=False)
+    print(output_path)
+    return 0
+
+
+def check(args):
+    check_installation()
+    return 0 if find_executable("motevo") and find_executable("runUFE") else 1
+
+
+def submit(args):
+    spool = JobSpool(args.spool)
+    job_ids = spool.submit_many(
+        args.sequences, args.pwm_dir, **parse_parameters(args.param)
+    )
+    logger.info(f"Submitted {len(job_ids)} jobs: {spool.status()}")
+    return 0
+
+
+def worker(args):
+    options = dict(
+        scratch_directory=args.scratch,
+        poll_interval=args.poll_interval,
+        exit_when_idle=not args.keep_running,
+        lease_timeout=args.lease_timeout,
+        max_attempts=args.max_attempts,
+    )
+    if args.workers == 1:
+        run_worker(args.spool, **options)
+    else:
+        for process in start_workers(args.spool, args.workers, **options):
+            process.join()
+    status = JobSpool(args.spool).status()
+    logger.info(f"Spool status: {status}")
+    return 1 if status["failed"] else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="motevowrapper", description="Run MotEvo and parse its outputs."
+    )
+    parser.add_argument("--version", action="version", version=version)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-v", "--verbose", action="store_true", help="log progress")
+    commands = parser.add_subparsers(dest="command")
+
+    parser_scan = commands.add_parser(
+        "scan", parents=[common], help="scan alignments with every PWM of a directory"
+    )
+    parser_scan.add_argument("--sequences", required=True, help="alignments file")
+    parser_scan.add_argument("--pwm-dir", required=True, help="directory of PWMs")
+    parser_scan.add_argument(
+        "--out", required=True, help="sites table (.tsv or .parquet)"
+    )
+    parser_scan.add_argument(
+        "--priors-out", help="priors table (default: <out>_priors.<extension>)"
+    )
+    parser_scan.add_argument("-j", "--jobs", type=int, help="worker processes")
+    parser_scan.add_argument(
+        "-w",
+        "--working-directory",
+        default="./",
+        help="directory of the per-motif MotEvo runs",
+    )
+    parser_scan.add_argument(
+        "-p",
+        "--param",
+        action="append",
+        metavar="NAME=VALUE",
+        help="MotEvo parameter, e.g. refspecies=danRer11 (repeatable)",
+    )
+    parser_scan.add_argument(
+        "--resume", action="store_true", help="skip motifs finished by an earlier scan"
+    )
+    parser_scan.add_argument(
+        "--min-posterior", type=float, help="only write sites with this posterior"
+    )
+    parser_scan.add_argument(
+        "--prefilter-score", type=float, help="see `run_motevo`'s prefilter_score"
+    )
+    parser_scan.add_argument(
+        "--retries", type=int, default=0, help="retries of failed runs"
+    )
+    parser_scan.add_argument("--timeout", type=float, help="seconds per attempt")
+    parser_scan.add_argument("--metrics", help="JSON-lines file of run metrics")
+    parser_scan.set_defaults(function=scan)
+
+    parser_parse = commands.add_parser(
+        "parse",
+        parents=[common],
+        help="convert MotEvo outputs to a TSV or Parquet table",
+    )
+    parser_parse.add_argument(
+        "path", help="sites file, priors file or directory of MotEvo outputs"
+    )
+    parser_parse.add_argument(
+        "--out", required=True, help="output table (.tsv or .parquet)"
+    )
+    parser_parse.add_argument(
+        "--priors-out", help="priors table of a directory (default: <out>_priors)"
+    )
+    parser_parse.add_argument(
+        "--priors", action="store_true", help="the file is a priors file"
+    )
+    parser_parse.add_argument("-j", "--jobs", type=int, help="worker processes")
+    parser_parse.add_argument(
+        "--min-posterior", type=float, help="only write sites with this posterior"
+    )
+    parser_parse.add_argument(
+        "--chunksize", type=int, default=1_000_000, help="sites per chunk"
+    )
+    parser_parse.set_defaults(function=parse)
+
+    parser_ufe = commands.add_parser(
+        "ufe", parents=[common], help="generate a UFE model with runUFE"
+    )
+    parser_ufe.add_argument("tree", help="phylogenetic tree file")
+    parser_ufe.add_argument(
+        "--background",
+        nargs=4,
+        type=float,
+        default=[0.25, 0.25, 0.25, 0.25],
+        metavar=("A", "C", "G", "T"),
+        help="background probabilities",
+    )
+    parser_ufe.add_argument("--out", help="model path (default: UFE_model)")
+    parser_ufe.add_argument("--no-cache", action="store_true", help="always run runUFE")
+    parser_ufe.set_defaults(function=ufe)
+
+    parser_submit = commands.add_parser(
+        "submit", parents=[common], help="add a job per PWM to a job spool"
+    )
+    parser_submit.add_argument("spool", help="spool directory on a shared filesystem")
+    parser_submit.add_argument("--sequences", required=True, help="alignments file")
+    parser_submit.add_argument("--pwm-dir", required=True, help="directory of PWMs")
+    parser_submit.add_argument(
+        "-p",
+        "--param",
+        action="append",
+        metavar="NAME=VALUE",
+        help="MotEvo parameter, e.g. refspecies=danRer11 (repeatable)",
+    )
+    parser_submit.set_defaults(function=submit)
+
+    parser_worker = commands.add_parser(
+        "worker", parents=[common], help="run jobs from a job spool"
+    )
+    parser_worker.add_argument("spool", help="spool directory on a shared filesystem")
+    parser_worker.add_argument(
+        "-n", "--workers", type=int, default=1, help="worker processes"
+    )
+    parser_worker.add_argument("--scratch", help="directory of the MotEvo runs")
+    parser_worker.add_argument(
+        "--poll-interval", type=float, default=5, help="seconds between checks"
+    )
+    parser_worker.add_argument(
+        "--keep-running", action="store_true", help="wait for new jobs when idle"
+    )
+    parser_worker.add_argument(
+        "--lease-timeout", type=float, default=600, help="seconds before reclaiming"
+    )
+    parser_worker.add_argument(
+        "--max-attempts", type=int, default=3, help="attempts before a job fails"
+    )
+    parser_worker.set_defaults(function=worker)
+
+    parser_check = commands.add_parser(
+        "check", parents=[common], help="check the MotEvo installation"
+    )
+    parser_check.set_defaults(function=check)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if getattr(args, "verbose", False) else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    if args.command is None:
+        parser.print_help()
+        return 0
+    try:
+        return args.function(args)
+    except (ValueError, FileNotFoundError, ImportError) as exp:
+        parser.exit(2, f"motevowrapper: error: {exp}\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import logging
+import contextlib
+from collections import namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# Measurements of a single MotEvo or runUFE run, over all of its attempts.
+# `timings` maps phases ("prefilter", "parameters", "process" and "total") to
+# seconds. `user_time` and `system_time` are the CPU seconds of the child process
+# and `max_rss` its peak resident set size in bytes; they are None when the
+# platform or runner can't measure them. Sizes are in bytes, `input_size` being
+# the sequences and PWM files (or the tree file) and `output_size` the sites and
+# priors files (or the UFE model). `nr_of_sites` is the number of sites found.
+RunMetrics = namedtuple(
+    "RunMetrics",
+    [
+        "program",
+        "name",
+        "succeeded",
+        "attempts",
+        "timings",
+        "user_time",
+        "system_time",
+        "max_rss",
+        "input_size",
+        "output_size",
+        "nr_of_sites",
+    ],
+)
+
+# `ru_maxrss` is in kilobytes, except on macOS
+_MAX_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def child_usage(usages):
+    """
+    `(user_time, system_time, max_rss)` of child processes from their
+    `resource.struct_rusage` records: CPU times are summed and the peak resident
+    set size, in bytes, is the largest of all. All None when there are no records.
+    """
+    if not usages:
+        return None, None, None
+    return (
+        sum(usage.ru_utime for usage in usages),
+        sum(usage.ru_stime for usage in usages),
+        max(usage.ru_maxrss for usage in usages) * _MAX_RSS_UNIT,
+    )
+
+
+def file_size(*paths):
+    """
+    Total size in bytes of the files at `paths` that exist.
+    """
+    return sum(os.path.getsize(path) for path in paths if path and os.path.isfile(path))
+
+
+def count_sites(path):
+    """
+    Number of sites in a MotEvo sites file, counting site header lines.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line[:1].isdigit())
+
+
+def emit(hook, metrics):
+    """
+    Send `metrics` to `hook`: a callable, or a list of callables. A failing hook
+    is logged and never fails the run it measured.
+    """
+    if hook is None:
+        return
+    for callback in hook if isinstance(hook, (list, tuple)) else [hook]:
+        try:
+            callback(metrics)
+        except Exception as exp:
+            logger.error(f"Metrics hook {callback!r} failed: {exp}")
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """
+    Hold an exclusive lock on `path`.lock, so writers in several worker processes
+    don't interleave. Without `fcntl`, nothing is locked.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class JSONLinesWriter:
+    """
+    Metrics hook appending each run's metrics as a JSON object on its own line
+    of the file at `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return f"JSONLinesWriter({self.path!r})"
+
+    def __call__(self, metrics):
+        line = json.dumps(metrics._asdict()) + "\n"
+        with _locked(self.path), open(self.path, "a") as f:
+            f.write(line)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PrometheusTextfile:
+    """
+    Metrics hook keeping a file at `path` in the Prometheus text format, for the
+    node exporter's textfile collector. The file holds gauges of the latest run
+    of each program and name; it is rewritten atomically after every run.
+    """
+
+    prefix = "motevowrapper_run"
+
+    help = {
+        "seconds": "Seconds spent in each phase of the latest run.",
+        "cpu_seconds": "CPU seconds used by the child process of the latest run.",
+        "max_rss_bytes": "Peak resident set size of the child process.",
+        "input_bytes": "Size of the input files of the latest run.",
+        "output_bytes": "Size of the output files of the latest run.",
+        "sites": "Number of sites found by the latest run.",
+        "attempts": "Attempts made by the latest run.",
+        "succeeded": "Whether the latest run succeeded.",
+    }
+
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return f"PrometheusTextfile({self.path!r})"
+
+    def samples(self, metrics):
+        """
+        `(metric, labels, value)` samples of `metrics`.
+        """
+        labels = f'program="{_label(metrics.program)}",name="{_label(metrics.name)}"'
+        for phase, seconds in metrics.timings.items():
+            yield "seconds", f'{labels},phase="{phase}"', seconds
+        for mode, seconds in (
+            ("user", metrics.user_time),
+            ("system", metrics.system_time),
+        ):
+            yield "cpu_seconds", f'{labels},mode="{mode}"', seconds
+        yield "max_rss_bytes", labels, metrics.max_rss
+        yield "input_bytes", labels, metrics.input_size
+        yield "output_bytes", labels, metrics.output_size
+        yield "sites", labels, metrics.nr_of_sites
+        yield "attempts", labels, metrics.attempts
+        yield "succeeded", labels, int(metrics.succeeded)
+
+    def read(self):
+        """
+        Samples of the file, as a dictionary mapping `metric{labels}` to values.
+        """
+        samples = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip() and not line.startswith("#"):
+                        sample, value = line.rsplit(" ", 1)
+                        samples[sample] = value.strip()
+        return samples
+
+    def __call__(self, metrics):
+        with _locked(self.path):
+            samples = self.read()
+            for metric, labels, value in self.samples(metrics):
+                if value is not None:
+                    samples[f"{self.prefix}_{metric}{{{labels}}}"] = repr(float(value))
+
+            lines = []
+            for metric, text in self.help.items():
+                name = f"{self.prefix}_{metric}"
+                matching = sorted(s for s in samples if s.startswith(name + "{"))
+                if matching:
+                    lines.append(f"# HELP {name} {text}\n# TYPE {name} gauge\n")
+                    lines.extend(f"{s} {samples[s]}\n" for s in matching)
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(lines)
+            os.replace(tmp_path, self.path)
@@ -1,25 +1,68 @@
+import io
 import os
 import re
+import json
+import hashlib
+import functools
+import itertools
+import time
+import threading
+import contextlib
+import shutil
+import asyncio
 import logging
 import subprocess
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+from pandas.api.types import union_categoricals
+
+from motevowrapper.alignments import AlignmentFile, species_of
+from motevowrapper.metrics import RunMetrics, child_usage, count_sites, emit, file_size
+from motevowrapper.cache import (
+    ResultCache,
+    copy_atomic,
+    default_cache_directory,
+    run_key,
+    temporary_path,
+    ufe_key,
+    write_atomic,
+)
+from motevowrapper.pwm import (
+    PWM,
+    PWMLibrary,
+    encode,
+    log_odds,
+    max_score,
+    read_pwms,
+    write_pwm,
+)
+from motevowrapper.retry import Attempt, RetryPolicy
+from motevowrapper.sidecar import (
+    SIDECAR_FORMATS,
+    read_sidecar,
+    source_metadata,
+    write_sidecar,
+)
+from motevowrapper.ufe import check_ufe_model
 
 
 logger = logging.getLogger(__name__)
 
 
-def shell_call(command, verbose=False):
+def shell_call(command, verbose=False, cwd=None):
     """
     Method that performs a shell call while not forwarding stdout and stderr.
+    The command is run from `cwd` when given, without changing the working
+    directory of the calling process.
     """
     try:
         if verbose:
-            result = subprocess.run(command, capture_output=True)
+            result = subprocess.run(command, capture_output=True, cwd=cwd)
         else:
             result = subprocess.run(
-                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd
             )
         return result
 
@@ -31,95 +74,512 @@ def shell_call(command, verbose=False):
         return exp
 
 
-def parse_sites(path):
+SITES_COLUMNS = (
+    "motif",
+    "reference_promoter",
+    "reference_binding_strand",
+    "motif_coordinates",
+    "posterior",
+    "aligned_promoter",
+    "score",
+    "binding_sequence",
+)
+
+
+def _check_site_filters(min_posterior, promoters, species):
+    """
+    Normalize the row filters of `parse_sites` to (min_posterior, promoter set,
+    species set), with None for each filter that isn't set.
+    """
+    if isinstance(promoters, str):
+        promoters = [promoters]
+    if isinstance(species, str):
+        species = [species]
+    return (
+        float(min_posterior) if min_posterior is not None else None,
+        frozenset(promoters) if promoters is not None else None,
+        frozenset(species) if species is not None else None,
+    )
+
+
+def _iter_site_rows(path, min_posterior=None, promoters=None, species=None):
+    """
+    Yield one tuple per aligned site of a MotEvo sites file, in `SITES_COLUMNS`
+    order. The file is read line by line, so memory use does not depend on its size.
+
+    Sites are filtered while reading: when a site header fails the
+    `min_posterior` or `promoters` test, its aligned lines are skipped unparsed.
+    """
     if not os.path.exists(path):
         logger.error(f"Path doesn't exist: {path}")
 
-    prep = []
     with open(path, "r") as f:
-        lines = f.readlines()
-        i = 0
-        while i < len(lines):
-            if re.match(r"^\d+", lines[i]):
-                columns = lines[i].strip().split(" ")
-                motif_coordinates = columns[0].strip()
-                reference_binding_strand = columns[1].strip()
+        header = None
+        skip = False
+        for i, line in enumerate(f):
+            # Site header lines start with motif coordinates, e.g. "471-491"
+            if line[:1].isdigit():
+                columns = line.split()
                 posterior = float(columns[2])
-                motif = columns[3].strip()
-                reference_promoter = columns[4].strip()
-
-                j = i + 1
-                while j < len(lines) and not re.match(r"^\d+", lines[j]):
-                    columns = lines[j].strip().split(" ")
-                    sequence = columns[0]
-                    score = float(columns[1])
-                    aligned_promoter = columns[2]
-
-                    prep.append(
-                        {
-                            "motif": motif,
-                            "reference_promoter": reference_promoter,
-                            "reference_binding_strand": reference_binding_strand,
-                            "motif_coordinates": motif_coordinates,
-                            "posterior": posterior,
-                            "aligned_promoter": aligned_promoter,
-                            "score": score,
-                            "binding_sequence": sequence,
-                        }
-                    )
-                    j += 1
-
-                i = j
-            else:
+                skip = (min_posterior is not None and posterior < min_posterior) or (
+                    promoters is not None and columns[4] not in promoters
+                )
+                header = (columns[3], columns[4], columns[1], columns[0], posterior)
+            elif header is None:
                 logger.error(f"Missing sequence line at line {i} in {path}!")
-                break
+                return
+            elif skip:
+                continue
+            elif line.strip():
+                columns = line.split()
+                if species is not None and species_of(columns[2]) not in species:
+                    continue
+                yield header + (columns[2], float(columns[1]), columns[0])
+
+
+def iter_sites(path, min_posterior=None, promoters=None, species=None):
+    """
+    Stream the aligned sites of a MotEvo sites file as dictionaries keyed by
+    `SITES_COLUMNS`. See `parse_sites` for the filters.
+    """
+    filters = _check_site_filters(min_posterior, promoters, species)
+    for row in _iter_site_rows(path, *filters):
+        yield dict(zip(SITES_COLUMNS, row))
+
+
+def _iter_site_chunks(path, chunksize, filters=(), columns=SITES_COLUMNS):
+    # Rows are cut down to the requested columns before they are collected
+    if tuple(columns) == SITES_COLUMNS:
+        project = None
+    else:
+        indices = [SITES_COLUMNS.index(column) for column in columns]
+
+        def project(row):
+            return tuple(row[index] for index in indices)
+
+    rows = []
+    for row in _iter_site_rows(path, *filters):
+        rows.append(project(row) if project else row)
+        if len(rows) == chunksize:
+            yield pd.DataFrame.from_records(rows, columns=columns)
+            rows = []
+
+    if rows or chunksize is None:
+        yield pd.DataFrame.from_records(rows, columns=columns)
+
+
+COLUMNAR_SITES_COLUMNS = (
+    "motif",
+    "reference_promoter",
+    "reference_binding_strand",
+    "start",
+    "end",
+    "posterior",
+    "aligned_promoter",
+    "score",
+    "binding_sequence",
+)
+
+_CATEGORICAL_SITES_COLUMNS = (
+    "motif",
+    "reference_promoter",
+    "reference_binding_strand",
+    "aligned_promoter",
+)
+
+
+def _new_columnar_buffers():
+    # Typecodes "i" and "f" are the 32-bit C int and float on all supported platforms
+    return {
+        "motif": array("i"),
+        "reference_promoter": array("i"),
+        "reference_binding_strand": array("i"),
+        "start": array("i"),
+        "end": array("i"),
+        "posterior": array("f"),
+        "aligned_promoter": array("i"),
+        "score": array("f"),
+        "binding_sequence": [],
+    }
 
-    return pd.DataFrame(prep)
+
+def _columnar_frame(buffers, categories, columns=COLUMNAR_SITES_COLUMNS):
+    data = {}
+    for column in columns:
+        values = buffers[column]
+        if column in categories:
+            data[column] = pd.Categorical.from_codes(
+                np.frombuffer(values, dtype=np.int32),
+                categories=list(categories[column]),
+            )
+        elif column == "binding_sequence":
+            data[column] = np.array(values, dtype=object)
+        else:
+            data[column] = np.frombuffer(
+                values, dtype=np.int32 if values.typecode == "i" else np.float32
+            )
+    return pd.DataFrame(data, columns=list(columns))
 
 
-def parse_priors(path):
+def _iter_columnar_site_chunks(
+    path, chunksize=None, filters=(None, None, None), columns=COLUMNAR_SITES_COLUMNS
+):
+    """
+    Parse a MotEvo sites file straight into typed column buffers. Categorical
+    columns are dictionary-encoded while reading, and the encoding is kept across
+    chunks so codes are stable over the whole file. Sites are filtered as in
+    `_iter_site_rows`, and binding sequences are only kept when requested.
+    """
     if not os.path.exists(path):
         logger.error(f"Path doesn't exist: {path}")
 
-    prep = []
+    min_posterior, promoter_filter, species_filter = filters
+    keep_sequences = "binding_sequence" in columns
+
+    categories = {column: {} for column in _CATEGORICAL_SITES_COLUMNS}
+    motifs = categories["motif"]
+    promoters = categories["reference_promoter"]
+    strands = categories["reference_binding_strand"]
+    aligned_promoters = categories["aligned_promoter"]
+
+    buffers = _new_columnar_buffers()
+    nr_of_rows = 0
     with open(path, "r") as f:
-        f.readline()  # header
+        header = None
+        skip = False
+        for i, line in enumerate(f):
+            if line[:1].isdigit():
+                fields = line.split()
+                posterior = float(fields[2])
+                skip = (min_posterior is not None and posterior < min_posterior) or (
+                    promoter_filter is not None and fields[4] not in promoter_filter
+                )
+                if skip:
+                    header = ()
+                    continue
+                start, _, end = fields[0].partition("-")
+                header = (
+                    motifs.setdefault(fields[3], len(motifs)),
+                    promoters.setdefault(fields[4], len(promoters)),
+                    strands.setdefault(fields[1], len(strands)),
+                    int(start),
+                    int(end),
+                    posterior,
+                )
+            elif header is None:
+                logger.error(f"Missing sequence line at line {i} in {path}!")
+                break
+            elif skip:
+                continue
+            elif line.strip():
+                fields = line.split()
+                if (
+                    species_filter is not None
+                    and species_of(fields[2]) not in species_filter
+                ):
+                    continue
+                buffers["motif"].append(header[0])
+                buffers["reference_promoter"].append(header[1])
+                buffers["reference_binding_strand"].append(header[2])
+                buffers["start"].append(header[3])
+                buffers["end"].append(header[4])
+                buffers["posterior"].append(header[5])
+                buffers["aligned_promoter"].append(
+                    aligned_promoters.setdefault(fields[2], len(aligned_promoters))
+                )
+                buffers["score"].append(float(fields[1]))
+                if keep_sequences:
+                    buffers["binding_sequence"].append(fields[0])
+                nr_of_rows += 1
 
-        try:
-            motif_results = f.readline().strip().split(" ")
-            prep.append(
-                {
-                    "motif": motif_results[0],
-                    "final_prior": float(motif_results[1]),
-                    "nr_of_sites": float(motif_results[2]),
-                    "density": float(motif_results[3]),
-                }
-            )
+                if nr_of_rows == chunksize:
+                    yield _columnar_frame(buffers, categories, columns)
+                    buffers = _new_columnar_buffers()
+                    nr_of_rows = 0
 
-            background_results = f.readline().strip().split(" ")
-            prep.append(
-                {
-                    "motif": background_results[0],
-                    "final_prior": float(background_results[1]),
-                    "nr_of_sites": float(background_results[2]),
-                    "density": float(background_results[3]),
-                }
-            )
+    if nr_of_rows or chunksize is None:
+        yield _columnar_frame(buffers, categories, columns)
+
+
+def _parse_with_sidecar(path, sidecar, kind, columns, parse):
+    """
+    Load a parsed file from its sidecar (see `motevowrapper.sidecar`), or parse
+    it with `parse` and store the result in a new sidecar.
+    """
+    format = "feather" if sidecar is True else sidecar
+    df = read_sidecar(path, format, kind, columns)
+    if df is not None:
+        return df
+
+    # Taken before parsing, so changes made while parsing invalidate the sidecar
+    metadata = source_metadata(path, kind)
+    df = parse()
+    if df is not None:
+        write_sidecar(df, path, format, metadata)
+        if columns is not None:
+            df = df[list(columns)]
+    return df
+
+
+def _filter_sites(df, filters):
+    # Row filters of `_iter_site_rows`, applied to an already parsed data frame
+    min_posterior, promoters, species = filters
+    mask = np.ones(len(df), dtype=bool)
+    if min_posterior is not None:
+        mask &= (df["posterior"] >= min_posterior).to_numpy()
+    if promoters is not None:
+        mask &= df["reference_promoter"].isin(promoters).to_numpy()
+    if species is not None:
+        aligned_species = df["aligned_promoter"].astype(str).str.partition("_")[0]
+        mask &= aligned_species.isin(species).to_numpy()
+    return df[mask].reset_index(drop=True)
+
+
+def parse_sites(
+    path,
+    chunksize=None,
+    engine="python",
+    columns=None,
+    sidecar=None,
+    min_posterior=None,
+    promoters=None,
+    species=None,
+):
+    """
+    Parse a MotEvo sites file into a data frame with one row per aligned site.
+
+    When `chunksize` is given, an iterator over data frames of at most `chunksize`
+    rows is returned instead, so arbitrarily large files can be processed in
+    constant memory.
+
+    With `engine="columnar"` the file is parsed directly into typed columns: the
+    motif coordinates become int32 `start` and `end` columns, `posterior` and
+    `score` are float32, and motif, promoter and strand columns are categorical.
+
+    Only sites with a posterior of at least `min_posterior`, of the given
+    `promoters` (reference promoter names) and aligned in the given `species`
+    (the assembly prefix of the aligned promoter name, e.g. "danRer11") are kept.
+    These filters and `columns` are applied while reading: the aligned lines of a
+    site that fails the posterior or promoter test are skipped unparsed.
+
+    With `sidecar` set to `"feather"` (or True) or `"parquet"`, the parsed data
+    frame is stored in a file next to the sites file, which later calls load
+    instead of parsing the sites file again for as long as its size and
+    modification time don't change. Feather sidecars are memory-mapped, and only
+    `columns` are read from them. Sidecars always hold all sites, and filters are
+    applied after loading them.
+    """
+    if engine not in ("python", "columnar"):
+        raise ValueError(f"Unknown engine {engine!r}, use 'python' or 'columnar'")
+    all_columns = COLUMNAR_SITES_COLUMNS if engine == "columnar" else SITES_COLUMNS
+    if columns is not None:
+        columns = list(columns)
+        unknown = [column for column in columns if column not in all_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns {unknown}, use any of {all_columns}")
+    filters = _check_site_filters(min_posterior, promoters, species)
 
-            ufe_results = f.readline().strip().split(" ")
-            prep.append(
-                {
-                    "motif": ufe_results[0],
-                    "final_prior": float(ufe_results[1]),
-                    "nr_of_sites": float(ufe_results[2]),
-                    "density": float(ufe_results[3]),
-                }
+    if chunksize is not None:
+        if chunksize < 1:
+            raise ValueError(f"chunksize must be a positive integer, got {chunksize}")
+        if sidecar:
+            raise ValueError("Sidecar files can't be used with chunksize")
+        if engine == "columnar":
+            return _iter_columnar_site_chunks(
+                path, chunksize, filters, columns or all_columns
             )
-        except:
+        return _iter_site_chunks(path, chunksize, filters, columns or all_columns)
+
+    if sidecar:
+        filtered = filters != (None, None, None)
+        df = _parse_with_sidecar(
+            path,
+            sidecar,
+            f"sites/{engine}",
+            None if filtered else columns,
+            lambda: parse_sites(path, engine=engine),
+        )
+        if filtered:
+            df = _filter_sites(df, filters)
+            if columns is not None:
+                df = df[columns]
+        return df
+
+    if engine == "columnar":
+        return next(
+            _iter_columnar_site_chunks(path, None, filters, columns or all_columns)
+        )
+    return next(_iter_site_chunks(path, None, filters, columns or all_columns))
+
+
+PRIORS_COLUMNS = ("motif", "final_prior", "nr_of_sites", "density")
+
+
+def parse_priors(path, columns=None, sidecar=None):
+    """
+    Parse a MotEvo priors file into a data frame with one row per weight matrix,
+    including the `background` and, when UFE is used, the `UFEwm` rows.
+
+    `path` may also be a list of priors files, which are all parsed in a single
+    pass into one data frame with a categorical `file` column holding the path
+    each row comes from. See `parse_sites` for `columns` and `sidecar`; sidecars
+    can only be used with a single file.
+    """
+    if not isinstance(path, (str, os.PathLike)):
+        if sidecar:
+            raise ValueError("Sidecar files can only be used with a single file")
+        df = _parse_priors(list(path))
+    elif sidecar:
+        return _parse_with_sidecar(
+            path, sidecar, "priors", columns, lambda: _parse_priors([path])
+        )
+    else:
+        df = _parse_priors([path])
+
+    if df is not None and columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def _parse_priors(paths):
+    """
+    Parse priors files with one `read_csv` call on their concatenated rows, and
+    add the `file` column when there is more than one file.
+    """
+    bodies = []
+    nr_of_rows = []
+    for path in paths:
+        if not os.path.exists(path):
+            logger.error(f"Path doesn't exist: {path}")
+
+        with open(path, "rb") as f:
+            f.readline()  # header
+            body = f.read()
+        rows = sum(1 for line in body.splitlines() if line.strip())
+        if not rows:
             logger.error(f"Not enough lines in {path}")
             return None
+        bodies.append(body if body.endswith(b"\n") else body + b"\n")
+        nr_of_rows.append(rows)
+
+    try:
+        df = pd.read_csv(
+            io.BytesIO(b"".join(bodies)),
+            sep=r"\s+",
+            header=None,
+            names=PRIORS_COLUMNS,
+            index_col=False,
+            dtype=dict(zip(PRIORS_COLUMNS, (str, float, float, float))),
+        )
+    except (ValueError, pd.errors.ParserError) as exp:
+        logger.error(f"Malformed priors file in {paths}: {exp}")
+        return None
+    if len(df) != sum(nr_of_rows):
+        logger.error(f"Malformed priors file in {paths}")
+        return None
+
+    if len(paths) > 1:
+        paths = np.array(paths, dtype=object)
+        df["file"] = pd.Categorical(
+            np.repeat(paths, nr_of_rows), categories=pd.unique(paths)
+        )
+    return df
+
+
+def find_output_files(path):
+    """
+    Map PWM names to `(sites_file, priors_file)` pairs for all MotEvo outputs in
+    the directory tree under `path`, pairing `sites_<name>` with `priors_<name>`
+    in the same directory. PWM names are taken without file extension, as in
+    `run_motevo_many`.
+    """
+    sidecar_extensions = tuple(SIDECAR_FORMATS.values())
+    pairs = {}
+    for directory, subdirectories, names in os.walk(path):
+        subdirectories.sort()
+        names = set(names)
+        for name in sorted(names):
+            if not name.startswith("sites_") or name.endswith(sidecar_extensions):
+                continue
+            pwm_name = name[len("sites_") :]
+            if f"priors_{pwm_name}" not in names:
+                logger.warning(f"No priors file for {os.path.join(directory, name)}")
+                continue
+
+            pwm = os.path.splitext(pwm_name)[0]
+            sites_file = os.path.join(directory, name)
+            if pwm in pairs:
+                raise ValueError(
+                    f"Sites files {pairs[pwm][0]} and {sites_file} map to the same "
+                    f"PWM {pwm!r}"
+                )
+            pairs[pwm] = (sites_file, os.path.join(directory, f"priors_{pwm_name}"))
+    return pairs
+
 
-    return pd.DataFrame(prep)
+def _parse_output_files(sites_file, priors_file, kwargs):
+    return parse_sites(sites_file, **kwargs), parse_priors(priors_file)
+
+
+def _concat_keyed(frames, keys, key_name):
+    """
+    Concatenate data frames in one pass, adding a categorical `key_name` column
+    that holds the key of the frame each row comes from. Categorical columns are
+    merged by the union of their categories, so they stay categorical.
+    """
+    lengths = [len(df) for df in frames]
+    data = {
+        key_name: pd.Categorical.from_codes(
+            np.repeat(np.arange(len(keys), dtype=np.int32), lengths), categories=keys
+        )
+    }
+    if not frames:
+        return pd.DataFrame(data)
+
+    for column in frames[0].columns:
+        values = [df[column] for df in frames]
+        if all(isinstance(value.dtype, pd.CategoricalDtype) for value in values):
+            data[column] = union_categoricals(values)
+        else:
+            data[column] = np.concatenate([value.to_numpy() for value in values])
+    return pd.DataFrame(data)
+
+
+def parse_output_dir(path, jobs=None, engine="columnar", **kwargs):
+    """
+    Parse all MotEvo sites and priors files under `path` (see
+    `find_output_files`) on a pool of `jobs` processes. With `jobs=1` the files
+    are parsed in this process.
+
+    Returns a `(sites, priors)` pair of data frames with a categorical `pwm` column
+    naming the PWM of each row. Sites are parsed with the `columnar` engine by
+    default; `engine` and remaining keyword arguments, like `columns` and
+    `min_posterior`, are passed on to `parse_sites`. The priors motif column is
+    made categorical.
+    """
+    pairs = find_output_files(path)
+    kwargs = dict(kwargs, engine=engine)
+
+    results = {}
+    if jobs == 1:
+        for pwm, (sites_file, priors_file) in pairs.items():
+            results[pwm] = _parse_output_files(sites_file, priors_file, kwargs)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                pwm: executor.submit(
+                    _parse_output_files, sites_file, priors_file, kwargs
+                )
+                for pwm, (sites_file, priors_file) in pairs.items()
+            }
+            results = {pwm: future.result() for pwm, future in futures.items()}
+
+    pwms = [pwm for pwm, (_, priors) in results.items() if priors is not None]
+    sites = _concat_keyed([results[pwm][0] for pwm in pwms], pwms, "pwm")
+    priors = _concat_keyed([results[pwm][1] for pwm in pwms], pwms, "pwm")
+    if "motif" in priors:
+        priors["motif"] = priors["motif"].astype("category")
+    return sites, priors
 
 
 def print_help():
@@ -140,8 +600,7 @@ def check_installation():
         return
     else:
         logger.info(
-            f"MotEvo successfully found on the system at: "
-            f"{shell_call(['which', 'motevo'], verbose=True).stdout.decode('utf-8')}"
+            f"MotEvo successfully found on the system at: {shutil.which('motevo')}"
         )
 
     result = shell_call(["runUFE"])
@@ -153,8 +612,442 @@ def check_installation():
         )
     else:
         logger.info(
-            f"runUFE successfully found on the system at: "
-            f"{shell_call(['which', 'runUFE'], verbose=True).stdout.decode('utf-8')}"
+            f"runUFE successfully found on the system at: {shutil.which('runUFE')}"
+        )
+
+
+# MotEvo options in the order in which they are written to the parameters file
+MOTEVO_PARAMETERS = (
+    "Mode",
+    "TREE",
+    "refspecies",
+    "bgprior",
+    "minposterior",
+    "sitefile",
+    "priorfile",
+    "bgA",
+    "bgT",
+    "bgG",
+    "bgC",
+    "mybgfile",
+    "EMprior",
+    "minposteriorWM",
+    "UFEwmprior",
+    "UFEwmfile",
+    "UFEwmlen",
+    "UFEwmproffile",
+    "UFEprint",
+    "wmdiff",
+    "winlen",
+    "steplen",
+    "markovorderBG",
+    "priordiff",
+    "restrictparses",
+    "loglikfile",
+    "CRMfile",
+    "singlestrand",
+    "printsiteals",
+)
+
+# Options whose name in the parameters file differs from the keyword argument
+_PARAMETER_FILE_NAMES = {"bgA": "bg A", "bgT": "bg T", "bgG": "bg G", "bgC": "bg C"}
+
+# Options naming input files, which MotEvo resolves relative to its working directory
+_INPUT_FILE_PARAMETERS = ("mybgfile", "UFEwmfile")
+
+
+def _pwm_length(wm_path):
+    """
+    Length of the weight matrix in `wm_path`, or of the longest one when the file
+    holds several matrices separated by "//" lines.
+    """
+    with open(wm_path, "r") as f:
+        pwm_length = 0
+        longest = 0
+        for line in f:
+            if re.match(r"^\d+", line):
+                pwm_length += 1
+            elif line.startswith("//"):
+                longest = max(longest, pwm_length)
+                pwm_length = 0
+    return max(longest, pwm_length)
+
+
+# Resolved executable paths, see `find_executable`
+_executables = {}
+
+
+def find_executable(name):
+    """
+    Absolute path of the executable `name` (a command on the PATH or a path),
+    or None when it cannot be found. Found executables are cached for as long as
+    the PATH doesn't change; failed lookups are tried again on every call, so
+    installing MotEvo later doesn't need a restart.
+    """
+    if os.path.dirname(name):
+        name = os.path.abspath(name)
+    key = (name, os.environ.get("PATH"))
+    if key not in _executables:
+        path = shutil.which(name)
+        if not path:
+            return None
+        _executables[key] = os.path.abspath(path)
+    return _executables[key]
+
+
+# Options whose value 0 differs from MotEvo's default, e.g. `EMprior 0` fixes the
+# priors where MotEvo would estimate them
+_ZERO_VALUED_PARAMETERS = ("EMprior",)
+
+
+class _ParameterTemplate:
+    """
+    Contents of a MotEvo parameters file, rendered once. Options that are not set
+    (or are falsy, except for `EMprior 0`) are left out so MotEvo falls back to
+    its own defaults. Default
+    output file names and an `"auto"` UFE site length depend on the PWM, so they
+    are left as slots filled in for each run.
+    """
+
+    def __init__(self, parameters):
+        parameters = dict(parameters)
+        if not parameters.get("TREE"):
+            parameters["TREE"] = f"({parameters.get('refspecies')}: 1.0);"
+        self.parameters = parameters
+
+        self.lines = []
+        for name in MOTEVO_PARAMETERS:
+            value = parameters.get(name)
+            if name in ("sitefile", "priorfile") and not value:
+                self.lines.append((name, None))
+            elif name == "UFEwmlen" and value == "auto":
+                self.lines.append((name, None))
+            elif value or (name in _ZERO_VALUED_PARAMETERS and value is not None):
+                self.lines.append(
+                    (name, f"{_PARAMETER_FILE_NAMES.get(name, name)} {value}\n")
+                )
+
+    @property
+    def needs_pwm_length(self):
+        return self.parameters.get("UFEwmlen") == "auto"
+
+    def render(self, sitefile, priorfile, pwm_length=None):
+        slots = {"sitefile": sitefile, "priorfile": priorfile, "UFEwmlen": pwm_length}
+        return "".join(
+            line if line is not None else f"{name} {slots[name]}\n"
+            for name, line in self.lines
+        )
+
+
+# Defaults of the MotEvo options set by `run_motevo`; other options are left unset
+DEFAULT_PARAMETERS = {
+    "Mode": "TFBS",
+    "EMprior": 0,
+    "bgA": 0.25,
+    "bgT": 0.25,
+    "bgG": 0.25,
+    "bgC": 0.25,
+    "minposterior": 0.1,
+    "printsiteals": 1,
+}
+
+
+def _check_parameters(params):
+    unknown = set(params) - set(MOTEVO_PARAMETERS)
+    if unknown:
+        raise TypeError(f"Unknown MotEvo parameters: {', '.join(sorted(unknown))}")
+
+    parameters = {**DEFAULT_PARAMETERS, **params}
+    if parameters["Mode"] not in ("TFBS", "ENH", "WMREF"):
+        raise ValueError(
+            f"Unknown MotEvo mode {parameters['Mode']!r}, use TFBS, ENH or WMREF"
+        )
+    background = [parameters[name] for name in ("bgA", "bgC", "bgG", "bgT")]
+    if (
+        any(not 0 <= value <= 1 for value in background)
+        or abs(sum(background) - 1) > 1e-3
+    ):
+        raise ValueError(
+            f"Background probabilities bgA, bgC, bgG, bgT must sum to 1, got {background}"
+        )
+    return parameters
+
+
+class MotevoResult(tuple):
+    """
+    The `(sites_file, priors_file)` pair returned by the MotEvo runners, with the
+    `Attempt` records of the runs behind it in `attempts` and their `RunMetrics`
+    in `metrics`. Results taken from a cache have no attempts and no metrics.
+    """
+
+    def __new__(cls, sites_file, priors_file, attempts=(), metrics=None):
+        result = super().__new__(cls, (sites_file, priors_file))
+        result.attempts = list(attempts)
+        result.metrics = metrics
+        return result
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    @property
+    def sites_file(self):
+        return self[0]
+
+    @property
+    def priors_file(self):
+        return self[1]
+
+
+class _MotevoRun:
+    """
+    A single MotEvo run in `working_directory`: the parameters file, the command
+    and the checks of its outputs, shared by the synchronous and asynchronous
+    runners.
+
+    MotEvo is run from the working directory, so relative paths are resolved
+    against it. The working directory of this process is never changed, which
+    makes concurrent runs in different directories safe.
+    """
+
+    parameters_path = "motevo_parameters"
+    report_path = "motevo_report"
+    errors_path = "motevo_errors"
+
+    def __init__(
+        self,
+        sequences_file,
+        wm_path,
+        working_directory,
+        template,
+        cache,
+        executable="motevo",
+        prefilter_score=None,
+    ):
+        self.start = time.monotonic()
+        self.timings = {}
+        self.sequences_file = sequences_file
+        self.working_directory = working_directory
+
+        # Matrices of a `PWMLibrary` are used without reading their file again,
+        # and written to the working directory when they have no file of their own
+        pwm = wm_path if isinstance(wm_path, PWM) else None
+        if pwm is not None:
+            wm_path = pwm.path
+            if wm_path is None:
+                wm_path = f"{pwm.name}.wm"
+                write_pwm(pwm.counts, self.path(wm_path), pwm.name)
+        self.wm_path = wm_path
+
+        # Read Position Weight Matrix (PWM) name
+        pwm_name = wm_path[wm_path.rfind("/") + 1 :]
+        self.name = os.path.splitext(pwm_name)[0]
+
+        parameters = template.parameters
+        UFEwmfile = parameters.get("UFEwmfile")
+        if UFEwmfile:
+            # A UFE model made for another tree only fails deep into the run. Runs
+            # don't write binary model caches, which only `load_ufe_model` does
+            check_ufe_model(
+                self.path(UFEwmfile),
+                parameters["TREE"],
+                parameters.get("refspecies"),
+                cache=False,
+            )
+        # Alignments are only prefiltered when MotEvo runs, not on cache hits
+        self.pwm = pwm
+        self.pwm_name = pwm_name
+        self.parameters = parameters
+        self.prefilter_score = prefilter_score
+        start = time.monotonic()
+        self.sitefile = parameters.get("sitefile") or f"sites_{pwm_name}"
+        self.priorfile = parameters.get("priorfile") or f"priors_{pwm_name}"
+
+        # Load PWM length
+        pwm_length = None
+        if template.needs_pwm_length:
+            pwm_length = (
+                pwm.length if pwm is not None else _pwm_length(self.path(wm_path))
+            )
+        self.motevo_parameters = template.render(
+            self.sitefile, self.priorfile, pwm_length
+        )
+        self.timings["parameters"] = time.monotonic() - start
+
+        self.cache = cache
+        if cache is not None:
+            if not isinstance(cache, ResultCache):
+                self.cache = ResultCache(cache)
+            key_parameters = self.motevo_parameters
+            if prefilter_score is not None:
+                # The prefiltered alignments follow from the original ones, the
+                # matrices, the background and the score
+                background = " ".join(
+                    repr(float(parameters[f"bg{base}"])) for base in "ACGT"
+                )
+                key_parameters += (
+                    f"\nprefilter_score {prefilter_score!r}"
+                    f"\nprefilter_background {background}"
+                )
+            self.cache_key = run_key(
+                self.path(self.sequences_file),
+                self.path(wm_path),
+                key_parameters,
+                UFEwmfile=self.path(UFEwmfile) if UFEwmfile else None,
+            )
+        self.executable = executable
+
+    @property
+    def command(self):
+        return [
+            self.executable,
+            self.sequences_file,
+            self.parameters_path,
+            self.wm_path,
+        ]
+
+    def path(self, path):
+        return os.path.join(self.working_directory, path)
+
+    def prefilter(self, pwm_name, counts, parameters, min_score):
+        """
+        Write the alignments that can contain a site scoring at least `min_score`
+        with any of the `counts` matrices to a new sequences file in the working
+        directory and return its path.
+        """
+        background = [parameters[f"bg{base}"] for base in "ACGT"]
+        matrices = [log_odds(matrix, background) for matrix in counts]
+        sequences_name = os.path.basename(self.sequences_file)
+        filtered_file = f"prefiltered_{pwm_name}_{sequences_name}"
+        kept, total = prefilter_alignments(
+            self.path(self.sequences_file),
+            matrices,
+            min_score,
+            self.path(filtered_file),
+        )
+        logger.info(f"Prefiltering with {pwm_name} kept {kept} of {total} alignments.")
+        return filtered_file
+
+    def cached(self, verbose=False):
+        """
+        Results of an identical earlier run, if they are cached.
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get(self.cache_key)
+        if cached is None:
+            return None
+        if verbose:
+            logger.info(f"Using cached MotEvo results {self.cache_key}.")
+        return MotevoResult(*cached)
+
+    def prepare(self, verbose=False):
+        """
+        Prefilter the alignments if needed, write the parameters file and remove
+        outputs of earlier runs.
+        """
+        if self.prefilter_score is not None and "prefilter" not in self.timings:
+            start = time.monotonic()
+            if self.pwm is not None:
+                counts = [self.pwm.counts]
+            else:
+                counts = read_pwms(self.path(self.wm_path)).values()
+            self.sequences_file = self.prefilter(
+                self.pwm_name, counts, self.parameters, self.prefilter_score
+            )
+            self.timings["prefilter"] = time.monotonic() - start
+
+        start = time.monotonic()
+        with open(self.path(self.parameters_path), "w") as f:
+            f.write(self.motevo_parameters)
+        self.timings["parameters"] += time.monotonic() - start
+
+        if verbose:
+            logger.info(f"Generated parameters file at: {self.parameters_path}.")
+            print(f"MotEvo shell command:\n" f"{' '.join(self.command)}")
+
+        # Remove existing MotEvo outputs
+        if os.path.exists(self.path(self.sitefile)):
+            os.remove(self.path(self.sitefile))
+        if os.path.exists(self.path(self.priorfile)):
+            os.remove(self.path(self.priorfile))
+
+    def report(self, report=None):
+        """
+        Where to write the output of MotEvo: a binary file object, or a path
+        relative to the working directory (`report_path` by default).
+        """
+        if report is None or isinstance(report, (str, os.PathLike)):
+            return self.path(report or self.report_path)
+        return report
+
+    def check(self, returncode, verbose=False):
+        """
+        Whether a MotEvo run exited successfully and generated its outputs.
+        """
+        if returncode == 0:
+            if verbose:
+                logger.info(
+                    f"MotEvo ran successfully! Please"
+                    f"check results at: {self.sitefile} and {self.priorfile}.\n"
+                    f"Check report at {self.report_path}."
+                )
+            status = True
+        else:
+            logger.error(f"MotEvo run failed! Check errors at {self.errors_path}.")
+            status = False
+
+        # Check if files were generated
+        if not os.path.exists(self.path(self.sitefile)):
+            logger.error("MotEvo did not generate sites file.")
+            status = False
+
+        if not os.path.exists(self.path(self.priorfile)):
+            logger.error("MotEvo did not generate priors file.")
+            status = False
+
+        return status
+
+    def metrics(self, status, attempts, usage=None):
+        """
+        `RunMetrics` of this run, from its `attempts` and the resource usage
+        records of their processes, if any.
+        """
+        sitefile, priorfile = self.path(self.sitefile), self.path(self.priorfile)
+        timings = dict(self.timings)
+        timings["process"] = sum(attempt.duration for attempt in attempts)
+        timings["total"] = time.monotonic() - self.start
+        return RunMetrics(
+            "motevo",
+            self.name,
+            status,
+            len(attempts),
+            timings,
+            *child_usage(usage),
+            input_size=file_size(
+                self.path(self.sequences_file), self.path(self.wm_path)
+            ),
+            output_size=file_size(sitefile, priorfile),
+            nr_of_sites=count_sites(sitefile),
+        )
+
+    def result(self, status, attempts, usage=None, on_metrics=None):
+        metrics = self.metrics(status, attempts, usage)
+        emit(on_metrics, metrics)
+
+        if self.cache is not None and status:
+            return MotevoResult(
+                *self.cache.put(
+                    self.cache_key, self.path(self.sitefile), self.path(self.priorfile)
+                ),
+                attempts,
+                metrics,
+            )
+
+        return MotevoResult(
+            os.path.join(self.working_directory, self.sitefile),
+            os.path.join(self.working_directory, self.priorfile),
+            attempts,
+            metrics,
         )
 
 
@@ -193,186 +1086,1287 @@ def run_motevo(
     steplen=None,
     try_until_succeeding=False,
     verbose=False,
+    cache=None,
+    retry=None,
+    report=None,
+    on_line=None,
+    prefilter_score=None,
+    on_metrics=None,
 ):
+    parameters = dict(
+        Mode=Mode,
+        TREE=TREE,
+        refspecies=refspecies,
+        bgprior=bgprior,
+        minposterior=minposterior,
+        sitefile=sitefile,
+        priorfile=priorfile,
+        bgA=bgA,
+        bgT=bgT,
+        bgG=bgG,
+        bgC=bgC,
+        mybgfile=mybgfile,
+        EMprior=EMprior,
+        minposteriorWM=minposteriorWM,
+        UFEwmprior=UFEwmprior,
+        UFEwmfile=UFEwmfile,
+        UFEwmlen=UFEwmlen,
+        UFEwmproffile=UFEwmproffile,
+        UFEprint=UFEprint,
+        wmdiff=wmdiff,
+        winlen=winlen,
+        steplen=steplen,
+        markovorderBG=markovorderBG,
+        priordiff=priordiff,
+        restrictparses=restrictparses,
+        loglikfile=loglikfile,
+        CRMfile=CRMfile,
+        singlestrand=singlestrand,
+        printsiteals=printsiteals,
+    )
+    run = _MotevoRun(
+        sequences_file,
+        wm_path,
+        working_directory,
+        _ParameterTemplate(_check_parameters(parameters)),
+        cache,
+        prefilter_score=prefilter_score,
+    )
+
+    # Return cached results of an identical run
+    cached = run.cached(verbose)
+    if cached is not None:
+        return cached
+
     # Check if MotEvo is installed
-    assert shell_call(["motevo"]).returncode == 0, (
+    assert find_executable("motevo"), (
         "Could not find MotEvo. Please check installation"
         "first by running `check_installation()` method!"
     )
 
-    # Change directory to working_directory
-    cwd = os.getcwd()
-    os.chdir(working_directory)
+    return _execute(
+        run,
+        RetryPolicy.from_arguments(retry, try_until_succeeding),
+        verbose,
+        report=report,
+        on_line=on_line,
+        on_metrics=on_metrics,
+    )
 
-    # Read Position Weight Matrix (PWM) name
-    pwm_name = wm_path[wm_path.rfind("/") + 1 :]
 
-    if not sitefile:
-        sitefile = f"sites_{pwm_name}"
-    if not priorfile:
-        priorfile = f"priors_{pwm_name}"
+def _has_fileno(f):
+    try:
+        f.fileno()
+        return True
+    except (AttributeError, io.UnsupportedOperation):
+        return False
 
-    if not TREE:
-        TREE = f"({refspecies}: 1.0);"
 
-    # Load PWM length
-    with open(wm_path, "r") as f:
-        pwm_length = 0
-        for line in f:
-            if re.match("^\d+", line):
-                pwm_length += 1
+@contextlib.contextmanager
+def _open_sink(sink):
+    """
+    Binary file to write child output to: the file object `sink`, which is left
+    open, or the file at path `sink`.
+    """
+    if isinstance(sink, (str, os.PathLike)):
+        with open(sink, "wb") as f:
+            yield f
+    else:
+        yield sink
+
+
+def _wait(process, usage=None):
+    """
+    Wait for the `subprocess.Popen` `process` and return its exit code. When
+    `usage` is a list and `os.wait4` is available, the resource usage of the
+    child is appended to it.
+    """
+    if usage is None or not hasattr(os, "wait4"):
+        return process.wait()
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped by `Popen.poll`, when killed as it exited
+        return process.wait()
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    usage.append(rusage)
+    return process.returncode
 
+
+def _run_process(command, cwd, stdout, stderr, timeout=None, on_line=None, usage=None):
+    """
+    Run `command` from `cwd`, writing its standard output and error to the binary
+    files `stdout` and `stderr` while it runs. File objects backed by a file
+    descriptor are handed to the child directly, so its output never passes
+    through this process. Otherwise, or when `on_line` is given, standard output
+    is copied line by line and each decoded line is passed to `on_line`.
+
+    The process is killed after `timeout` seconds. Returns the exit code, or None
+    when the process was killed. The resource usage of the process is appended
+    to the list `usage`, if given, see `_wait`.
+    """
+    pipe = on_line is not None or not _has_fileno(stdout)
+    process = subprocess.Popen(
+        command, cwd=cwd, stdout=subprocess.PIPE if pipe else stdout, stderr=stderr
+    )
+
+    killed = threading.Event()
+
+    def kill():
+        killed.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer is not None:
+        timer.start()
+    try:
+        if pipe:
+            with process.stdout:
+                for line in process.stdout:
+                    stdout.write(line)
+                    if on_line is not None:
+                        on_line(line.decode("utf-8", errors="replace"))
+        returncode = _wait(process, usage)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+    return None if killed.is_set() else returncode
+
+
+def _execute(run, retry, verbose=False, report=None, on_line=None, on_metrics=None):
     # Create parameter file
-    motevo_parameters_path = "motevo_parameters"
-    with open(motevo_parameters_path, "w") as f:
-        if Mode:
-            f.write(f"Mode {Mode}\n")
-        if TREE:
-            f.write(f"TREE {TREE}\n")
-        if refspecies:
-            f.write(f"refspecies {refspecies}\n")
-        if bgprior:
-            f.write(f"bgprior {bgprior}\n")
-        if minposterior:
-            f.write(f"minposterior {minposterior}\n")
-        if sitefile:
-            f.write(f"sitefile {sitefile}\n")
-        if priorfile:
-            f.write(f"priorfile {priorfile}\n")
-        if bgA:
-            f.write(f"bg A {bgA}\n")
-        if bgT:
-            f.write(f"bg T {bgT}\n")
-        if bgG:
-            f.write(f"bg G {bgG}\n")
-        if bgC:
-            f.write(f"bg C {bgC}\n")
-        if mybgfile:
-            f.write(f"mybgfile {mybgfile}\n")
-        if EMprior:
-            f.write(f"EMprior {EMprior}\n")
-        if minposteriorWM:
-            f.write(f"minposteriorWM {minposteriorWM}\n")
-        if UFEwmprior:
-            f.write(f"UFEwmprior {UFEwmprior}\n")
-        if UFEwmfile:
-            f.write(f"UFEwmfile {UFEwmfile}\n")
-        if UFEwmlen and UFEwmlen != "auto":
-            f.write(f"UFEwmlen {UFEwmlen}\n")
-        elif UFEwmlen == "auto":
-            f.write(f"UFEwmlen {pwm_length}\n")
-        if UFEwmproffile:
-            f.write(f"UFEwmproffile {UFEwmproffile}\n")
-        if UFEprint:
-            f.write(f"UFEprint {UFEprint}\n")
-        if wmdiff:
-            f.write(f"wmdiff {wmdiff}\n")
-        if winlen:
-            f.write(f"winlen {winlen}\n")
-        if steplen:
-            f.write(f"steplen {steplen}\n")
-        if markovorderBG:
-            f.write(f"markovorderBG {markovorderBG}\n")
-        if priordiff:
-            f.write(f"priordiff {priordiff}\n")
-        if restrictparses:
-            f.write(f"restrictparses {restrictparses}\n")
-        if loglikfile:
-            f.write(f"loglikfile {loglikfile}\n")
-        if CRMfile:
-            f.write(f"CRMfile {CRMfile}\n")
-        if singlestrand:
-            f.write(f"singlestrand {singlestrand}\n")
-        if printsiteals:
-            f.write(f"printsiteals {printsiteals}\n")
-
-    if verbose:
-        logger.info(f"Generated parameters file at: {motevo_parameters_path}.")
-
-    # Remove existing MotEvo outputs
-    if os.path.exists(sitefile):
-        os.remove(sitefile)
-    if os.path.exists(priorfile):
-        os.remove(priorfile)
-
-    # Setting the status of running MotEvo
+    run.prepare(verbose)
+
+    attempts = []
+    usage = []
     status = False
+    for number in retry.attempt_numbers():
+        if attempts:
+            time.sleep(retry.delay(number - 1))
 
-    while not status:
-        command = ["motevo", sequences_file, motevo_parameters_path, wm_path]
+        # Run MotEvo, streaming its output to the report and errors files
+        start = time.monotonic()
+        with _open_sink(run.report(report)) as stdout, open(
+            run.path(run.errors_path), "wb"
+        ) as stderr:
+            returncode = _run_process(
+                run.command,
+                run.working_directory,
+                stdout,
+                stderr,
+                timeout=retry.timeout,
+                on_line=on_line,
+                usage=usage,
+            )
+        duration = time.monotonic() - start
 
-        if verbose:
-            print(f"MotEvo shell command:\n" f"{' '.join(command)}")
+        timed_out = returncode is None
+        if timed_out:
+            logger.error(f"MotEvo run killed after {retry.timeout} seconds!")
 
-        # Run MotEvo
-        result = shell_call(command, verbose=True)
+        # Check result
+        status = not timed_out and run.check(returncode, verbose)
+        attempts.append(Attempt(number, returncode, duration, timed_out, status))
+        if status:
+            break
 
-        # Writing motevo report
-        with open("motevo_report", "w") as f:
-            f.write(result.stdout.decode("utf-8"))
+    return run.result(status, attempts, usage, on_metrics)
 
-        # Check result
-        if result.returncode == 0:
-            if verbose:
-                logger.info(
-                    f"MotEvo ran successfully! Please"
-                    f"check results at: {sitefile} and {priorfile}.\n"
-                    f"Check report at motevo_report."
+
+class MotevoEngine:
+    """
+    Reusable MotEvo setup for many runs with the same parameters.
+
+    The `motevo` and `runUFE` executables (commands on the PATH or paths) are
+    resolved once, and the MotEvo parameters, given as keyword arguments like to
+    `run_motevo`, are validated and rendered into a parameters file template when
+    the engine is created. Each `run` then only fills in what depends on the PWM.
+    Engines can be pickled and sent to worker processes. The metrics of every run
+    are sent to `on_metrics`, see `run_motevo`.
+    """
+
+    def __init__(
+        self,
+        motevo="motevo",
+        runUFE="runUFE",
+        working_directory="./",
+        cache=None,
+        try_until_succeeding=False,
+        verbose=False,
+        retry=None,
+        prefilter_score=None,
+        on_metrics=None,
+        **params,
+    ):
+        self.template = _ParameterTemplate(_check_parameters(params))
+        self.prefilter_score = prefilter_score
+        self.on_metrics = on_metrics
+
+        self.motevo = find_executable(motevo)
+        if self.motevo is None:
+            raise FileNotFoundError(
+                f"Could not find MotEvo executable {motevo!r}. Please check "
+                "installation first by running `check_installation()` method!"
+            )
+        # runUFE is only needed for `run_ufe`
+        self.runUFE = find_executable(runUFE)
+
+        if cache is not None and not isinstance(cache, ResultCache):
+            cache = ResultCache(cache)
+        self.cache = cache
+        self.working_directory = working_directory
+        self.retry = RetryPolicy.from_arguments(retry, try_until_succeeding)
+        self.verbose = verbose
+
+    @property
+    def parameters(self):
+        return dict(self.template.parameters)
+
+    def run(
+        self, sequences_file, wm_path, working_directory=None, report=None, on_line=None
+    ):
+        """
+        Run MotEvo on `sequences_file` with the PWM at `wm_path` and return the
+        `(sites_file, priors_file)` paths, like `run_motevo`.
+        """
+        run = _MotevoRun(
+            sequences_file,
+            wm_path,
+            working_directory or self.working_directory,
+            self.template,
+            self.cache,
+            executable=self.motevo,
+            prefilter_score=self.prefilter_score,
+        )
+        cached = run.cached(self.verbose)
+        if cached is not None:
+            return cached
+        return _execute(
+            run,
+            self.retry,
+            self.verbose,
+            report=report,
+            on_line=on_line,
+            on_metrics=self.on_metrics,
+        )
+
+    def run_ufe(
+        self,
+        tree_file_path,
+        output_path=None,
+        use_cache=True,
+        cache_dir=None,
+        on_line=None,
+    ):
+        """
+        Generate the UFE model for a tree with the engine's background, see
+        `run_ufe`.
+        """
+        if self.runUFE is None:
+            raise FileNotFoundError(
+                "Could not find runUFE. Please check installation first by "
+                "running `check_installation()` method!"
+            )
+        parameters = self.template.parameters
+        return run_ufe(
+            tree_file_path,
+            bg_A=parameters["bgA"],
+            bg_C=parameters["bgC"],
+            bg_G=parameters["bgG"],
+            bg_T=parameters["bgT"],
+            output_path=output_path,
+            use_cache=use_cache,
+            cache_dir=cache_dir,
+            executable=self.runUFE,
+            on_metrics=self.on_metrics,
+            on_line=on_line,
+        )
+
+
+async def _wait_or_kill(process, timeout=None, stdout=None, on_line=None):
+    """
+    Wait for an asyncio subprocess, killing it if the waiting task is cancelled
+    or it runs for longer than `timeout` seconds. When the process writes to a
+    pipe, its lines are copied to the binary file `stdout` and passed to
+    `on_line`, see `_run_process`.
+    """
+
+    async def communicate():
+        if stdout is not None:
+            async for line in process.stdout:
+                stdout.write(line)
+                if on_line is not None:
+                    on_line(line.decode("utf-8", errors="replace"))
+        return await process.wait()
+
+    try:
+        return await asyncio.wait_for(communicate(), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        process.kill()
+        await process.wait()
+        raise
+
+
+async def run_motevo_async(
+    sequences_file=None,
+    wm_path=None,
+    working_directory="./",
+    semaphore=None,
+    try_until_succeeding=False,
+    verbose=False,
+    cache=None,
+    retry=None,
+    report=None,
+    on_line=None,
+    prefilter_score=None,
+    on_metrics=None,
+    **params,
+):
+    """
+    Asynchronous version of `run_motevo`, taking the same MotEvo parameters as
+    keyword arguments. MotEvo is started with `asyncio.create_subprocess_exec`
+    and its output is streamed to the report, see `run_motevo`.
+
+    When a `semaphore` (`asyncio.Semaphore`) is given, MotEvo only runs while
+    holding it, which bounds the number of concurrent runs sharing it. Cancelling
+    the task kills the MotEvo process. Failed runs are retried following `retry`,
+    see `run_motevo`. The event loop reaps MotEvo, so the metrics of asynchronous
+    runs have no CPU times or peak memory.
+
+    Hashing inputs for the cache, checking the UFE model, prefiltering and
+    writing the parameters and outputs run in the loop's default executor, so
+    large inputs don't block the event loop.
+    """
+    retry = RetryPolicy.from_arguments(retry, try_until_succeeding)
+    template = _ParameterTemplate(_check_parameters(params))
+    loop = asyncio.get_running_loop()
+    run = await loop.run_in_executor(
+        None,
+        functools.partial(
+            _MotevoRun,
+            sequences_file,
+            wm_path,
+            working_directory,
+            template,
+            cache,
+            prefilter_score=prefilter_score,
+        ),
+    )
+
+    cached = await loop.run_in_executor(None, run.cached, verbose)
+    if cached is not None:
+        return cached
+
+    # Without a shared semaphore, runs are not limited
+    async with semaphore or asyncio.Semaphore():
+        await loop.run_in_executor(None, run.prepare, verbose)
+
+        attempts = []
+        status = False
+        for number in retry.attempt_numbers():
+            if attempts:
+                await asyncio.sleep(retry.delay(number - 1))
+
+            start = time.monotonic()
+            with _open_sink(run.report(report)) as stdout, open(
+                run.path(run.errors_path), "wb"
+            ) as stderr:
+                pipe = on_line is not None or not _has_fileno(stdout)
+                process = await asyncio.create_subprocess_exec(
+                    *run.command,
+                    cwd=working_directory,
+                    stdout=asyncio.subprocess.PIPE if pipe else stdout,
+                    stderr=stderr,
                 )
-            status = True
-        else:
-            logger.error("MotEvo run failed!")
-            status = False
+                try:
+                    returncode = await _wait_or_kill(
+                        process,
+                        retry.timeout,
+                        stdout=stdout if pipe else None,
+                        on_line=on_line,
+                    )
+                    timed_out = False
+                except asyncio.TimeoutError:
+                    logger.error(f"MotEvo run killed after {retry.timeout} seconds!")
+                    returncode, timed_out = None, True
+            duration = time.monotonic() - start
 
-        # Check if files were generated
-        if not os.path.exists(sitefile):
-            logger.error("MotEvo did not generate sites file.")
-            status = False
+            status = not timed_out and run.check(returncode, verbose)
+            attempts.append(Attempt(number, returncode, duration, timed_out, status))
+            if status:
+                break
 
-        if not os.path.exists(priorfile):
-            logger.error("MotEvo did not generate priors file.")
-            status = False
+    return await loop.run_in_executor(
+        None, functools.partial(run.result, status, attempts, on_metrics=on_metrics)
+    )
 
-        # In case user wants to run only once, we break the loop
-        # Otherwise, MotEvo will be attempted to run until it succeeds
-        if not try_until_succeeding:
-            break
 
-    # Change back to working directory
-    os.chdir(cwd)
+def _list_pwms(pwm_dir):
+    """
+    Map motif names (PWM file names without extension) to PWM paths in `pwm_dir`.
+    """
+    pwms = {}
+    for name in sorted(os.listdir(pwm_dir)):
+        path = os.path.join(pwm_dir, name)
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+        motif = os.path.splitext(name)[0]
+        if motif in pwms:
+            raise ValueError(
+                f"PWM files {pwms[motif]} and {path} map to the same motif {motif!r}"
+            )
+        pwms[motif] = path
+    return pwms
+
 
-    return (
-        os.path.join(working_directory, sitefile),
-        os.path.join(working_directory, priorfile),
+def _resolve_inputs(sequences_file, params, working_directory):
+    """
+    Turn the sequences file and input file options, which `run_motevo` resolves
+    relative to `working_directory`, into absolute paths so they stay valid when
+    MotEvo is started from a different directory.
+    """
+
+    def resolve(path):
+        return os.path.abspath(os.path.join(working_directory, path))
+
+    params = dict(params)
+    for name in _INPUT_FILE_PARAMETERS:
+        if params.get(name):
+            params[name] = resolve(params[name])
+    return resolve(sequences_file), params
+
+
+def _iter_pool(jobs, runs):
+    """
+    Call `run_motevo` with each of the keyword argument dictionaries in `runs` on
+    a pool of `jobs` processes, yielding `(key, result)` pairs as runs finish.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_motevo, **kwargs): key for key, kwargs in runs}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def iter_motevo_many(
+    sequences_file, pwm_dir, jobs=None, working_directory="./", motifs=None, **params
+):
+    """
+    Run MotEvo for every PWM in `pwm_dir` on a pool of `jobs` worker processes
+    and yield `(motif, (sites_file, priors_file))` pairs as runs finish.
+
+    Each motif is run in its own directory, `working_directory/<motif>`, so runs
+    never share parameter files, reports or outputs. `pwm_dir` may also be a
+    `PWMLibrary`, whose entries are then sent to the workers instead of paths.
+    When `motifs` is given, only those motifs are run. Remaining keyword
+    arguments are passed on to `run_motevo`.
+    """
+    sequences_file, params = _resolve_inputs(sequences_file, params, working_directory)
+    if isinstance(pwm_dir, PWMLibrary):
+        pwms = dict(pwm_dir.items())
+    else:
+        pwms = {
+            motif: os.path.abspath(wm_path)
+            for motif, wm_path in _list_pwms(
+                os.path.join(working_directory, pwm_dir)
+            ).items()
+        }
+
+    if motifs is not None:
+        motifs = set(motifs)
+        pwms = {motif: pwm for motif, pwm in pwms.items() if motif in motifs}
+
+    runs = []
+    for motif, wm_path in pwms.items():
+        job_directory = os.path.join(working_directory, motif)
+        os.makedirs(job_directory, exist_ok=True)
+        runs.append(
+            (
+                motif,
+                dict(
+                    sequences_file=sequences_file,
+                    wm_path=wm_path,
+                    working_directory=job_directory,
+                    **params,
+                ),
+            )
+        )
+
+    yield from _iter_pool(jobs, runs)
+
+
+def run_motevo_many(
+    sequences_file, pwm_dir, jobs=None, working_directory="./", **params
+):
+    """
+    Run MotEvo for every PWM in `pwm_dir` in parallel and return a dictionary
+    mapping motif names to `(sites_file, priors_file)` tuples. See
+    `iter_motevo_many` for details.
+    """
+    return dict(
+        iter_motevo_many(
+            sequences_file,
+            pwm_dir,
+            jobs=jobs,
+            working_directory=working_directory,
+            **params,
+        )
+    )
+
+
+# Parameters that only filter which sites MotEvo prints, swept without re-running
+_FILTER_PARAMETERS = ("minposterior",)
+
+
+def _sweep_points(grid, params):
+    """
+    Grid points of `grid` (a dictionary of MotEvo parameters to lists of values)
+    as a list of parameter dictionaries, and the MotEvo runs they need as a
+    dictionary mapping each run's parameters, without filter parameters, to the
+    loosest filter values of its points.
+    """
+    unknown = set(grid) - set(MOTEVO_PARAMETERS)
+    if unknown:
+        raise TypeError(f"Unknown MotEvo parameters: {', '.join(sorted(unknown))}")
+    both = set(grid) & set(params)
+    if both:
+        raise ValueError(
+            f"Parameters {', '.join(sorted(both))} are given both in the grid "
+            "and as fixed values"
+        )
+    empty = [name for name, values in grid.items() if not len(values)]
+    if empty:
+        raise ValueError(f"No values to sweep for {', '.join(empty)}")
+
+    names = list(grid)
+    points = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    runs = {}
+    for point in points:
+        run = tuple(
+            (name, value)
+            for name, value in point.items()
+            if name not in _FILTER_PARAMETERS
+        )
+        loosest = runs.setdefault(run, {})
+        for name in _FILTER_PARAMETERS:
+            value = point.get(name, params.get(name, DEFAULT_PARAMETERS.get(name)))
+            loosest[name] = min(loosest.get(name, value), value)
+    return points, runs
+
+
+def _site_statistics(sites_file, min_posterior):
+    """
+    Number of sites, of promoters with a site and the summed posterior of the
+    sites in `sites_file` with a posterior of at least `min_posterior`.
+    """
+    df = parse_sites(
+        sites_file,
+        min_posterior=min_posterior,
+        columns=[
+            "motif",
+            "reference_promoter",
+            "reference_binding_strand",
+            "motif_coordinates",
+            "posterior",
+        ],
+    )
+    sites = df.drop_duplicates(
+        ["reference_promoter", "reference_binding_strand", "motif_coordinates"]
+    )
+    motif = sites["motif"].iloc[0] if len(sites) else None
+    return motif, {
+        "sites": len(sites),
+        "promoters": sites["reference_promoter"].nunique(),
+        "posterior_sum": float(sites["posterior"].sum()),
+    }
+
+
+def sweep_motevo(
+    sequences_file, wm_path, grid, jobs=None, working_directory="./", **params
+):
+    """
+    Run MotEvo for every combination of the parameter values in `grid`, a
+    dictionary mapping MotEvo parameters to lists of values, on a pool of `jobs`
+    worker processes, and return the priors and site statistics of each grid point
+    as one long-format data frame.
+
+    Each run has its own directory in `working_directory`, named after its
+    parameters, and shares the input files of the other runs. Values of
+    `minposterior`, which only filters the sites MotEvo prints, don't need runs
+    of their own: points differing only in `minposterior` are read from a single
+    run with the lowest of their thresholds.
+
+    The data frame has a column per grid parameter, then `source` ("priors" or
+    "sites"), `motif`, `statistic` and `value`. Priors rows hold the
+    `final_prior`, `nr_of_sites` and `density` of each row of the priors file.
+    Sites rows hold the number of `sites` at the point's `minposterior`, of
+    `promoters` with a site and the `posterior_sum` of their posteriors.
+    Remaining keyword arguments are passed on to `run_motevo`.
+    """
+    points, runs = _sweep_points(grid, params)
+    sequences_file, params = _resolve_inputs(sequences_file, params, working_directory)
+    if not isinstance(wm_path, PWM):
+        wm_path = os.path.abspath(os.path.join(working_directory, wm_path))
+
+    jobs_parameters = []
+    for run, loosest in runs.items():
+        run_parameters = {**params, **dict(run), **loosest}
+        name = "_".join(f"{name}={value}" for name, value in run) or "default"
+        job_directory = os.path.join(working_directory, f"sweep_{name}")
+        os.makedirs(job_directory, exist_ok=True)
+        jobs_parameters.append(
+            (
+                run,
+                dict(
+                    sequences_file=sequences_file,
+                    wm_path=wm_path,
+                    working_directory=job_directory,
+                    **run_parameters,
+                ),
+            )
+        )
+    results = dict(_iter_pool(jobs, jobs_parameters))
+
+    rows = []
+    for point in points:
+        run = tuple(
+            (name, value)
+            for name, value in point.items()
+            if name not in _FILTER_PARAMETERS
+        )
+        sites_file, priors_file = results[run]
+        if not (os.path.exists(sites_file) and os.path.exists(priors_file)):
+            logger.error(f"MotEvo run failed for {dict(run)}, leaving it out.")
+            continue
+
+        values = list(point.values())
+        priors = parse_priors(priors_file)
+        for row in priors.itertuples(index=False):
+            for statistic in ("final_prior", "nr_of_sites", "density"):
+                rows.append(
+                    values + ["priors", row.motif, statistic, getattr(row, statistic)]
+                )
+
+        min_posterior = point.get(
+            "minposterior",
+            params.get("minposterior", DEFAULT_PARAMETERS["minposterior"]),
+        )
+        motif, statistics = _site_statistics(sites_file, min_posterior)
+        if motif is None:
+            motif = priors["motif"].iloc[0]
+        for statistic, value in statistics.items():
+            rows.append(values + ["sites", motif, statistic, value])
+
+    return pd.DataFrame(rows, columns=[*grid, "source", "motif", "statistic", "value"])
+
+
+def split_alignments(sequences_file, nr_of_shards, output_directory):
+    """
+    Split a MotEvo sequences or alignments file into at most `nr_of_shards` files
+    of similar size, cutting only at alignment block boundaries. Blocks start at
+    reference species headers (`>>`), or at every header when the file has no
+    reference species headers. Returns the list of shard paths in input order.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    shard_size = os.path.getsize(sequences_file) / nr_of_shards
+    name = os.path.basename(sequences_file)
+
+    shards = []
+    with AlignmentFile(sequences_file) as alignments:
+        # Move on to the next shard only at the start of a block
+        for i in range(len(alignments)):
+            start, _ = alignments.block_range(i)
+            if not shards or start >= len(shards) * shard_size:
+                shards.append([])
+            shards[-1].append(i)
+
+        return [
+            alignments.write(
+                os.path.join(output_directory, f"{shard_number}_{name}"), blocks
+            )
+            for shard_number, blocks in enumerate(shards)
+        ]
+
+
+def prefilter_alignments(sequences_file, matrices, min_score, output_path):
+    """
+    Write the alignment blocks of `sequences_file` whose reference sequence has a
+    window scoring at least `min_score` with any of the log-odds `matrices` (see
+    `motevowrapper.pwm.log_odds`), on either strand, to `output_path`. Returns
+    the numbers of kept and of all blocks.
+    """
+    with AlignmentFile(sequences_file) as alignments:
+        kept = [
+            i
+            for i in range(len(alignments))
+            if any(
+                max_score(matrix, encode(alignments.reference_sequence(i))) >= min_score
+                for matrix in matrices
+            )
+        ]
+        alignments.write(output_path, kept)
+        return len(kept), len(alignments)
+
+
+def merge_sites(sites_files, output_path):
+    """
+    Concatenate MotEvo sites files into one file that `parse_sites` can read.
+    """
+    with open(output_path, "wb") as output:
+        for path in sites_files:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, output)
+    return output_path
+
+
+def merge_priors(priors_files, output_path):
+    """
+    Combine the priors files of MotEvo runs over disjoint parts of the same input,
+    run with fixed priors (`EMprior=0`), into the priors file of a single run.
+
+    Numbers of sites add up and final priors are the same in every part. Site
+    densities are averaged, weighted by the number of positions in each part,
+    which the background row gives as `nr_of_sites / density`.
+    """
+    frames = [parse_priors(path) for path in priors_files]
+    return _write_priors(_combine_priors(frames), output_path)
+
+
+def _combine_priors(frames, fractions=None):
+    """
+    Combine priors data frames, see `merge_priors`. When given, `fractions` are
+    the parts of each frame's input that are kept: its numbers of sites and its
+    weight in the densities are scaled by them.
+    """
+    if fractions is None:
+        fractions = [1.0] * len(frames)
+    fractions = np.asarray(fractions, dtype=float)
+
+    weights = []
+    for df in frames:
+        background = df.loc[df["motif"] == "background"].iloc[0]
+        weights.append(
+            background["nr_of_sites"] / background["density"]
+            if background["density"]
+            else 0.0
+        )
+    weights = np.array(weights) * fractions
+
+    merged = frames[0][["motif", "final_prior"]].copy()
+    merged["nr_of_sites"] = sum(
+        df["nr_of_sites"].values * fraction for df, fraction in zip(frames, fractions)
+    )
+    merged["density"] = sum(
+        df["density"].values * weight for df, weight in zip(frames, weights)
+    ) / (weights.sum() or 1.0)
+    return merged
+
+
+def _write_priors(merged, output_path):
+    with open(output_path, "w") as f:
+        f.write("WM_name final_prior nr_of_sites density\n")
+        for row in merged.itertuples(index=False):
+            f.write(
+                f"{row.motif} {row.final_prior:g} {row.nr_of_sites:g} {row.density:g}\n"
+            )
+    return output_path
+
+
+def run_motevo_sharded(
+    sequences_file, wm_path, shards=None, working_directory="./", **params
+):
+    """
+    Run MotEvo for a single PWM on `shards` processes by splitting the sequences
+    file at alignment block boundaries, and merge the per-shard outputs into one
+    sites and one priors file in `working_directory`. The shard runs, in
+    `working_directory/shards`, are removed once merged.
+
+    Shards only give the same result as a single run when priors are fixed, so
+    runs with `EMprior` enabled are rejected. Remaining keyword arguments are
+    passed on to `run_motevo`. Returns the merged `(sites_file, priors_file)`.
+    """
+    if params.get("EMprior"):
+        raise ValueError(
+            "Sharded MotEvo runs require fixed priors. Run with EMprior=0 and set "
+            "bgprior and UFEwmprior to the priors to use."
+        )
+
+    pwm_name = os.path.basename(wm_path)
+    sitefile = params.pop("sitefile", None) or f"sites_{pwm_name}"
+    priorfile = params.pop("priorfile", None) or f"priors_{pwm_name}"
+
+    sequences_file, params = _resolve_inputs(sequences_file, params, working_directory)
+    wm_path = os.path.abspath(os.path.join(working_directory, wm_path))
+
+    shards_directory = os.path.join(working_directory, "shards")
+    shard_paths = split_alignments(
+        sequences_file, shards or os.cpu_count(), shards_directory
+    )
+
+    runs = []
+    for i, shard_path in enumerate(shard_paths):
+        job_directory = os.path.join(shards_directory, str(i))
+        os.makedirs(job_directory, exist_ok=True)
+        runs.append(
+            (
+                i,
+                dict(
+                    sequences_file=os.path.abspath(shard_path),
+                    wm_path=wm_path,
+                    working_directory=job_directory,
+                    **params,
+                ),
+            )
+        )
+    results = dict(_iter_pool(len(runs), runs))
+
+    # The shards are copies of the input, so only per-shard outputs are kept
+    for shard_path in shard_paths:
+        os.remove(shard_path)
+
+    sites_files = [results[i][0] for i in range(len(runs))]
+    priors_files = [results[i][1] for i in range(len(runs))]
+    for path in sites_files + priors_files:
+        if not os.path.exists(path):
+            logger.error(f"MotEvo did not generate {path}, not merging shards.")
+            return None
+
+    merged = (
+        merge_sites(sites_files, os.path.join(working_directory, sitefile)),
+        merge_priors(priors_files, os.path.join(working_directory, priorfile)),
+    )
+    # Shard outputs left next to the merged ones would be parsed as other runs
+    # of the same PWM by `parse_output_dir`
+    shutil.rmtree(shards_directory)
+    return merged
+
+
+def _sites_by_promoter(path):
+    """
+    Group the lines of a MotEvo sites file by the reference promoter of their
+    site, in file order. Returns a dictionary mapping promoter IDs to bytes.
+    """
+    groups = {}
+    group = None
+    with open(path, "rb") as f:
+        for line in f:
+            # Site header lines start with motif coordinates, e.g. "471-491"
+            if line[:1].isdigit():
+                group = groups.setdefault(line.split()[4].decode("ascii"), [])
+            if group is not None:
+                group.append(line)
+    return {promoter: b"".join(lines) for promoter, lines in groups.items()}
+
+
+def _read_manifest(path, key, sites_path, priors_path):
+    """
+    The manifest at `path` when it was written for runs with the same `key` and
+    its outputs are unchanged, otherwise None.
+    """
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        manifest.get("key") != key
+        or not os.path.exists(priors_path)
+        or not os.path.exists(sites_path)
+        or os.path.getsize(sites_path) != manifest.get("sites_size")
+    ):
+        return None
+    return manifest
+
+
+def run_motevo_incremental(sequences_file, wm_path, working_directory="./", **params):
+    """
+    Run MotEvo for a single PWM on the alignment blocks of `sequences_file` that
+    changed since the last incremental run in `working_directory`, and update
+    its sites and priors files.
+
+    Each block is identified by a hash of its text. A manifest next to the outputs,
+    `manifest_<PWM>.json`, maps block hashes to the byte range of their sites in
+    the sites file. On a re-run, only new or changed blocks are passed to MotEvo.
+    Sites of unchanged blocks are copied from the previous sites file, and sites
+    of removed blocks are dropped. Changing the PWM, the UFE model or any MotEvo
+    parameter starts over with a full run.
+
+    Like sharding, this only gives the result of a full run when priors are
+    fixed, so runs with `EMprior` enabled are rejected. Numbers of sites and
+    densities in the priors file combine those of the runs the current blocks
+    come from, scaled by the part of each run's positions still present.
+    Remaining keyword arguments are passed on to `run_motevo`. Returns the
+    `(sites_file, priors_file)` paths.
+    """
+    if params.get("EMprior"):
+        raise ValueError(
+            "Incremental MotEvo runs require fixed priors. Run with EMprior=0 and "
+            "set bgprior and UFEwmprior to the priors to use."
+        )
+
+    pwm_name = os.path.basename(wm_path)
+    sites_path = os.path.join(
+        working_directory, params.pop("sitefile", None) or f"sites_{pwm_name}"
     )
+    priors_path = os.path.join(
+        working_directory, params.pop("priorfile", None) or f"priors_{pwm_name}"
+    )
+    manifest_path = os.path.join(working_directory, f"manifest_{pwm_name}.json")
+
+    sequences_file, params = _resolve_inputs(sequences_file, params, working_directory)
+    wm_path = os.path.abspath(os.path.join(working_directory, wm_path))
+
+    # Everything but the sequences, which are compared block by block
+    template = _ParameterTemplate(
+        _check_parameters(
+            {name: value for name, value in params.items() if name in MOTEVO_PARAMETERS}
+        )
+    )
+    key = run_key(
+        None,
+        wm_path,
+        template.render("sites", "priors", _pwm_length(wm_path)),
+        UFEwmfile=params.get("UFEwmfile"),
+    )
+    manifest = _read_manifest(manifest_path, key, sites_path, priors_path)
+    previous = manifest["blocks"] if manifest else {}
+    batches = manifest["batches"] if manifest else {}
+
+    with AlignmentFile(sequences_file) as alignments:
+        blocks = []
+        for i, (promoter_id, block) in enumerate(alignments.iter_blocks()):
+            reference = alignments.reference_sequence(i)
+            positions = len(reference) - reference.count(b"-")
+            blocks.append((hashlib.sha256(block).hexdigest(), promoter_id, positions))
+
+        changed = {}
+        for i, (block_hash, promoter_id, positions) in enumerate(blocks):
+            if block_hash not in previous and block_hash not in changed:
+                changed[block_hash] = i
+        removed = len(set(previous) - {block[0] for block in blocks})
+        logger.info(
+            f"Scanning {len(changed)} new or changed of {len(blocks)} alignment "
+            f"blocks with {pwm_name}, {removed} removed."
+        )
+
+        new_sites = {}
+        if changed or not batches:
+            delta_directory = os.path.join(working_directory, "incremental")
+            os.makedirs(delta_directory, exist_ok=True)
+            delta_path = alignments.write(
+                os.path.join(delta_directory, f"changed_{pwm_name}.aln"),
+                sorted(changed.values()),
+            )
+            sites_file, priors_file = run_motevo(
+                os.path.abspath(delta_path),
+                wm_path,
+                working_directory=delta_directory,
+                **params,
+            )
+            os.remove(delta_path)
+            for path in (sites_file, priors_file):
+                if not os.path.exists(path):
+                    logger.error(f"MotEvo did not generate {path}, not updating.")
+                    return None
+
+            batch = str(max(map(int, batches), default=-1) + 1)
+            batches[batch] = {
+                "positions": sum(blocks[i][2] for i in changed.values()),
+                "priors": parse_priors(priors_file).values.tolist(),
+            }
+            new_sites = _sites_by_promoter(sites_file)
+
+            # The delta outputs live on in the manifest and the updated files,
+            # and would be parsed as another run of the PWM by `parse_output_dir`
+            for name in (f"sites_{pwm_name}", f"priors_{pwm_name}"):
+                path = os.path.join(delta_directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # Sites in the order of the blocks, from the previous or the new run
+    blocks_manifest = {}
+    tmp_path = temporary_path(sites_path)
+    with open(tmp_path, "wb") as output:
+        old_sites = open(sites_path, "rb") if previous else None
+        try:
+            for block_hash, promoter_id, positions in blocks:
+                if block_hash in previous:
+                    entry = previous[block_hash]
+                    start, end = entry["sites"]
+                    old_sites.seek(start)
+                    sites = old_sites.read(end - start)
+                else:
+                    entry = {"batch": batch, "positions": positions}
+                    sites = new_sites.get(promoter_id, b"")
+                start = output.tell()
+                output.write(sites)
+                blocks_manifest[block_hash] = {**entry, "sites": [start, output.tell()]}
+        finally:
+            if old_sites is not None:
+                old_sites.close()
+    os.replace(tmp_path, sites_path)
+
+    # Priors of the runs the blocks come from, for the part of them still used
+    kept = {}
+    for entry in blocks_manifest.values():
+        kept[entry["batch"]] = kept.get(entry["batch"], 0) + entry["positions"]
+    batches = {batch: batches[batch] for batch in sorted(kept, key=int)}
+    frames = [
+        pd.DataFrame(batches[batch]["priors"], columns=list(PRIORS_COLUMNS))
+        for batch in batches
+    ]
+    fractions = [
+        kept[batch] / batches[batch]["positions"] if batches[batch]["positions"] else 1
+        for batch in batches
+    ]
+    if frames:
+        _write_priors(_combine_priors(frames, fractions), priors_path)
+
+    write_atomic(
+        manifest_path,
+        json.dumps(
+            {
+                "key": key,
+                "sites_size": os.path.getsize(sites_path),
+                "blocks": blocks_manifest,
+                "batches": batches,
+            }
+        ).encode("utf-8"),
+    )
+    return sites_path, priors_path
+
+
+class UFEResult(str):
+    """
+    Path of the UFE model returned by `run_ufe`, with the `RunMetrics` of the
+    `runUFE` run behind it in `metrics`. Models taken from the cache have no
+    metrics.
+    """
+
+    def __new__(cls, output_path, metrics=None):
+        result = super().__new__(cls, output_path)
+        result.metrics = metrics
+        return result
+
+    def __getnewargs__(self):
+        return (str(self),)
+
+
+def _ufe_metrics(tree_file_path, output_path, start, duration, returncode, usage=()):
+    return RunMetrics(
+        "runUFE",
+        os.path.basename(tree_file_path),
+        returncode == 0,
+        1,
+        {"process": duration, "total": time.monotonic() - start},
+        *child_usage(usage),
+        input_size=file_size(tree_file_path),
+        output_size=file_size(output_path),
+        nr_of_sites=None,
+    )
+
+
+def _ufe_paths(tree_file_path, background, output_path, use_cache, cache_dir):
+    if not output_path:
+        output_path = "UFE_model"
+    output_path = os.path.join(os.getcwd(), output_path)
+
+    cached_path = None
+    if use_cache:
+        with open(tree_file_path, "r") as f:
+            key = ufe_key(f.read(), *background)
+        cached_path = os.path.join(cache_dir or default_cache_directory(), "ufe", key)
+    return output_path, cached_path
+
+
+def _cache_ufe_model(output_path, cached_path):
+    os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+    copy_atomic(output_path, cached_path)
 
 
 def run_ufe(
-    tree_file_path, bg_A=0.25, bg_C=0.25, bg_G=0.25, bg_T=0.25, output_path=None
+    tree_file_path,
+    bg_A=0.25,
+    bg_C=0.25,
+    bg_G=0.25,
+    bg_T=0.25,
+    output_path=None,
+    use_cache=True,
+    cache_dir=None,
+    executable="runUFE",
+    on_metrics=None,
+    timeout=None,
+    on_line=None,
 ):
+    """
+    Generate the UFE model for a phylogenetic tree and background with `runUFE`.
+
+    Models only depend on the tree and the background, so they are kept in a
+    persistent cache (`cache_dir`, see `default_cache_directory`) and reused
+    instead of running `runUFE` again. Set `use_cache=False` to always run it.
+    `runUFE` is killed after `timeout` seconds, raising `TimeoutError`.
+
+    The model is what `runUFE` writes to its standard output, so it has no
+    report: each line of the model is passed to `on_line` as it is written,
+    which is not called for cached models.
+
+    Returns the path of the model as a `UFEResult`. The metrics of a `runUFE` run
+    are in its `metrics` and are sent to `on_metrics`, see `run_motevo`.
+    """
+    start = time.monotonic()
+    background = (bg_A, bg_C, bg_G, bg_T)
+    output_path, cached_path = _ufe_paths(
+        tree_file_path, background, output_path, use_cache, cache_dir
+    )
+    if cached_path and os.path.exists(cached_path):
+        copy_atomic(cached_path, output_path)
+        return UFEResult(output_path)
+
     # Check if runUFE is installed
-    assert shell_call(["runUFE"]).returncode == 1, (
+    assert find_executable(executable), (
         "Could not find runUFE. Please check installation"
         "first by running `check_installation()` method!"
     )
 
-    if not output_path:
-        output_path = "UFE_model"
+    # The model is streamed into a temporary file, which replaces the output
+    # once runUFE is done
+    tmp_path = temporary_path(output_path)
+    errors_path = f"{tmp_path}.err"
+    usage = []
+    try:
+        process_start = time.monotonic()
+        with open(tmp_path, "wb") as f, open(errors_path, "wb") as errors:
+            returncode = _run_process(
+                [executable, tree_file_path, *(str(value) for value in background)],
+                None,
+                f,
+                errors,
+                timeout=timeout,
+                on_line=on_line,
+                usage=usage,
+            )
+        duration = time.monotonic() - process_start
+        if returncode is None:
+            logger.error(f"runUFE killed after {timeout} seconds!")
+            emit(
+                on_metrics,
+                _ufe_metrics(tree_file_path, tmp_path, start, duration, None, usage),
+            )
+            raise TimeoutError(f"runUFE killed after {timeout} seconds")
+        if os.path.getsize(errors_path):
+            with open(errors_path, "r", errors="replace") as errors:
+                logger.warning(f"runUFE: {errors.read()}")
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, errors_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if cached_path and returncode == 0 and os.path.getsize(output_path):
+        _cache_ufe_model(output_path, cached_path)
 
-    result = shell_call(
-        ["runUFE", tree_file_path, str(bg_A), str(bg_C), str(bg_G), str(bg_T)],
-        verbose=True,
+    metrics = _ufe_metrics(
+        tree_file_path, output_path, start, duration, returncode, usage
     )
+    emit(on_metrics, metrics)
+    return UFEResult(output_path, metrics)
 
-    with open(output_path, "w") as f:
-        f.write(result.stdout.decode("utf-8"))
 
-    return os.path.join(os.getcwd(), output_path)
+async def run_ufe_async(
+    tree_file_path,
+    bg_A=0.25,
+    bg_C=0.25,
+    bg_G=0.25,
+    bg_T=0.25,
+    output_path=None,
+    use_cache=True,
+    cache_dir=None,
+    semaphore=None,
+    on_metrics=None,
+    executable="runUFE",
+    timeout=None,
+    on_line=None,
+):
+    """
+    Asynchronous version of `run_ufe`. The model is streamed into a temporary
+    file next to `output_path`, which replaces `output_path` once `runUFE` is
+    done, and its lines are passed to `on_line`. See `run_motevo_async` for
+    `semaphore`, cancellation and metrics.
+    """
+    start = time.monotonic()
+    background = (bg_A, bg_C, bg_G, bg_T)
+    output_path, cached_path = _ufe_paths(
+        tree_file_path, background, output_path, use_cache, cache_dir
+    )
+    if cached_path and os.path.exists(cached_path):
+        copy_atomic(cached_path, output_path)
+        return UFEResult(output_path)
+
+    tmp_path = temporary_path(output_path)
+    errors_path = f"{tmp_path}.err"
+    try:
+        async with semaphore or asyncio.Semaphore():
+            process_start = time.monotonic()
+            with open(tmp_path, "wb") as f, open(errors_path, "wb") as errors:
+                process = await asyncio.create_subprocess_exec(
+                    executable,
+                    tree_file_path,
+                    *(str(value) for value in background),
+                    stdout=f if on_line is None else asyncio.subprocess.PIPE,
+                    stderr=errors,
+                )
+                try:
+                    returncode = await _wait_or_kill(
+                        process,
+                        timeout,
+                        stdout=None if on_line is None else f,
+                        on_line=on_line,
+                    )
+                except asyncio.TimeoutError:
+                    duration = time.monotonic() - process_start
+                    logger.error(f"runUFE killed after {timeout} seconds!")
+                    emit(
+                        on_metrics,
+                        _ufe_metrics(tree_file_path, tmp_path, start, duration, None),
+                    )
+                    raise TimeoutError(
+                        f"runUFE killed after {timeout} seconds"
+                    ) from None
+            duration = time.monotonic() - process_start
+        if os.path.getsize(errors_path):
+            with open(errors_path, "r", errors="replace") as errors:
+                logger.warning(f"runUFE: {errors.read()}")
+        os.replace(tmp_path, output_path)
+    finally:
+        for path in (tmp_path, errors_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if cached_path and returncode == 0 and os.path.getsize(output_path):
+        _cache_ufe_model(output_path, cached_path)
+
+    metrics = _ufe_metrics(tree_file_path, output_path, start, duration, returncode)
+    emit(on_metrics, metrics)
+    return UFEResult(output_path, metrics)
 
 
 def plot_site_distribution(motif, df, kind="ecdf"):
-    sns.set_context("talk")
-    sns.set_style("whitegrid")
-    sns.displot(data=df.groupby("reference_promoter").sum(), kind=kind, x="posterior")
-    plt.title(motif)
-    plt.show()
+    """
+    Plot the distribution of summed site posteriors per promoter, see
+    `motevowrapper.plotting`. Plotting needs the `plot` extra (seaborn).
+    """
+    # Imported here so that running and parsing never load the plotting stack
+    from motevowrapper.plotting import plot_site_distribution
+
+    plot_site_distribution(motif, df, kind=kind)
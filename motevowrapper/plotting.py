@@ -0,0 +1,10 @@
+import seaborn as sns
+import matplotlib.pyplot as plt
+
+
+def plot_site_distribution(motif, df, kind="ecdf"):
+    sns.set_context("talk")
+    sns.set_style("whitegrid")
+    sns.displot(data=df.groupby("reference_promoter").sum(), kind=kind, x="posterior")
+    plt.title(motif)
+    plt.show()
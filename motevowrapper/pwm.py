@@ -0,0 +1,245 @@
+import os
+import logging
+from collections import namedtuple
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = "ACGT"
+
+# Matrix column of each sequence byte: A, C, G and T in either case map to their
+# column, anything else (N and other ambiguity codes) to the extra column 4
+_CODES = np.full(256, 4, dtype=np.uint8)
+for _i, _base in enumerate(ALPHABET.encode("ascii")):
+    _CODES[_base] = _i
+    _CODES[ord(chr(_base).lower())] = _i
+
+# Alignment gap characters, which are removed before scanning
+_GAPS = b"-."
+
+# Column order of the reverse complement strand, with N staying N
+_COMPLEMENT = [3, 2, 1, 0, 4]
+
+
+def read_pwms(path):
+    """
+    Read the weight matrices in a MotEvo PWM file, in the `//`, `NA <name>`,
+    `P0 A C G T` count format, into a dictionary mapping matrix names to arrays
+    of counts with one row per position and columns in `ALPHABET` order.
+    Matrices without a `NA` line are named after the file.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    matrices = {}
+    name = None
+    order = list(range(4))
+    rows = []
+
+    def store():
+        key = name or (stem if stem not in matrices else f"{stem}_{len(matrices)}")
+        matrices[key] = np.array(rows, dtype=np.float64)[:, order]
+
+    with open(path, "r") as f:
+        for i, line in enumerate(f):
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0].startswith("//"):
+                if rows:
+                    store()
+                name = None
+                rows = []
+            elif fields[0] == "NA":
+                name = fields[1] if len(fields) > 1 else None
+            elif fields[0] == "P0":
+                # Columns may be listed in any order
+                order = [fields[1:5].index(base) for base in ALPHABET]
+            elif fields[0][:1].isdigit():
+                if len(fields) < 5:
+                    raise ValueError(f"Malformed PWM row at line {i} in {path}")
+                rows.append([float(value) for value in fields[1:5]])
+    if rows:
+        store()
+    return matrices
+
+
+def log_odds(counts, background=(0.25, 0.25, 0.25, 0.25), pseudocount=0.5):
+    """
+    Log-odds scores in bits of each base at each position of a count matrix,
+    against the `background` base frequencies given in `ALPHABET` order.
+    `pseudocount` is added to every count before normalizing.
+    """
+    counts = np.asarray(counts, dtype=np.float64) + pseudocount
+    probabilities = counts / counts.sum(axis=1, keepdims=True)
+    return np.log2(probabilities / np.asarray(background, dtype=np.float64))
+
+
+def encode(sequence):
+    """
+    Turn a sequence (str or bytes) into an array of matrix column codes, with
+    alignment gaps removed.
+    """
+    if isinstance(sequence, str):
+        sequence = sequence.encode("ascii")
+    sequence = bytes(sequence).translate(None, _GAPS)
+    return _CODES[np.frombuffer(sequence, dtype=np.uint8)]
+
+
+def scan(matrix, codes):
+    """
+    Score every window of an encoded sequence with a log-odds matrix on both
+    strands, returning the better strand's score per window. Ambiguous bases
+    score the best base of their position, so no window is underestimated.
+    """
+    length = len(matrix)
+    nr_of_windows = len(codes) - length + 1
+    if nr_of_windows < 1:
+        return np.empty(0)
+
+    forward = np.column_stack([matrix, matrix.max(axis=1)])
+    reverse = forward[::-1][:, _COMPLEMENT]
+
+    forward_scores = np.zeros(nr_of_windows)
+    reverse_scores = np.zeros(nr_of_windows)
+    for i in range(length):
+        window = codes[i : i + nr_of_windows]
+        forward_scores += forward[i, window]
+        reverse_scores += reverse[i, window]
+    return np.maximum(forward_scores, reverse_scores)
+
+
+def max_score(matrix, codes):
+    """
+    Best window score of an encoded sequence, or -inf when it is shorter than
+    the matrix.
+    """
+    scores = scan(matrix, codes)
+    return scores.max() if len(scores) else -np.inf
+
+
+def write_pwm(counts, path, name):
+    """
+    Write a count matrix in the MotEvo PWM format read by `read_pwms`.
+    """
+    with open(path, "w") as f:
+        f.write(f"//\nNA  {name}\nP0  {'  '.join(ALPHABET)}\n")
+        for i, row in enumerate(counts, start=1):
+            f.write(f"{i:02d}  {'  '.join(f'{value:g}' for value in row)}\n")
+        f.write("//\n")
+    return path
+
+
+class PWM(
+    namedtuple(
+        "PWM",
+        [
+            "name",
+            "path",
+            "counts",
+            "probabilities",
+            "log_odds",
+            "reverse_log_odds",
+            "consensus",
+        ],
+    )
+):
+    """
+    A weight matrix of a `PWMLibrary`. Matrices have one row per position and
+    columns in `ALPHABET` order; `reverse_log_odds` scores the reverse
+    complement strand. `path` is the PWM file holding only this matrix, or None
+    when the file holds several matrices.
+    """
+
+    __slots__ = ()
+
+    @property
+    def length(self):
+        return len(self.counts)
+
+
+class PWMLibrary:
+    """
+    All weight matrices of a directory of PWM files, loaded once into a few
+    contiguous arrays. Matrices are indexed by motif name: the file name without
+    extension for files holding a single matrix, as in `run_motevo_many`, and
+    the `NA` name for matrices of files holding several.
+
+    Log-odds are taken against `background` (in `ALPHABET` order) with
+    `pseudocount`, see `log_odds`. Libraries pickle as a handful of arrays, so
+    they are cheap to send to worker processes, and their `PWM` entries can be
+    passed to `run_motevo` instead of PWM file paths.
+    """
+
+    def __init__(self, pwm_dir, background=(0.25, 0.25, 0.25, 0.25), pseudocount=0.5):
+        self.background = tuple(background)
+        self.pseudocount = pseudocount
+
+        self.names = []
+        self.paths = []
+        matrices = []
+        for file_name in sorted(os.listdir(pwm_dir)):
+            path = os.path.abspath(os.path.join(pwm_dir, file_name))
+            if file_name.startswith(".") or not os.path.isfile(path):
+                continue
+            file_matrices = read_pwms(path)
+            if len(file_matrices) == 1:
+                file_matrices = {
+                    os.path.splitext(file_name)[0]: next(iter(file_matrices.values()))
+                }
+                path_or_none = path
+            else:
+                path_or_none = None
+            for name, counts in file_matrices.items():
+                if name in self.names:
+                    raise ValueError(f"Motif {name!r} is defined twice in {pwm_dir}")
+                self.names.append(name)
+                self.paths.append(path_or_none)
+                matrices.append(counts)
+
+        self._index = {name: i for i, name in enumerate(self.names)}
+        lengths = [len(counts) for counts in matrices]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+        self.counts = (
+            np.concatenate(matrices).astype(np.float32)
+            if matrices
+            else np.empty((0, 4), dtype=np.float32)
+        )
+        pseudocounts = self.counts + pseudocount
+        self.probabilities = pseudocounts / pseudocounts.sum(axis=1, keepdims=True)
+        self.log_odds = np.log2(
+            self.probabilities / np.asarray(background, dtype=np.float32)
+        ).astype(np.float32)
+        self.consensus = "".join(ALPHABET[i] for i in self.probabilities.argmax(axis=1))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __repr__(self):
+        return f"PWMLibrary({len(self)} matrices)"
+
+    def __getitem__(self, name):
+        i = self._index[name]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        log_odds = self.log_odds[start:end]
+        return PWM(
+            name=name,
+            path=self.paths[i],
+            counts=self.counts[start:end],
+            probabilities=self.probabilities[start:end],
+            log_odds=log_odds,
+            reverse_log_odds=log_odds[::-1, ::-1],
+            consensus=self.consensus[start:end],
+        )
+
+    def keys(self):
+        return list(self.names)
+
+    def items(self):
+        return [(name, self[name]) for name in self.names]
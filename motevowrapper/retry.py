@@ -0,0 +1,67 @@
+import itertools
+from collections import namedtuple
+
+# Record of a single attempt at running MotEvo. `duration` is the wall-clock time
+# in seconds and `timed_out` tells whether the process was killed after `timeout`.
+Attempt = namedtuple(
+    "Attempt", ["number", "returncode", "duration", "timed_out", "succeeded"]
+)
+
+
+class RetryPolicy:
+    """
+    How often and how long to try running MotEvo.
+
+    Runs are attempted at most `max_attempts` times (None for no limit). Each
+    attempt that takes longer than `timeout` seconds is killed. Before attempt
+    `n + 1`, the runner waits `backoff * backoff_factor ** (n - 1)` seconds, but
+    never longer than `max_backoff` seconds.
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        timeout=None,
+        backoff=1.0,
+        backoff_factor=2.0,
+        max_backoff=60.0,
+    ):
+        if max_attempts is not None and max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"timeout must be positive, got {timeout}")
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def __repr__(self):
+        return (
+            f"RetryPolicy(max_attempts={self.max_attempts}, timeout={self.timeout}, "
+            f"backoff={self.backoff}, backoff_factor={self.backoff_factor}, "
+            f"max_backoff={self.max_backoff})"
+        )
+
+    @classmethod
+    def from_arguments(cls, retry=None, try_until_succeeding=False):
+        """
+        The policy given as `retry`, or the one matching the older
+        `try_until_succeeding` flag: a single attempt, or attempts without limit.
+        """
+        if retry is not None:
+            return retry
+        if try_until_succeeding:
+            return cls(max_attempts=None)
+        return cls(max_attempts=1)
+
+    def attempt_numbers(self):
+        if self.max_attempts is None:
+            return itertools.count(1)
+        return range(1, self.max_attempts + 1)
+
+    def delay(self, number):
+        """
+        Seconds to wait after failed attempt `number` before the next one.
+        """
+        return min(self.backoff * self.backoff_factor ** (number - 1), self.max_backoff)
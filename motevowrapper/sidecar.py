@@ -0,0 +1,107 @@
+import os
+import json
+import logging
+
+from motevowrapper.cache import temporary_path
+
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_FORMATS = {"feather": ".feather", "parquet": ".parquet"}
+
+# Schema metadata key under which the source file's details are stored
+_METADATA_KEY = b"motevowrapper"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as exp:
+        raise ImportError(
+            "Sidecar files need pyarrow. Install it with "
+            "`pip install motevowrapper[arrow]`."
+        ) from exp
+    return pyarrow
+
+
+def sidecar_path(path, format="feather"):
+    if format not in SIDECAR_FORMATS:
+        raise ValueError(
+            f"Unknown sidecar format {format!r}, use one of {list(SIDECAR_FORMATS)}"
+        )
+    return f"{path}{SIDECAR_FORMATS[format]}"
+
+
+def source_metadata(path, kind):
+    """
+    What a sidecar of the file at `path` is checked against: the size and
+    modification time of the file, and the `kind` of data frame parsed from it.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "kind": kind}
+
+
+def _read_metadata(pa, path, format):
+    if format == "feather":
+        with pa.memory_map(path) as source:
+            schema = pa.ipc.open_file(source).schema
+    else:
+        schema = pa.parquet.read_schema(path)
+    metadata = (schema.metadata or {}).get(_METADATA_KEY)
+    return json.loads(metadata) if metadata else None
+
+
+def read_sidecar(path, format="feather", kind="sites", columns=None):
+    """
+    Load the data frame stored in the sidecar of the file at `path`, reading only
+    `columns` when given. Feather sidecars are memory-mapped. Returns None when
+    there is no sidecar, or when it is out of date with the file.
+    """
+    pa = _import_pyarrow()
+    sidecar = sidecar_path(path, format)
+    if not os.path.exists(sidecar):
+        return None
+
+    try:
+        metadata = _read_metadata(pa, sidecar, format)
+    except (OSError, ValueError, pa.ArrowException) as exp:
+        logger.error(f"Ignoring unreadable sidecar {sidecar}: {exp}")
+        return None
+    if metadata != source_metadata(path, kind):
+        return None
+
+    columns = list(columns) if columns is not None else None
+    if format == "feather":
+        table = pa.feather.read_table(sidecar, columns=columns, memory_map=True)
+    else:
+        table = pa.parquet.read_table(sidecar, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def write_sidecar(df, path, format="feather", metadata=None):
+    """
+    Store `df`, parsed from the file at `path`, in its sidecar. `metadata` is the
+    `source_metadata` of the file taken before parsing it. Feather sidecars are
+    written uncompressed, so they can be memory-mapped.
+    """
+    pa = _import_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), _METADATA_KEY: json.dumps(metadata)}
+    )
+
+    # Written through a temporary file, so readers never see a partial sidecar
+    sidecar = sidecar_path(path, format)
+    tmp_path = temporary_path(sidecar)
+    try:
+        if format == "feather":
+            pa.feather.write_feather(table, tmp_path, compression="uncompressed")
+        else:
+            pa.parquet.write_table(table, tmp_path)
+        os.replace(tmp_path, sidecar)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return sidecar
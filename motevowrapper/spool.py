@@ -0,0 +1,418 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import logging
+import tempfile
+import threading
+import multiprocessing
+
+from motevowrapper.cache import write_atomic
+from motevowrapper.motevowrapper import _list_pwms, _resolve_inputs, run_motevo
+
+
+logger = logging.getLogger(__name__)
+
+# Job states, each a subdirectory of the spool holding one JSON file per job
+STATES = ("pending", "leased", "done", "failed")
+
+
+def worker_id():
+    """
+    Name of a worker that is unique across the nodes sharing a spool.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """
+    A job claimed by a worker: the job in `job` and the path of its lease file.
+
+    While the lease is held, `keep_alive` touches the lease file so other
+    workers see that the job is still being worked on. A lease reclaimed after
+    it expired is `lost`, and its worker must not publish results.
+    """
+
+    def __init__(self, spool, path, job):
+        self.spool = spool
+        self.path = path
+        self.job = job
+        self.lost = False
+
+    def __repr__(self):
+        return f"Lease({self.job['id']!r}, {self.path!r})"
+
+    def renew(self):
+        """
+        Extend the lease. Returns False when it was lost.
+        """
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            self.lost = True
+        return not self.lost
+
+    def keep_alive(self, interval=None):
+        """
+        Context manager renewing the lease every `interval` seconds (a quarter
+        of the spool's lease timeout by default) in a background thread.
+        """
+        return _KeepAlive(self, interval or self.spool.lease_timeout / 4)
+
+
+class _KeepAlive:
+    def __init__(self, lease, interval):
+        self.lease = lease
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if not self.lease.renew():
+                logger.error(f"Lost the lease of job {self.lease.job['id']}.")
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self.lease
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class JobSpool:
+    """
+    Queue of MotEvo jobs kept as files in `directory`, on a filesystem shared by
+    the nodes running workers. No other service is needed.
+
+    Jobs are JSON files moving between the `pending`, `leased`, `done` and
+    `failed` subdirectories by renames, which are atomic: a worker claims a job
+    by renaming it from `pending` to a lease file of its own in `leased`, and
+    only one of several workers renaming the same job succeeds. Workers renew
+    their leases by touching the lease file. Leases not renewed for
+    `lease_timeout` seconds belong to crashed workers and are put back in
+    `pending` by `reclaim_expired`; jobs reclaimed or failed more than
+    `max_attempts` times are moved to `failed`.
+
+    Results are published to `results/<job id>` by renaming a complete staging
+    directory, so readers never see partial results.
+    """
+
+    def __init__(self, directory, lease_timeout=600, max_attempts=3):
+        self.directory = directory
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        for name in STATES + ("results",):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+
+    def __repr__(self):
+        return f"JobSpool({self.directory!r})"
+
+    def path(self, state, name=""):
+        return os.path.join(self.directory, state, name)
+
+    def _jobs(self, state):
+        return sorted(
+            name
+            for name in os.listdir(self.path(state))
+            if name.endswith(".json") and not name.startswith(".")
+        )
+
+    def _job_ids(self, state):
+        return [name[: -len(".json")].partition("@")[0] for name in self._jobs(state)]
+
+    def _write(self, path, job):
+        write_atomic(path, json.dumps(job).encode("utf-8"))
+
+    def submit(self, sequences_file, wm_path, job_id=None, **params):
+        """
+        Add a job running `run_motevo` on `sequences_file` with the PWM at
+        `wm_path` and the remaining keyword arguments, which must be JSON
+        serializable. Relative paths, including those of input file options such
+        as `UFEwmfile`, are made absolute from the current directory, and must be
+        valid on every node. Jobs are named after the PWM by default; a job whose
+        name is already in the spool is not added again, so submitting a library
+        twice only adds its new PWMs. Returns the job ID.
+        """
+        return self._submit(sequences_file, wm_path, job_id, params, self.jobs())
+
+    def _submit(self, sequences_file, wm_path, job_id, params, existing):
+        if job_id is None:
+            job_id = os.path.splitext(os.path.basename(wm_path))[0]
+        if "@" in job_id or os.sep in job_id or job_id.startswith("."):
+            raise ValueError(f"Invalid job ID {job_id!r}")
+        if job_id in existing:
+            return job_id
+
+        # Workers run jobs from their own scratch directories
+        sequences_file, params = _resolve_inputs(sequences_file, params, "./")
+        job = {
+            "id": job_id,
+            "sequences_file": sequences_file,
+            "wm_path": os.path.abspath(wm_path),
+            "params": params,
+            "attempts": 0,
+        }
+        self._write(self.path("pending", f"{job_id}.json"), job)
+        return job_id
+
+    def submit_many(self, sequences_file, pwm_dir, **params):
+        """
+        Submit a job for every PWM in `pwm_dir`, named after the motif. Returns
+        the job IDs.
+        """
+        existing = self.jobs()
+        return [
+            self._submit(sequences_file, wm_path, motif, params, existing)
+            for motif, wm_path in _list_pwms(pwm_dir).items()
+        ]
+
+    def jobs(self):
+        """
+        Map job IDs to their states.
+        """
+        return {job_id: state for state in STATES for job_id in self._job_ids(state)}
+
+    def status(self):
+        """
+        Number of jobs in each state.
+        """
+        return {state: len(self._jobs(state)) for state in STATES}
+
+    def claim(self, worker):
+        """
+        Lease the next pending job to the worker named `worker`, see
+        `worker_id`. Returns a `Lease`, or None when no job is pending.
+        """
+        for name in self._jobs("pending"):
+            job_id = name[: -len(".json")]
+            path = self.path("leased", f"{job_id}@{worker}.json")
+            try:
+                # The lease starts now, not when the job was submitted
+                os.utime(self.path("pending", name))
+                os.rename(self.path("pending", name), path)
+            except FileNotFoundError:
+                # Claimed by another worker
+                continue
+            with open(path) as f:
+                return Lease(self, path, json.load(f))
+        return None
+
+    def reclaim_expired(self):
+        """
+        Put jobs whose leases expired back in `pending`, or in `failed` when they
+        were attempted `max_attempts` times. Returns the number of jobs reclaimed.
+        """
+        reclaimed = 0
+        now = time.time()
+        for name in self._jobs("leased"):
+            path = self.path("leased", name)
+            try:
+                expired = now - os.stat(path).st_mtime > self.lease_timeout
+            except FileNotFoundError:
+                continue
+            if not expired:
+                continue
+
+            staging = self._unlease(path)
+            if staging is None:
+                continue
+            with open(staging) as f:
+                job = json.load(f)
+            logger.warning(f"Lease {name} expired, reclaiming job {job['id']}.")
+            job["attempts"] += 1
+            self._requeue(staging, job, "lease expired")
+            reclaimed += 1
+        return reclaimed
+
+    def _unlease(self, path):
+        """
+        Move the lease file at `path` out of `leased` to a hidden file in
+        `pending`, so only one process ends a lease. Returns the new path, or
+        None when the lease was already ended.
+        """
+        staging = self.path("pending", f".{uuid.uuid4().hex}.requeue")
+        try:
+            os.rename(path, staging)
+        except FileNotFoundError:
+            return None
+        return staging
+
+    def _requeue(self, path, job, error):
+        """
+        Move the job file at `path` back to `pending`, or to `failed` once it
+        was attempted `max_attempts` times.
+        """
+        if self.max_attempts is not None and job["attempts"] >= self.max_attempts:
+            job["error"] = error
+            state = "failed"
+        else:
+            state = "pending"
+        self._write(path, job)
+        os.rename(path, self.path(state, f"{job['id']}.json"))
+
+    def complete(self, lease, sites_file, priors_file):
+        """
+        Publish the outputs of a leased job to `results/<job id>` and mark it
+        done. Returns False when the lease was lost, in which case nothing is
+        published.
+        """
+        if not lease.renew():
+            return False
+
+        job_id = lease.job["id"]
+        staging = tempfile.mkdtemp(prefix=f".{job_id}-", dir=self.path("results"))
+        try:
+            result = {}
+            for name, path in (
+                ("sites_file", sites_file),
+                ("priors_file", priors_file),
+            ):
+                shutil.copyfile(path, os.path.join(staging, os.path.basename(path)))
+                result[name] = os.path.basename(path)
+            with open(os.path.join(staging, "result.json"), "w") as f:
+                json.dump(result, f)
+            try:
+                os.rename(staging, self.path("results", job_id))
+            except OSError:
+                # Published by an earlier lease holder, whose results are kept
+                pass
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        try:
+            os.rename(lease.path, self.path("done", f"{job_id}.json"))
+        except FileNotFoundError:
+            lease.lost = True
+            return False
+        return True
+
+    def fail(self, lease, error):
+        """
+        Give up a leased job after a failed run: it is tried again, unless it was
+        attempted `max_attempts` times.
+        """
+        staging = self._unlease(lease.path)
+        if staging is None:
+            lease.lost = True
+            return
+        lease.job["attempts"] += 1
+        self._requeue(staging, lease.job, str(error))
+
+    def results(self):
+        """
+        Map the IDs of finished jobs to their published `(sites_file,
+        priors_file)`.
+        """
+        results = {}
+        for job_id in self._job_ids("done"):
+            directory = self.path("results", job_id)
+            with open(os.path.join(directory, "result.json")) as f:
+                result = json.load(f)
+            results[job_id] = (
+                os.path.join(directory, result["sites_file"]),
+                os.path.join(directory, result["priors_file"]),
+            )
+        return results
+
+    def wait(self, poll_interval=5, timeout=None):
+        """
+        Wait until no job is pending or leased, reclaiming expired leases, and
+        return `results()`. Raises `TimeoutError` after `timeout` seconds.
+        """
+        start = time.monotonic()
+        while True:
+            self.reclaim_expired()
+            status = self.status()
+            if not status["pending"] and not status["leased"]:
+                return self.results()
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(
+                    f"Jobs still queued after {timeout} seconds: {status}"
+                )
+            time.sleep(poll_interval)
+
+
+def run_job(spool, lease, scratch_directory=None):
+    """
+    Run a leased job in a private scratch directory and publish its results.
+    Returns whether the job succeeded.
+    """
+    job = lease.job
+    scratch = tempfile.mkdtemp(prefix=f"{job['id']}-", dir=scratch_directory)
+    try:
+        with lease.keep_alive():
+            try:
+                sites_file, priors_file = run_motevo(
+                    job["sequences_file"],
+                    job["wm_path"],
+                    working_directory=scratch,
+                    **job["params"],
+                )
+            except Exception as exp:
+                logger.error(f"Job {job['id']} failed: {exp}")
+                spool.fail(lease, exp)
+                return False
+
+            if not (os.path.exists(sites_file) and os.path.exists(priors_file)):
+                spool.fail(lease, "MotEvo did not generate its outputs")
+                return False
+            return spool.complete(lease, sites_file, priors_file)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_worker(
+    directory,
+    scratch_directory=None,
+    poll_interval=5,
+    exit_when_idle=True,
+    max_jobs=None,
+    **spool_options,
+):
+    """
+    Claim and run jobs from the spool in `directory` until none is left (or,
+    with `exit_when_idle=False`, forever), checking for new jobs every
+    `poll_interval` seconds. Jobs run in temporary directories under
+    `scratch_directory`, which can be node-local. Workers can be started on
+    any node at any time, also while a scan is running. Returns the number of
+    jobs run.
+    """
+    spool = JobSpool(directory, **spool_options)
+    worker = worker_id()
+    nr_of_jobs = 0
+    while max_jobs is None or nr_of_jobs < max_jobs:
+        lease = spool.claim(worker)
+        if lease is None and spool.reclaim_expired():
+            lease = spool.claim(worker)
+        if lease is None:
+            # Leased jobs may still come back if their worker crashes
+            if exit_when_idle and not spool.status()["leased"]:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker} running job {lease.job['id']}.")
+        run_job(spool, lease, scratch_directory)
+        nr_of_jobs += 1
+    return nr_of_jobs
+
+
+def start_workers(directory, nr_of_workers, **kwargs):
+    """
+    Start `nr_of_workers` worker processes on this node, see `run_worker`, and
+    return them as `multiprocessing.Process` objects.
+    """
+    workers = [
+        multiprocessing.Process(
+            target=run_worker, args=(directory,), kwargs=kwargs, daemon=True
+        )
+        for _ in range(nr_of_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
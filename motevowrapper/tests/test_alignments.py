@@ -0,0 +1,73 @@
+import os
+import unittest
+
+from motevowrapper.alignments import AlignmentFile, species_of
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+if not os.path.exists(OUTPUT_PATH):
+    os.mkdir(OUTPUT_PATH)
+
+
+class TestAlignmentFile(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(DATA_PATH, "zebrafish_alignments.aln")
+        self.alignments = AlignmentFile(self.path)
+
+    def tearDown(self):
+        self.alignments.close()
+
+    def test_index(self):
+        self.assertEqual(len(self.alignments), 10)
+        self.assertEqual(self.alignments.nr_of_records, 41)
+        self.assertEqual(
+            self.alignments.block_ids[:2],
+            [
+                "danRer11_chr21_11468142_11469142_+",
+                "danRer11_chr10_21587502_21588502_+",
+            ],
+        )
+        self.assertEqual(
+            self.alignments.species(),
+            ["astMex", "danRer11", "esoLuc", "ictPun", "pygNat"],
+        )
+        self.assertEqual(len(self.alignments.records("danRer11")), len(self.alignments))
+        self.assertEqual(species_of("ictPun_chr18_5980765_5981709_+"), "ictPun")
+
+    def test_random_access(self):
+        with open(self.path, "rb") as f:
+            content = f.read()
+        self.assertEqual(b"".join(self.alignments), content)
+
+        block = self.alignments["danRer11_chr10_21587502_21588502_+"]
+        self.assertEqual(block, self.alignments[1])
+        self.assertTrue(block.startswith(b">>danRer11_chr10_21587502_21588502_+\n"))
+        self.assertIn(b">ictPun_chr16_22120604_22121607_-\n", block)
+
+        sequence = self.alignments.sequence("ictPun_chr18_5980765_5981709_+")
+        self.assertTrue(sequence.startswith(b"ATCCCAACTCAC--AACC"))
+        self.assertNotIn(b"\n", sequence)
+        self.assertEqual(
+            self.alignments.reference_sequence(0),
+            self.alignments.sequence("danRer11_chr21_11468142_11469142_+"),
+        )
+        with self.assertRaises(KeyError):
+            self.alignments["danRer11_unknown"]
+
+    def test_writing(self):
+        output_path = os.path.join(OUTPUT_PATH, "subset.aln")
+        self.alignments.write(output_path, [3, 4, "danRer11_chr10_21587502_21588502_+"])
+        with open(output_path, "rb") as f:
+            self.assertEqual(
+                f.read(), self.alignments[3] + self.alignments[4] + self.alignments[1]
+            )
+
+    def test_sequences_file(self):
+        with AlignmentFile(os.path.join(DATA_PATH, "zebrafish_promoters.fa")) as f:
+            self.assertEqual(len(f), 10)
+            self.assertEqual(f.nr_of_records, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,40 @@
 import unittest
+import asyncio
+import io
 import os
+import sys
+import shutil
 import pandas as pd
+import numpy as np
 from pandas.util.testing import assert_equal, assert_frame_equal
 
 from motevowrapper.motevowrapper import (
+    MotevoEngine,
+    _MotevoRun,
+    _ParameterTemplate,
+    _check_parameters,
+    _run_process,
+    _sweep_points,
+    find_executable,
+    find_output_files,
+    iter_sites,
+    parse_output_dir,
     parse_sites,
     parse_priors,
     run_motevo,
+    run_motevo_async,
+    run_motevo_incremental,
+    run_motevo_many,
+    run_motevo_sharded,
+    split_alignments,
+    sweep_motevo,
     run_ufe,
+    run_ufe_async,
     shell_call,
 )
+from motevowrapper import ufe
+from motevowrapper.alignments import AlignmentFile
+from motevowrapper.cache import ufe_key
 
 BASE_PATH = os.path.abspath(os.path.dirname(__file__))
 DATA_PATH = os.path.join(BASE_PATH, "data")
@@ -18,6 +43,16 @@ if not os.path.exists(OUTPUT_PATH):
     os.mkdir(OUTPUT_PATH)
 
 
+def assert_priors_close(expected, df):
+    # Priors of runs on parts of the alignments differ in the last digits
+    assert_equal(list(df.columns), list(expected.columns))
+    assert_equal(list(df["motif"]), list(expected["motif"]))
+    numbers = ["final_prior", "nr_of_sites", "density"]
+    np.testing.assert_allclose(
+        df[numbers].astype(float), expected[numbers].astype(float), rtol=1e-5
+    )
+
+
 class TestMotevoWrapper(unittest.TestCase):
     def test_parsing_sites(self):
         motifs = ["REST"] * 15
@@ -163,6 +198,98 @@ class TestMotevoWrapper(unittest.TestCase):
 
         assert_frame_equal(values_df, results_df, check_dtype=False)
 
+    def test_iterating_sites(self):
+        sites = list(iter_sites(os.path.join(DATA_PATH, "sites_REST.wm")))
+        self.assertEqual(len(sites), 15)
+        self.assertEqual(
+            sites[7],
+            {
+                "motif": "REST",
+                "reference_promoter": "danRer11_chr25_5034843_5035843_+",
+                "reference_binding_strand": "+",
+                "motif_coordinates": "896-916",
+                "posterior": 0.999404,
+                "aligned_promoter": "ictPun_chr14_23588333_23589324_-",
+                "score": 14.0058,
+                "binding_sequence": "GCTACTGTCCATGGTGCTGTT",
+            },
+        )
+
+    def test_parsing_sites_in_chunks(self):
+        path = os.path.join(DATA_PATH, "sites_REST.wm")
+        chunks = list(parse_sites(path, chunksize=4))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 4, 3])
+        assert_frame_equal(parse_sites(path), pd.concat(chunks, ignore_index=True))
+
+    def test_parsing_sites_columnar(self):
+        path = os.path.join(DATA_PATH, "sites_REST.wm")
+        expected = parse_sites(path)
+        results_df = parse_sites(path, engine="columnar")
+
+        self.assertEqual(results_df["start"].dtype, np.int32)
+        self.assertEqual(results_df["posterior"].dtype, np.float32)
+        self.assertEqual(results_df["reference_promoter"].dtype, "category")
+        self.assertEqual(
+            list(results_df["start"].astype(str) + "-" + results_df["end"].astype(str)),
+            list(expected["motif_coordinates"]),
+        )
+        for column in ["motif", "reference_promoter", "aligned_promoter"]:
+            self.assertEqual(list(results_df[column]), list(expected[column]))
+        np.testing.assert_allclose(results_df["score"], expected["score"], rtol=1e-6)
+
+        chunks = list(parse_sites(path, chunksize=10, engine="columnar"))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 5])
+
+    def test_parsing_sites_filtered(self):
+        path = os.path.join(DATA_PATH, "sites_REST.wm")
+        df = parse_sites(path)
+        species = df["aligned_promoter"].str.partition("_")[0]
+        expected = df[(df["posterior"] >= 0.5) & (species == "danRer11")]
+        expected = expected[["reference_promoter", "score"]].reset_index(drop=True)
+
+        for engine in ["python", "columnar"]:
+            results_df = parse_sites(
+                path,
+                engine=engine,
+                min_posterior=0.5,
+                species="danRer11",
+                columns=["reference_promoter", "score"],
+            )
+            self.assertEqual(list(results_df.columns), ["reference_promoter", "score"])
+            assert_frame_equal(
+                expected, results_df, check_dtype=False, check_categorical=False
+            )
+
+        results_df = parse_sites(path, promoters=["danRer11_chr25_5034843_5035843_+"])
+        self.assertEqual(len(results_df), 2)
+        self.assertEqual(len(parse_sites(path, min_posterior=1.5)), 0)
+
+    def test_parsing_output_dir(self):
+        output_dir = os.path.join(OUTPUT_PATH, "output_dir")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        for motif in ["REST", "REST2"]:
+            os.makedirs(os.path.join(output_dir, motif))
+            for kind in ["sites", "priors"]:
+                shutil.copyfile(
+                    os.path.join(DATA_PATH, f"{kind}_REST.wm"),
+                    os.path.join(output_dir, motif, f"{kind}_{motif}.wm"),
+                )
+
+        sites_df, priors_df = parse_output_dir(output_dir, jobs=2)
+        self.assertEqual(list(sites_df["pwm"].cat.categories), ["REST", "REST2"])
+        self.assertEqual(list(sites_df["pwm"].value_counts(sort=False)), [15, 15])
+        self.assertEqual(sites_df["reference_promoter"].dtype, "category")
+        self.assertEqual(list(priors_df["pwm"]), ["REST"] * 3 + ["REST2"] * 3)
+
+        expected = parse_sites(
+            os.path.join(DATA_PATH, "sites_REST.wm"), engine="columnar"
+        )
+        rest2 = sites_df[sites_df["pwm"] == "REST2"].reset_index(drop=True)
+        assert_frame_equal(expected, rest2.drop(columns="pwm"), check_categorical=False)
+
+        serial_sites_df, _ = parse_output_dir(output_dir, jobs=1)
+        assert_frame_equal(sites_df, serial_sites_df)
+
     def test_parsing_priors(self):
         motifs = ["REST", "background", "UFEwm"]
         final_priors = [0.00310981, 0.828626, 0.168265]
@@ -181,6 +308,26 @@ class TestMotevoWrapper(unittest.TestCase):
 
         assert_frame_equal(values_df, results_df, check_dtype=False)
 
+    def test_parsing_priors_many(self):
+        path = os.path.join(OUTPUT_PATH, "priors_many.wm")
+        with open(path, "w") as f:
+            f.write("WM_name final_prior nr_of_sites density\n")
+            f.write("REST 0.002 5.5 0.01\n")
+            f.write("NRSF 0.001 2 0.005\n")
+            f.write("background 0.997 1800.2 0.19\n")
+
+        results_df = parse_priors(path)
+        self.assertEqual(list(results_df["motif"]), ["REST", "NRSF", "background"])
+        self.assertEqual(list(results_df["nr_of_sites"]), [5.5, 2.0, 1800.2])
+
+        rest_path = os.path.join(DATA_PATH, "priors_REST.wm")
+        results_df = parse_priors([rest_path, path])
+        self.assertEqual(len(results_df), 6)
+        self.assertEqual(list(results_df["file"].cat.categories), [rest_path, path])
+        assert_frame_equal(
+            parse_priors(rest_path), results_df.iloc[:3].drop(columns="file")
+        )
+
     def test_motevo_run(self):
         result = run_motevo(
             sequences_file=os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
@@ -188,7 +335,8 @@ class TestMotevoWrapper(unittest.TestCase):
             wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
             TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
             refspecies="danRer11",
-            EMprior=0,
+            # The fixtures come from a run where MotEvo estimated the priors
+            EMprior=1,
             UFEwmprior=500,
             UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
             UFEwmlen="auto",
@@ -204,6 +352,567 @@ class TestMotevoWrapper(unittest.TestCase):
         results_2 = parse_priors(os.path.join(OUTPUT_PATH, "priors_REST.wm"))
         assert_frame_equal(results_1, results_2, check_dtype=False)
 
+        self.assertTrue(result.metrics.succeeded)
+        self.assertEqual(result.metrics.nr_of_sites, 10)
+
+    def test_motevo_run_many(self):
+        cwd = os.getcwd()
+        working_directory = os.path.join(OUTPUT_PATH, "many")
+        os.makedirs(working_directory, exist_ok=True)
+        results = run_motevo_many(
+            sequences_file=os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+            pwm_dir=os.path.join(DATA_PATH, "pwmdir"),
+            jobs=2,
+            working_directory=working_directory,
+            TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+            refspecies="danRer11",
+            EMprior=1,
+            UFEwmprior=500,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+            UFEwmlen="auto",
+            bgprior=0.8,
+        )
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(list(results), ["REST"])
+
+        sites_file, priors_file = results["REST"]
+        self.assertEqual(
+            sites_file, os.path.join(working_directory, "REST", "sites_REST.wm")
+        )
+        assert_frame_equal(
+            parse_sites(os.path.join(DATA_PATH, "sites_REST.wm")),
+            parse_sites(sites_file),
+            check_dtype=False,
+        )
+        assert_frame_equal(
+            parse_priors(os.path.join(DATA_PATH, "priors_REST.wm")),
+            parse_priors(priors_file),
+            check_dtype=False,
+        )
+
+    def test_splitting_alignments(self):
+        sequences_file = os.path.join(DATA_PATH, "zebrafish_alignments.aln")
+        shard_paths = split_alignments(
+            sequences_file, 3, os.path.join(OUTPUT_PATH, "split")
+        )
+        self.assertEqual(len(shard_paths), 3)
+
+        shards = []
+        for path in shard_paths:
+            with open(path) as f:
+                shards.append(f.read())
+        with open(sequences_file) as f:
+            self.assertEqual("".join(shards), f.read())
+        for shard in shards:
+            self.assertTrue(shard.startswith(">>"))
+
+    def test_motevo_run_sharded(self):
+        working_directory = os.path.join(OUTPUT_PATH, "sharded")
+        shutil.rmtree(working_directory, ignore_errors=True)
+        os.makedirs(working_directory)
+        single_directory = os.path.join(OUTPUT_PATH, "sharded_single")
+        os.makedirs(single_directory, exist_ok=True)
+        parameters = dict(
+            sequences_file=os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+            wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+            working_directory=working_directory,
+            TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+            refspecies="danRer11",
+            EMprior=0,
+            UFEwmprior=500,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+            UFEwmlen="auto",
+            bgprior=0.8,
+        )
+        result = run_motevo_sharded(shards=3, **parameters)
+        # Shards give the sites and priors of a single run with the same priors
+        expected = run_motevo(**{**parameters, "working_directory": single_directory})
+        assert_frame_equal(
+            parse_sites(expected[0]), parse_sites(result[0]), check_dtype=False
+        )
+        assert_priors_close(parse_priors(expected[1]), parse_priors(result[1]))
+
+        # Only the merged outputs are left
+        self.assertFalse(os.path.exists(os.path.join(working_directory, "shards")))
+        self.assertEqual(list(find_output_files(working_directory)), ["REST"])
+
+        with self.assertRaises(ValueError):
+            run_motevo_sharded(
+                sequences_file=os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+                wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+                working_directory=working_directory,
+                EMprior=1,
+            )
+
+    def test_motevo_run_incremental(self):
+        working_directory = os.path.join(OUTPUT_PATH, "incremental")
+        shutil.rmtree(working_directory, ignore_errors=True)
+        os.makedirs(working_directory)
+        sequences_file = os.path.join(DATA_PATH, "zebrafish_alignments.aln")
+        parameters = dict(
+            wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+            working_directory=working_directory,
+            TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+            refspecies="danRer11",
+            EMprior=0,
+            UFEwmprior=500,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+            UFEwmlen="auto",
+            bgprior=0.8,
+        )
+
+        # A first release with half of the alignments, then all of them
+        first_release = os.path.join(working_directory, "first_release.aln")
+        with AlignmentFile(sequences_file) as alignments:
+            alignments.write(first_release, range(0, len(alignments), 2))
+        run_motevo_incremental(first_release, **parameters)
+        result = run_motevo_incremental(sequences_file, **parameters)
+
+        # Runs on the changed blocks use the fixed priors
+        with open(
+            os.path.join(working_directory, "incremental", "motevo_parameters")
+        ) as f:
+            self.assertIn("EMprior 0\n", f.readlines())
+
+        # The updated outputs are those of a full run with the same priors
+        full_directory = os.path.join(OUTPUT_PATH, "incremental_full")
+        os.makedirs(full_directory, exist_ok=True)
+        expected = run_motevo(
+            sequences_file, **{**parameters, "working_directory": full_directory}
+        )
+        assert_frame_equal(
+            parse_sites(expected[0]), parse_sites(result[0]), check_dtype=False
+        )
+        assert_priors_close(parse_priors(expected[1]), parse_priors(result[1]))
+        self.assertEqual(list(find_output_files(working_directory)), ["REST"])
+
+        # Removed alignments lose their sites
+        result = run_motevo_incremental(first_release, **parameters)
+        assert_frame_equal(
+            parse_sites(expected[0])
+            .pipe(
+                lambda df: df[df["reference_promoter"].isin(alignments.block_ids[::2])]
+            )
+            .reset_index(drop=True),
+            parse_sites(result[0]),
+            check_dtype=False,
+        )
+
+        with self.assertRaises(ValueError):
+            run_motevo_incremental(sequences_file, **{**parameters, "EMprior": 1})
+
+    def test_sweep_points(self):
+        points, runs = _sweep_points(
+            {"bgprior": [0.8, 0.9], "minposterior": [0.5, 0.1]}, {"EMprior": 0}
+        )
+        self.assertEqual(len(points), 4)
+        self.assertEqual(points[1], {"bgprior": 0.8, "minposterior": 0.1})
+        self.assertEqual(
+            runs,
+            {
+                (("bgprior", 0.8),): {"minposterior": 0.1},
+                (("bgprior", 0.9),): {"minposterior": 0.1},
+            },
+        )
+
+        _, runs = _sweep_points({"UFEwmprior": [200, 500]}, {"minposterior": 0.3})
+        self.assertEqual(runs[(("UFEwmprior", 200),)], {"minposterior": 0.3})
+
+        with self.assertRaises(TypeError):
+            _sweep_points({"unknown_parameter": [1]}, {})
+        with self.assertRaises(ValueError):
+            _sweep_points({"bgprior": [0.8]}, {"bgprior": 0.9})
+        with self.assertRaises(ValueError):
+            _sweep_points({"bgprior": []}, {})
+
+    def test_motevo_sweep(self):
+        working_directory = os.path.join(OUTPUT_PATH, "sweep")
+        shutil.rmtree(working_directory, ignore_errors=True)
+        os.makedirs(working_directory)
+        df = sweep_motevo(
+            sequences_file=os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+            wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+            grid={"bgprior": [0.8, 0.9], "minposterior": [0.1, 0.5]},
+            jobs=2,
+            working_directory=working_directory,
+            TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+            refspecies="danRer11",
+            EMprior=0,
+            UFEwmprior=500,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+            UFEwmlen="auto",
+        )
+        # One run per bgprior, filtered for each minposterior
+        self.assertEqual(len(os.listdir(working_directory)), 2)
+        self.assertEqual(
+            list(df.columns),
+            ["bgprior", "minposterior", "source", "motif", "statistic", "value"],
+        )
+
+        # Points of a run count the sites of its sites file above their posterior
+        sites = df[(df["source"] == "sites") & (df["statistic"] == "sites")]
+        sites = sites.set_index(["bgprior", "minposterior"])["value"]
+        for bgprior in (0.8, 0.9):
+            expected = parse_sites(
+                os.path.join(
+                    working_directory, f"sweep_bgprior={bgprior}", "sites_REST.wm"
+                )
+            ).drop_duplicates(
+                ["reference_promoter", "reference_binding_strand", "motif_coordinates"]
+            )
+            self.assertEqual(sites[(bgprior, 0.1)], len(expected))
+            self.assertEqual(
+                sites[(bgprior, 0.5)], (expected["posterior"] >= 0.5).sum()
+            )
+
+        # and share its priors
+        priors = df[(df["source"] == "priors") & (df["statistic"] == "final_prior")]
+        priors = priors.set_index(["bgprior", "minposterior", "motif"])["value"]
+        for bgprior in (0.8, 0.9):
+            for motif in ("REST", "background", "UFEwm"):
+                self.assertEqual(
+                    priors[(bgprior, 0.1, motif)], priors[(bgprior, 0.5, motif)]
+                )
+
+    def test_motevo_run_async(self):
+        async def run_all(working_directories):
+            semaphore = asyncio.Semaphore(2)
+            return await asyncio.gather(
+                *[
+                    run_motevo_async(
+                        sequences_file=os.path.join(
+                            DATA_PATH, "zebrafish_alignments.aln"
+                        ),
+                        wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+                        working_directory=working_directory,
+                        semaphore=semaphore,
+                        TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+                        refspecies="danRer11",
+                        EMprior=1,
+                        UFEwmprior=500,
+                        UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+                        UFEwmlen="auto",
+                        bgprior=0.8,
+                    )
+                    for working_directory in working_directories
+                ]
+            )
+
+        cwd = os.getcwd()
+        working_directories = [
+            os.path.join(OUTPUT_PATH, f"async_{i}") for i in range(3)
+        ]
+        for working_directory in working_directories:
+            os.makedirs(working_directory, exist_ok=True)
+        results = asyncio.run(run_all(working_directories))
+        self.assertEqual(os.getcwd(), cwd)
+
+        for sites_file, priors_file in results:
+            assert_frame_equal(
+                parse_sites(os.path.join(DATA_PATH, "sites_REST.wm")),
+                parse_sites(sites_file),
+                check_dtype=False,
+            )
+            assert_frame_equal(
+                parse_priors(os.path.join(DATA_PATH, "priors_REST.wm")),
+                parse_priors(priors_file),
+                check_dtype=False,
+            )
+
+    def hung_executable(self, directory, name):
+        """
+        Executable that writes its PID to `<name>.pid` and sleeps, standing in
+        for a MotEvo or runUFE run that never ends.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        pid_file = f"{path}.pid"
+        if os.path.exists(pid_file):
+            os.remove(pid_file)
+        with open(path, "w") as f:
+            f.write(
+                f"#!{sys.executable}\n"
+                "import os, time\n"
+                f"with open({pid_file!r}, 'w') as f:\n"
+                "    f.write(str(os.getpid()))\n"
+                "time.sleep(60)\n"
+            )
+        os.chmod(path, 0o755)
+        return path, pid_file
+
+    def assertProcessGone(self, pid_file):
+        with open(pid_file) as f:
+            pid = int(f.read())
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+
+    def test_cancelling_async_run(self):
+        directory = os.path.join(OUTPUT_PATH, "cancelled")
+        executable, pid_file = self.hung_executable(directory, "motevo")
+
+        async def cancel_run():
+            task = asyncio.ensure_future(
+                run_motevo_async(
+                    sequences_file=os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+                    wm_path=os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+                    working_directory=directory,
+                    refspecies="danRer11",
+                )
+            )
+            while not os.path.exists(pid_file):
+                await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        path = os.environ["PATH"]
+        try:
+            os.environ["PATH"] = directory + os.pathsep + path
+            asyncio.run(asyncio.wait_for(cancel_run(), 30))
+        finally:
+            os.environ["PATH"] = path
+        self.assertProcessGone(pid_file)
+
+    def test_ufe_run_timeout(self):
+        directory = os.path.join(OUTPUT_PATH, "ufe_timeout")
+        executable, pid_file = self.hung_executable(directory, "runUFE")
+        output_path = os.path.join(directory, "UFEmodel")
+        options = dict(
+            tree_file_path=os.path.join(DATA_PATH, "tree_file"),
+            output_path=output_path,
+            use_cache=False,
+            executable=executable,
+            timeout=0.5,
+        )
+
+        with self.assertRaises(TimeoutError):
+            run_ufe(**options)
+        self.assertProcessGone(pid_file)
+        self.assertFalse(os.path.exists(output_path))
+
+        os.remove(pid_file)
+        with self.assertRaises(TimeoutError):
+            asyncio.run(run_ufe_async(**options))
+        self.assertProcessGone(pid_file)
+        self.assertEqual(sorted(os.listdir(directory)), ["runUFE", "runUFE.pid"])
+
+    def test_ufe_run_lines(self):
+        directory = os.path.join(OUTPUT_PATH, "ufe_lines")
+        os.makedirs(directory, exist_ok=True)
+        model_path = os.path.join(DATA_PATH, "UFEmodel")
+        # Stand-in for runUFE printing a known model
+        executable = os.path.join(directory, "runUFE")
+        with open(executable, "w") as f:
+            f.write(
+                f"#!{sys.executable}\n"
+                f"with open({model_path!r}) as f:\n"
+                "    print(f.read(), end='')\n"
+            )
+        os.chmod(executable, 0o755)
+        with open(model_path) as f:
+            model = f.read()
+
+        output_path = os.path.join(directory, "UFEmodel")
+        lines = []
+        run_ufe(
+            tree_file_path=os.path.join(DATA_PATH, "tree_file"),
+            output_path=output_path,
+            use_cache=False,
+            executable=executable,
+            on_line=lines.append,
+        )
+        self.assertEqual("".join(lines), model)
+        with open(output_path) as f:
+            self.assertEqual(f.read(), model)
+
+        output_path = os.path.join(directory, "UFEmodel_async")
+        lines = []
+        asyncio.run(
+            run_ufe_async(
+                tree_file_path=os.path.join(DATA_PATH, "tree_file"),
+                output_path=output_path,
+                use_cache=False,
+                executable=executable,
+                on_line=lines.append,
+            )
+        )
+        self.assertEqual("".join(lines), model)
+        with open(output_path) as f:
+            self.assertEqual(f.read(), model)
+
+    def test_engine_run(self):
+        engine = MotevoEngine(
+            working_directory=os.path.join(OUTPUT_PATH, "engine"),
+            TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+            refspecies="danRer11",
+            EMprior=1,
+            UFEwmprior=500,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+            UFEwmlen="auto",
+            bgprior=0.8,
+        )
+        os.makedirs(engine.working_directory, exist_ok=True)
+        for _ in range(2):
+            sites_file, priors_file = engine.run(
+                os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+                os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+            )
+            assert_frame_equal(
+                parse_sites(os.path.join(DATA_PATH, "sites_REST.wm")),
+                parse_sites(sites_file),
+                check_dtype=False,
+            )
+
+    def test_engine_parameters(self):
+        with self.assertRaises(TypeError):
+            MotevoEngine(refspecies="danRer11", unknown_parameter=1)
+        with self.assertRaises(ValueError):
+            MotevoEngine(Mode="TBFS")
+        with self.assertRaises(ValueError):
+            MotevoEngine(bgA=0.4)
+
+        # The one-off runners check their parameters as well
+        sequences_file = os.path.join(DATA_PATH, "zebrafish_alignments.aln")
+        wm_path = os.path.join(DATA_PATH, "pwmdir", "REST.wm")
+        with self.assertRaises(ValueError):
+            run_motevo(sequences_file, wm_path, OUTPUT_PATH, Mode="TBFS")
+        with self.assertRaises(ValueError):
+            run_motevo(sequences_file, wm_path, OUTPUT_PATH, bgA=0.4)
+        with self.assertRaises(ValueError):
+            asyncio.run(
+                run_motevo_async(sequences_file, wm_path, OUTPUT_PATH, Mode="TBFS")
+            )
+
+    def test_finding_executables(self):
+        directory = os.path.join(OUTPUT_PATH, "executables")
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        path = os.environ["PATH"]
+        try:
+            os.environ["PATH"] = directory
+            self.assertIsNone(find_executable("motevo_installed_later"))
+
+            # Executables installed after a failed lookup are found
+            executable = os.path.join(directory, "motevo_installed_later")
+            with open(executable, "w") as f:
+                f.write("#!/bin/sh\n")
+            os.chmod(executable, 0o755)
+            self.assertEqual(find_executable("motevo_installed_later"), executable)
+
+            # Lookups follow changes of the PATH
+            os.environ["PATH"] = os.path.join(directory, "missing")
+            self.assertIsNone(find_executable("motevo_installed_later"))
+        finally:
+            os.environ["PATH"] = path
+
+    def test_parameters_file(self):
+        parameters = _check_parameters({"refspecies": "danRer11", "bgprior": 0.8})
+        rendered = _ParameterTemplate(parameters).render("sites", "priors")
+        self.assertIn("EMprior 0\n", rendered)
+        self.assertIn("bgprior 0.8\n", rendered)
+        rendered = _ParameterTemplate({**parameters, "EMprior": 1}).render(
+            "sites", "priors"
+        )
+        self.assertIn("EMprior 1\n", rendered)
+        # Options set to None are left to MotEvo
+        rendered = _ParameterTemplate({**parameters, "EMprior": None}).render(
+            "sites", "priors"
+        )
+        self.assertNotIn("EMprior", rendered)
+
+    def test_runs_leave_ufe_cache_alone(self):
+        cache_dir = os.path.join(OUTPUT_PATH, "implicit_cache")
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        ufe._models.clear()
+        parameters = _check_parameters(
+            {
+                "TREE": "((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+                "refspecies": "danRer11",
+                "UFEwmfile": os.path.join(DATA_PATH, "UFEmodel"),
+            }
+        )
+        environment = os.environ.get("MOTEVOWRAPPER_CACHE_DIR")
+        try:
+            os.environ["MOTEVOWRAPPER_CACHE_DIR"] = cache_dir
+            _MotevoRun(
+                os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+                os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+                OUTPUT_PATH,
+                _ParameterTemplate(parameters),
+                None,
+            )
+        finally:
+            if environment is None:
+                del os.environ["MOTEVOWRAPPER_CACHE_DIR"]
+            else:
+                os.environ["MOTEVOWRAPPER_CACHE_DIR"] = environment
+        self.assertFalse(os.path.exists(cache_dir))
+
+    def test_prefiltered_run_key(self):
+        directory = os.path.join(OUTPUT_PATH, "prefiltered")
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        template = _ParameterTemplate(_check_parameters({"refspecies": "danRer11"}))
+
+        def run(prefilter_score):
+            return _MotevoRun(
+                os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+                os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+                directory,
+                template,
+                os.path.join(directory, "cache"),
+                prefilter_score=prefilter_score,
+            )
+
+        keys = [run(score).cache_key for score in (None, 1.0, 2.0)]
+        self.assertEqual(len(set(keys)), 3)
+        self.assertEqual(run(1.0).cache_key, keys[1])
+
+        # Alignments are only prefiltered for runs that aren't cached
+        prefiltered = run(1.0)
+        self.assertEqual(os.listdir(directory), ["cache"])
+        prefiltered.prepare()
+        self.assertIn("prefilter", prefiltered.timings)
+        self.assertTrue(os.path.exists(prefiltered.path(prefiltered.command[1])))
+        self.assertEqual(prefiltered.cache_key, keys[1])
+
+    def test_streaming_process_output(self):
+        command = [
+            sys.executable,
+            "-c",
+            "import sys\n"
+            "for i in range(1000): print(f'line {i}')\n"
+            "print('done', file=sys.stderr)",
+        ]
+        stdout_path = os.path.join(OUTPUT_PATH, "stream_stdout")
+        stderr_path = os.path.join(OUTPUT_PATH, "stream_stderr")
+        with open(stdout_path, "wb") as stdout, open(stderr_path, "wb") as stderr:
+            returncode = _run_process(command, OUTPUT_PATH, stdout, stderr)
+        self.assertEqual(returncode, 0)
+        with open(stdout_path) as f:
+            self.assertEqual(len(f.readlines()), 1000)
+        with open(stderr_path) as f:
+            self.assertEqual(f.read(), "done\n")
+
+        # Line callback with a sink that has no file descriptor
+        lines = []
+        sink = io.BytesIO()
+        with open(stderr_path, "wb") as stderr:
+            returncode = _run_process(
+                command, OUTPUT_PATH, sink, stderr, on_line=lines.append
+            )
+        self.assertEqual(returncode, 0)
+        self.assertEqual(lines[-1], "line 999\n")
+        self.assertEqual(sink.getvalue().decode("utf-8"), "".join(lines))
+
+    def test_killing_hung_process(self):
+        command = [sys.executable, "-c", "import time; time.sleep(60)"]
+        with open(os.devnull, "wb") as devnull:
+            returncode = _run_process(
+                command, OUTPUT_PATH, devnull, devnull, timeout=0.5
+            )
+        self.assertIsNone(returncode)
+
     def test_installation(self):
         result = shell_call(["motevo"])
         self.assertEqual(result.returncode, 0)
@@ -229,6 +938,38 @@ class TestMotevoWrapper(unittest.TestCase):
         for i in range(len(result)):
             self.assertEqual(result[i], check[i])
 
+    def test_ufe_run_cached(self):
+        cache_dir = os.path.join(OUTPUT_PATH, "ufe_cache")
+        tree_file_path = os.path.join(DATA_PATH, "tree_file")
+        output_path = os.path.join(OUTPUT_PATH, "UFEmodel_cached")
+
+        # A cached model is reused without running runUFE
+        with open(tree_file_path) as f:
+            key = ufe_key(f.read(), 0.25, 0.25, 0.25, 0.25)
+        os.makedirs(os.path.join(cache_dir, "ufe"), exist_ok=True)
+        shutil.copyfile(
+            os.path.join(DATA_PATH, "UFEmodel"), os.path.join(cache_dir, "ufe", key)
+        )
+
+        result = run_ufe(
+            tree_file_path=tree_file_path, output_path=output_path, cache_dir=cache_dir
+        )
+        self.assertEqual(result, output_path)
+        with open(output_path) as f, open(os.path.join(DATA_PATH, "UFEmodel")) as g:
+            self.assertEqual(f.read(), g.read())
+
+        output_path = os.path.join(OUTPUT_PATH, "UFEmodel_cached_async")
+        result = asyncio.run(
+            run_ufe_async(
+                tree_file_path=tree_file_path,
+                output_path=output_path,
+                cache_dir=cache_dir,
+            )
+        )
+        self.assertEqual(result, output_path)
+        with open(output_path) as f, open(os.path.join(DATA_PATH, "UFEmodel")) as g:
+            self.assertEqual(f.read(), g.read())
+
 
 if __name__ == "__main__":
     unittest.main()
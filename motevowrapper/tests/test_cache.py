@@ -0,0 +1,85 @@
+import os
+import time
+import shutil
+import unittest
+
+from motevowrapper.cache import ResultCache, run_key, ufe_key
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(OUTPUT_PATH, "cache")
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.sites_file = os.path.join(DATA_PATH, "sites_REST.wm")
+        self.priors_file = os.path.join(DATA_PATH, "priors_REST.wm")
+
+    def key(self, parameters):
+        return run_key(
+            os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+            os.path.join(DATA_PATH, "pwmdir", "REST.wm"),
+            parameters,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+        )
+
+    def test_run_key(self):
+        self.assertEqual(self.key("bgprior 0.8\n"), self.key("bgprior 0.8\n"))
+        self.assertNotEqual(self.key("bgprior 0.8\n"), self.key("bgprior 0.9\n"))
+
+    def test_ufe_key(self):
+        tree = "((astMex:0.415917,pygNat:0.449133):0.099801,danRer11:0.55291);"
+        spaced_tree = (
+            "((astMex:0.415917, pygNat:0.449133):0.099801,\n danRer11:0.55291);\n"
+        )
+        background = (0.25, 0.25, 0.25, 0.25)
+        self.assertEqual(ufe_key(tree, *background), ufe_key(spaced_tree, *background))
+        self.assertEqual(
+            ufe_key(tree, *background), ufe_key(tree, 0.25, 0.25, 0.25, "0.25")
+        )
+        self.assertNotEqual(
+            ufe_key(tree, *background), ufe_key(tree, 0.3, 0.2, 0.2, 0.3)
+        )
+
+    def test_get_and_put(self):
+        cache = ResultCache(self.directory)
+        key = self.key("bgprior 0.8\n")
+        self.assertIsNone(cache.get(key))
+
+        sites_file, priors_file = cache.put(key, self.sites_file, self.priors_file)
+        self.assertEqual(cache.get(key), (sites_file, priors_file))
+        self.assertEqual(os.path.basename(sites_file), "sites_REST.wm")
+        with open(sites_file) as f, open(self.sites_file) as g:
+            self.assertEqual(f.read(), g.read())
+
+        self.assertEqual(list(cache.entries()["key"]), [key])
+        cache.purge()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(len(cache.entries()), 0)
+
+    def test_lru_eviction(self):
+        entry_size = (
+            os.path.getsize(self.sites_file) + os.path.getsize(self.priors_file) + 100
+        )
+        cache = ResultCache(self.directory, max_size=2 * entry_size)
+        keys = [self.key(f"bgprior 0.{i}\n") for i in range(3)]
+
+        cache.put(keys[0], self.sites_file, self.priors_file)
+        time.sleep(0.01)
+        cache.put(keys[1], self.sites_file, self.priors_file)
+        time.sleep(0.01)
+        # Using the first entry makes the second one the least recently used
+        cache.get(keys[0])
+        time.sleep(0.01)
+        cache.put(keys[2], self.sites_file, self.priors_file)
+
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertLessEqual(cache.size(), cache.max_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+import unittest
+import importlib.util
+import pandas as pd
+
+from motevowrapper.cli import (
+    TableWriter,
+    main,
+    parse_parameters,
+    priors_output_path,
+    read_journal,
+)
+from motevowrapper.motevowrapper import parse_sites
+from motevowrapper.spool import JobSpool
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+
+TREE = "((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);"
+
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(OUTPUT_PATH, "cli")
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+    def test_parameters(self):
+        self.assertEqual(
+            parse_parameters(["refspecies=danRer11", "bgprior=0.8", "EMprior=0"]),
+            {"refspecies": "danRer11", "bgprior": 0.8, "EMprior": 0},
+        )
+        with self.assertRaises(ValueError):
+            parse_parameters(["bgprior"])
+        with self.assertRaises(ValueError):
+            parse_parameters(["unknown_parameter=1"])
+        self.assertEqual(priors_output_path("out/sites.tsv"), "out/sites_priors.tsv")
+
+    def test_table_writer(self):
+        df = parse_sites(os.path.join(DATA_PATH, "sites_REST.wm"), engine="columnar")
+        path = os.path.join(self.directory, "sites.tsv")
+        with TableWriter(path) as writer:
+            writer.write(df.iloc[:0])
+            writer.write(df.iloc[:10])
+            writer.write(df.iloc[10:])
+        self.assertEqual(len(pd.read_csv(path, sep="\t")), len(df))
+
+        with self.assertRaises(ValueError):
+            TableWriter(os.path.join(self.directory, "sites.csv"))
+
+    @unittest.skipUnless(
+        importlib.util.find_spec("pyarrow"), "pyarrow is not installed"
+    )
+    def test_table_writer_parquet(self):
+        df = parse_sites(os.path.join(DATA_PATH, "sites_REST.wm"), engine="columnar")
+        path = os.path.join(self.directory, "sites.parquet")
+        with TableWriter(path) as writer:
+            writer.write(df.iloc[:0])
+            writer.write(df.iloc[:10])
+            writer.write(df.iloc[10:])
+        written = pd.read_parquet(path)
+        self.assertEqual(len(written), len(df))
+        self.assertEqual(list(written["posterior"]), list(df["posterior"]))
+
+        # Tables of empty frames only are still written, with their columns
+        path = os.path.join(self.directory, "empty.parquet")
+        with TableWriter(path) as writer:
+            writer.write(df.iloc[:0])
+        written = pd.read_parquet(path)
+        self.assertEqual(len(written), 0)
+        self.assertEqual(list(written.columns), list(df.columns))
+
+    def test_journal(self):
+        path = os.path.join(self.directory, "sites.tsv.journal")
+        with open(path, "w") as f:
+            f.write(
+                json.dumps({"motif": "REST", "sites_file": "s", "priors_file": "p"})
+            )
+            f.write('\n{"motif": "CT')
+        self.assertEqual(read_journal(path), {"REST": ("s", "p")})
+
+    def test_parse(self):
+        path = os.path.join(self.directory, "sites.tsv")
+        returncode = main(
+            [
+                "parse",
+                os.path.join(DATA_PATH, "sites_REST.wm"),
+                "--out",
+                path,
+                "--min-posterior",
+                "0.5",
+                "--chunksize",
+                "4",
+            ]
+        )
+        self.assertEqual(returncode, 0)
+        df = pd.read_csv(path, sep="\t")
+        self.assertTrue((df["posterior"] >= 0.5).all())
+
+        # Directories of MotEvo outputs give a sites and a priors table
+        output_dir = os.path.join(self.directory, "scan", "REST")
+        os.makedirs(output_dir)
+        for name in ("sites_REST.wm", "priors_REST.wm"):
+            shutil.copy(os.path.join(DATA_PATH, name), output_dir)
+        path = os.path.join(self.directory, "all.tsv")
+        main(["parse", os.path.dirname(output_dir), "--out", path, "--jobs", "1"])
+        priors = pd.read_csv(priors_output_path(path), sep="\t")
+        self.assertEqual(list(priors["pwm"].unique()), ["REST"])
+
+    def test_parse_no_sites(self):
+        sites_file = os.path.join(DATA_PATH, "sites_REST.wm")
+        columns = list(parse_sites(sites_file, engine="columnar").columns)
+        extensions = ["tsv"]
+        if importlib.util.find_spec("pyarrow"):
+            extensions.append("parquet")
+        for extension in extensions:
+            path = os.path.join(self.directory, f"sites.{extension}")
+            returncode = main(
+                ["parse", sites_file, "--out", path, "--min-posterior", "2"]
+            )
+            self.assertEqual(returncode, 0)
+            if extension == "tsv":
+                df = pd.read_csv(path, sep="\t")
+            else:
+                df = pd.read_parquet(path)
+            self.assertEqual(len(df), 0)
+            self.assertEqual(list(df.columns), columns)
+
+    def test_scan(self):
+        path = os.path.join(self.directory, "sites.tsv")
+        arguments = [
+            "scan",
+            "--sequences",
+            os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+            "--pwm-dir",
+            os.path.join(DATA_PATH, "pwmdir"),
+            "--out",
+            path,
+            "--working-directory",
+            os.path.join(self.directory, "runs"),
+            "-p",
+            f"TREE={TREE}",
+            "-p",
+            "refspecies=danRer11",
+            "-p",
+            "EMprior=1",
+            "-p",
+            "UFEwmprior=500",
+            "-p",
+            # Relative to the current directory, not to the working directory
+            f"UFEwmfile={os.path.relpath(os.path.join(DATA_PATH, 'UFEmodel'))}",
+            "-p",
+            "UFEwmlen=auto",
+            "-p",
+            "bgprior=0.8",
+        ]
+        self.assertEqual(main(arguments), 0)
+        sites = pd.read_csv(path, sep="\t")
+        expected = parse_sites(os.path.join(DATA_PATH, "sites_REST.wm"))
+        self.assertEqual(len(sites), len(expected))
+        self.assertEqual(list(read_journal(f"{path}.journal")), ["REST"])
+
+        # Resuming a finished scan only rewrites the outputs
+        self.assertEqual(main(arguments + ["--resume"]), 0)
+        self.assertEqual(len(pd.read_csv(path, sep="\t")), len(expected))
+
+    def test_submit(self):
+        spool_directory = os.path.join(self.directory, "spool")
+        arguments = [
+            "submit",
+            spool_directory,
+            "--sequences",
+            os.path.join(DATA_PATH, "zebrafish_alignments.aln"),
+            "--pwm-dir",
+            os.path.join(DATA_PATH, "pwmdir"),
+            "-p",
+            "bgprior=0.8",
+        ]
+        self.assertEqual(main(arguments), 0)
+        self.assertEqual(main(arguments), 0)
+        spool = JobSpool(spool_directory)
+        self.assertEqual(spool.jobs(), {"REST": "pending"})
+        self.assertEqual(spool.claim("worker").job["params"], {"bgprior": 0.8})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import sys
+import subprocess
+import unittest
+
+# Bound on the time to import all modules of the package in a fresh interpreter,
+# which every pool worker pays, on top of importing pandas and numpy. It takes
+# about 0.07 s; the rest of the budget absorbs slow machines.
+IMPORT_TIME_BUDGET = 0.25
+
+# Modules that must only be loaded when they are actually used
+LAZY_MODULES = ["pyarrow", "seaborn", "matplotlib"]
+
+# `motevowrapper.plotting` is the one module that needs its optional dependencies
+IMPORT_SCRIPT = """
+import json, sys, time, pkgutil, importlib
+import numpy, pandas
+baseline = set(sys.modules)
+start = time.perf_counter()
+import motevowrapper
+names = [
+    module.name
+    for module in pkgutil.walk_packages(motevowrapper.__path__, "motevowrapper.")
+    if not module.name.startswith("motevowrapper.tests")
+    and module.name not in ("motevowrapper.__main__", "motevowrapper.plotting")
+]
+for name in names:
+    importlib.import_module(name)
+duration = time.perf_counter() - start
+print(
+    json.dumps(
+        {
+            "duration": duration,
+            "names": names,
+            "modules": sorted(set(sys.modules) - baseline),
+        }
+    )
+)
+"""
+
+
+class TestImports(unittest.TestCase):
+    def test_import_budget(self):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, check=True
+        )
+        imported = json.loads(result.stdout)
+
+        self.assertIn("motevowrapper.cli", imported["names"])
+        self.assertLess(imported["duration"], IMPORT_TIME_BUDGET)
+        for module in LAZY_MODULES:
+            self.assertFalse(
+                any(
+                    name == module or name.startswith(f"{module}.")
+                    for name in imported["modules"]
+                ),
+                f"{module} is imported by the motevowrapper modules",
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
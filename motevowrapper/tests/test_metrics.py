@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import pickle
+import shutil
+import unittest
+
+from motevowrapper.metrics import (
+    JSONLinesWriter,
+    PrometheusTextfile,
+    RunMetrics,
+    count_sites,
+    emit,
+    file_size,
+)
+from motevowrapper.motevowrapper import UFEResult, _run_process
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+
+
+def metrics(name="REST", nr_of_sites=10):
+    return RunMetrics(
+        "motevo",
+        name,
+        True,
+        1,
+        {"parameters": 0.01, "process": 2.5, "total": 2.6},
+        2.0,
+        0.1,
+        2**20,
+        1000,
+        100,
+        nr_of_sites,
+    )
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(OUTPUT_PATH, "metrics")
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+    def test_sizes_and_sites(self):
+        sites_file = os.path.join(DATA_PATH, "sites_REST.wm")
+        self.assertEqual(count_sites(sites_file), 10)
+        self.assertEqual(count_sites(os.path.join(DATA_PATH, "missing")), 0)
+        self.assertEqual(
+            file_size(sites_file, None, os.path.join(DATA_PATH, "missing")),
+            os.path.getsize(sites_file),
+        )
+
+    def test_process_usage(self):
+        command = [sys.executable, "-c", "sum(range(10 ** 6))"]
+        usage = []
+        with open(os.devnull, "wb") as devnull:
+            returncode = _run_process(
+                command, OUTPUT_PATH, devnull, devnull, usage=usage
+            )
+        self.assertEqual(returncode, 0)
+        if hasattr(os, "wait4"):
+            self.assertEqual(len(usage), 1)
+            self.assertGreater(usage[0].ru_utime + usage[0].ru_stime, 0)
+            self.assertGreater(usage[0].ru_maxrss, 0)
+
+    def test_json_lines(self):
+        path = os.path.join(self.directory, "metrics.jsonl")
+        hook = JSONLinesWriter(path)
+        emit(hook, metrics("REST"))
+        emit([hook], metrics("CTCF"))
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["name"] for record in records], ["REST", "CTCF"])
+        self.assertEqual(records[0]["timings"]["process"], 2.5)
+
+    def test_prometheus_textfile(self):
+        path = os.path.join(self.directory, "motevo.prom")
+        hook = pickle.loads(pickle.dumps(PrometheusTextfile(path)))
+        hook(metrics("REST", nr_of_sites=10))
+        hook(metrics("CTCF", nr_of_sites=None))
+        hook(metrics("REST", nr_of_sites=12))
+
+        samples = hook.read()
+        self.assertEqual(
+            samples['motevowrapper_run_sites{program="motevo",name="REST"}'], "12.0"
+        )
+        self.assertNotIn(
+            'motevowrapper_run_sites{program="motevo",name="CTCF"}', samples
+        )
+        self.assertEqual(
+            samples[
+                'motevowrapper_run_seconds{program="motevo",name="CTCF",phase="process"}'
+            ],
+            "2.5",
+        )
+        with open(path) as f:
+            self.assertEqual(f.read().count("# TYPE motevowrapper_run_sites gauge"), 1)
+
+    def test_failing_hook(self):
+        def fail(metrics):
+            raise RuntimeError("unavailable")
+
+        received = []
+        with self.assertLogs("motevowrapper.metrics", level="ERROR"):
+            emit([fail, received.append], metrics())
+        self.assertEqual(received, [metrics()])
+
+    def test_ufe_result(self):
+        result = UFEResult("UFE_model", metrics(None))
+        self.assertEqual(result, "UFE_model")
+        unpickled = pickle.loads(pickle.dumps(result))
+        self.assertEqual(unpickled, result)
+        self.assertEqual(unpickled.metrics, result.metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import pickle
+import shutil
+import unittest
+import numpy as np
+
+from motevowrapper.motevowrapper import prefilter_alignments
+from motevowrapper.pwm import (
+    PWMLibrary,
+    encode,
+    log_odds,
+    max_score,
+    read_pwms,
+    scan,
+    write_pwm,
+)
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+if not os.path.exists(OUTPUT_PATH):
+    os.mkdir(OUTPUT_PATH)
+
+
+class TestPWM(unittest.TestCase):
+    def setUp(self):
+        counts = read_pwms(os.path.join(DATA_PATH, "pwmdir", "REST.wm"))["REST"]
+        self.matrix = log_odds(counts)
+
+    def test_reading(self):
+        matrices = read_pwms(os.path.join(DATA_PATH, "pwmdir", "REST.wm"))
+        self.assertEqual(list(matrices), ["REST"])
+        self.assertEqual(matrices["REST"].shape, (21, 4))
+        self.assertEqual(list(matrices["REST"][0]), [54, 7, 308, 38])
+
+    def test_scanning(self):
+        sequence = "TTAGCGCTGTCC-TTGGTGCTGACNNA"
+        codes = encode(sequence)
+        self.assertEqual(len(codes), len(sequence) - 1)
+
+        complement = {"A": "T", "C": "G", "G": "C", "T": "A", "N": "N"}
+
+        def score(window):
+            return sum(
+                (
+                    self.matrix[i].max()
+                    if base == "N"
+                    else self.matrix[i, "ACGT".index(base)]
+                )
+                for i, base in enumerate(window)
+            )
+
+        ungapped = sequence.replace("-", "")
+        expected = []
+        for start in range(len(ungapped) - 20):
+            window = ungapped[start : start + 21]
+            reverse = "".join(complement[base] for base in reversed(window))
+            expected.append(max(score(window), score(reverse)))
+        np.testing.assert_allclose(scan(self.matrix, codes), expected)
+        self.assertEqual(max_score(self.matrix, encode("ACGT")), -np.inf)
+
+    def test_prefiltering(self):
+        sequences_file = os.path.join(DATA_PATH, "zebrafish_alignments.aln")
+        output_path = os.path.join(OUTPUT_PATH, "prefiltered.aln")
+        kept, total = prefilter_alignments(
+            sequences_file, [self.matrix], 15, output_path
+        )
+        self.assertEqual((kept, total), (6, 10))
+
+        with open(output_path) as f:
+            headers = [line.strip() for line in f if line.startswith(">>")]
+        self.assertEqual(len(headers), 6)
+        self.assertIn(">>danRer11_chr21_11468142_11469142_+", headers)
+        self.assertNotIn(">>danRer11_chr8_51404306_51405306_-", headers)
+
+
+class TestPWMLibrary(unittest.TestCase):
+    def setUp(self):
+        self.pwm_dir = os.path.join(OUTPUT_PATH, "pwm_library")
+        shutil.rmtree(self.pwm_dir, ignore_errors=True)
+        os.makedirs(self.pwm_dir)
+        counts = read_pwms(os.path.join(DATA_PATH, "pwmdir", "REST.wm"))["REST"]
+        self.counts = counts
+        write_pwm(counts, os.path.join(self.pwm_dir, "REST.wm"), "REST")
+
+        # A file with two matrices
+        multi_path = os.path.join(self.pwm_dir, "multi.wm")
+        write_pwm(counts[:10], multi_path, "SHORT")
+        with open(multi_path, "a") as f:
+            with open(write_pwm(counts[::-1], multi_path + ".tmp", "REVERSED")) as g:
+                f.write(g.read())
+        os.remove(multi_path + ".tmp")
+
+    def test_loading(self):
+        library = PWMLibrary(self.pwm_dir)
+        self.assertEqual(library.keys(), ["REST", "SHORT", "REVERSED"])
+
+        rest = library["REST"]
+        self.assertEqual(rest.path, os.path.join(self.pwm_dir, "REST.wm"))
+        self.assertEqual(rest.length, 21)
+        self.assertEqual(rest.consensus, "GGCGCTGTCCATGGTGCTGAA")
+        np.testing.assert_array_equal(rest.counts, self.counts)
+        np.testing.assert_allclose(rest.log_odds, log_odds(self.counts), rtol=1e-6)
+
+        short = library["SHORT"]
+        self.assertIsNone(short.path)
+        self.assertEqual(short.length, 10)
+
+        # The reverse strand matrix scores the reverse complement
+        codes = encode("GGCGCTGTCCATGGTGCTGAA")
+        reverse_codes = encode("TTCAGCACCATGGACAGCGCC")
+        self.assertAlmostEqual(
+            rest.log_odds[np.arange(21), codes].sum(),
+            rest.reverse_log_odds[np.arange(21), reverse_codes].sum(),
+            places=4,
+        )
+
+    def test_pickling(self):
+        library = pickle.loads(pickle.dumps(PWMLibrary(self.pwm_dir)))
+        self.assertEqual(len(library), 3)
+        self.assertIn("REVERSED", library)
+        np.testing.assert_array_equal(library["REVERSED"].counts, self.counts[::-1])
+
+        entry = pickle.loads(pickle.dumps(library["REST"]))
+        self.assertEqual(entry.name, "REST")
+        self.assertEqual(entry.length, 21)
+
+
+if __name__ == "__main__":
+    unittest.main()
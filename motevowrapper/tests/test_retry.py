@@ -0,0 +1,45 @@
+import pickle
+import unittest
+
+from motevowrapper.motevowrapper import MotevoResult
+from motevowrapper.retry import Attempt, RetryPolicy
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_backoff(self):
+        retry = RetryPolicy(max_attempts=5, backoff=0.5, max_backoff=3)
+        self.assertEqual(list(retry.attempt_numbers()), [1, 2, 3, 4, 5])
+        self.assertEqual([retry.delay(n) for n in range(1, 5)], [0.5, 1, 2, 3])
+
+    def test_from_arguments(self):
+        self.assertEqual(RetryPolicy.from_arguments().max_attempts, 1)
+        self.assertIsNone(
+            RetryPolicy.from_arguments(try_until_succeeding=True).max_attempts
+        )
+        retry = RetryPolicy(max_attempts=2, timeout=10)
+        self.assertIs(RetryPolicy.from_arguments(retry, True), retry)
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+        with self.assertRaises(ValueError):
+            RetryPolicy(timeout=-1)
+
+    def test_result(self):
+        attempts = [
+            Attempt(1, None, 10.0, True, False),
+            Attempt(2, 0, 4.2, False, True),
+        ]
+        result = MotevoResult("sites_REST.wm", "priors_REST.wm", attempts)
+        sites_file, priors_file = result
+        self.assertEqual((sites_file, priors_file), result)
+        self.assertEqual(result.priors_file, "priors_REST.wm")
+
+        # Results are sent back from worker processes
+        unpickled = pickle.loads(pickle.dumps(result))
+        self.assertEqual(unpickled, result)
+        self.assertEqual(unpickled.attempts, attempts)
+
+
+if __name__ == "__main__":
+    unittest.main()
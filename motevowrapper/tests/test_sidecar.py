@@ -0,0 +1,61 @@
+import os
+import shutil
+import unittest
+import importlib.util
+from pandas.util.testing import assert_frame_equal
+
+from motevowrapper.motevowrapper import parse_priors, parse_sites
+from motevowrapper.sidecar import read_sidecar, sidecar_path
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class TestSidecar(unittest.TestCase):
+    def setUp(self):
+        directory = os.path.join(OUTPUT_PATH, "sidecar")
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        self.sites_file = os.path.join(directory, "sites_REST.wm")
+        self.priors_file = os.path.join(directory, "priors_REST.wm")
+        shutil.copyfile(os.path.join(DATA_PATH, "sites_REST.wm"), self.sites_file)
+        shutil.copyfile(os.path.join(DATA_PATH, "priors_REST.wm"), self.priors_file)
+
+    def test_sites_sidecar(self):
+        for format in ["feather", "parquet"]:
+            for engine in ["python", "columnar"]:
+                expected = parse_sites(self.sites_file, engine=engine)
+                written = parse_sites(self.sites_file, engine=engine, sidecar=format)
+                self.assertTrue(os.path.exists(sidecar_path(self.sites_file, format)))
+                loaded = read_sidecar(self.sites_file, format, f"sites/{engine}")
+                assert_frame_equal(expected, written)
+                assert_frame_equal(expected, loaded)
+
+                projected = parse_sites(
+                    self.sites_file,
+                    engine=engine,
+                    sidecar=format,
+                    columns=["reference_promoter", "posterior"],
+                )
+                assert_frame_equal(
+                    expected[["reference_promoter", "posterior"]], projected
+                )
+
+    def test_stale_sidecar(self):
+        parse_priors(self.priors_file, sidecar=True)
+        self.assertIsNotNone(read_sidecar(self.priors_file, kind="priors"))
+
+        with open(self.priors_file, "a") as f:
+            f.write("extra 0.1 1.0 0.1\n")
+        self.assertIsNone(read_sidecar(self.priors_file, kind="priors"))
+
+        # A stale sidecar is replaced
+        expected = parse_priors(self.priors_file)
+        assert_frame_equal(expected, parse_priors(self.priors_file, sidecar=True))
+        assert_frame_equal(expected, read_sidecar(self.priors_file, kind="priors"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import time
+import shutil
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from motevowrapper.motevowrapper import parse_sites
+from motevowrapper.spool import JobSpool, start_workers
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+
+SEQUENCES_FILE = os.path.join(DATA_PATH, "zebrafish_alignments.aln")
+SITES_FILE = os.path.join(DATA_PATH, "sites_REST.wm")
+PRIORS_FILE = os.path.join(DATA_PATH, "priors_REST.wm")
+
+
+def claim_all(directory, worker):
+    spool = JobSpool(directory)
+    claimed = []
+    while True:
+        lease = spool.claim(worker)
+        if lease is None:
+            return claimed
+        claimed.append(lease.job["id"])
+
+
+class TestJobSpool(unittest.TestCase):
+    def setUp(self):
+        self.directory = os.path.join(OUTPUT_PATH, "spool")
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.spool = JobSpool(self.directory, lease_timeout=60, max_attempts=2)
+
+    def expire(self, lease):
+        past = time.time() - 120
+        os.utime(lease.path, (past, past))
+
+    def test_lifecycle(self):
+        wm_path = os.path.join(DATA_PATH, "pwmdir", "REST.wm")
+        self.assertEqual(self.spool.submit(SEQUENCES_FILE, wm_path, EMprior=0), "REST")
+        # Submitting again doesn't add the job twice
+        self.spool.submit(SEQUENCES_FILE, wm_path, EMprior=0)
+        self.assertEqual(self.spool.status()["pending"], 1)
+
+        lease = self.spool.claim("worker-1")
+        self.assertEqual(lease.job["wm_path"], wm_path)
+        self.assertEqual(lease.job["params"], {"EMprior": 0})
+        self.assertIsNone(self.spool.claim("worker-2"))
+        self.assertEqual(self.spool.jobs(), {"REST": "leased"})
+
+        self.assertTrue(self.spool.complete(lease, SITES_FILE, PRIORS_FILE))
+        self.assertEqual(self.spool.jobs(), {"REST": "done"})
+        sites_file, priors_file = self.spool.results()["REST"]
+        self.assertEqual(len(parse_sites(sites_file)), len(parse_sites(SITES_FILE)))
+
+    def test_relative_paths(self):
+        ufe_model = os.path.join(DATA_PATH, "UFEmodel")
+        self.spool.submit(
+            os.path.relpath(SEQUENCES_FILE),
+            os.path.relpath(os.path.join(DATA_PATH, "pwmdir", "REST.wm")),
+            UFEwmfile=os.path.relpath(ufe_model),
+        )
+        # Workers run jobs from other directories
+        job = self.spool.claim("worker").job
+        self.assertEqual(job["sequences_file"], SEQUENCES_FILE)
+        self.assertEqual(job["params"], {"UFEwmfile": ufe_model})
+
+    def test_expired_leases(self):
+        self.spool.submit(SEQUENCES_FILE, "REST.wm")
+        lease = self.spool.claim("crashed")
+        self.assertEqual(self.spool.reclaim_expired(), 0)
+
+        self.expire(lease)
+        self.assertEqual(self.spool.reclaim_expired(), 1)
+        self.assertEqual(self.spool.jobs(), {"REST": "pending"})
+
+        # The crashed worker can't publish results any more
+        self.assertFalse(lease.renew())
+        self.assertFalse(self.spool.complete(lease, SITES_FILE, PRIORS_FILE))
+        self.assertFalse(os.path.exists(self.spool.path("results", "REST")))
+
+        # Jobs are given up after `max_attempts`
+        lease = self.spool.claim("crashed-again")
+        self.assertEqual(lease.job["attempts"], 1)
+        self.expire(lease)
+        self.spool.reclaim_expired()
+        self.assertEqual(self.spool.jobs(), {"REST": "failed"})
+
+    def test_failed_runs(self):
+        self.spool.submit(SEQUENCES_FILE, "REST.wm")
+        self.spool.fail(self.spool.claim("worker"), "MotEvo failed")
+        self.assertEqual(self.spool.jobs(), {"REST": "pending"})
+        self.spool.fail(self.spool.claim("worker"), "MotEvo failed")
+        self.assertEqual(self.spool.jobs(), {"REST": "failed"})
+
+    def test_concurrent_claims(self):
+        for i in range(100):
+            self.spool.submit(SEQUENCES_FILE, f"MOTIF{i}.wm")
+        with ProcessPoolExecutor(4) as executor:
+            claimed = list(
+                executor.map(
+                    claim_all, [self.directory] * 4, [f"worker-{i}" for i in range(4)]
+                )
+            )
+        # Every job is leased to exactly one worker
+        ids = [job_id for worker_ids in claimed for job_id in worker_ids]
+        self.assertEqual(sorted(ids), sorted(f"MOTIF{i}" for i in range(100)))
+        self.assertEqual(self.spool.status()["leased"], 100)
+
+    def test_workers(self):
+        self.spool.submit_many(
+            SEQUENCES_FILE,
+            os.path.join(DATA_PATH, "pwmdir"),
+            TREE="((((astMex:0.415917,pygNat:0.449133):0.099801,ictPun:0.50305):0.04815395,danRer11:0.55291):0.0098669,esoLuc:0.7121605);",
+            refspecies="danRer11",
+            EMprior=1,
+            UFEwmprior=500,
+            UFEwmfile=os.path.join(DATA_PATH, "UFEmodel"),
+            UFEwmlen="auto",
+            bgprior=0.8,
+        )
+        workers = start_workers(self.directory, 2, poll_interval=0.1)
+        results = self.spool.wait(poll_interval=0.1, timeout=60)
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.spool.status()["failed"], 0)
+        self.assertEqual(
+            len(parse_sites(results["REST"][0])), len(parse_sites(SITES_FILE))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import unittest
+import numpy as np
+
+from motevowrapper import ufe
+from motevowrapper.ufe import (
+    check_ufe_model,
+    load_ufe_model,
+    read_ufe_model,
+    tree_species,
+    ufe_cache_path,
+)
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_PATH, "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+if not os.path.exists(OUTPUT_PATH):
+    os.mkdir(OUTPUT_PATH)
+
+SPECIES = ("astMex", "pygNat", "ictPun", "danRer11", "esoLuc")
+
+
+class TestUFEModel(unittest.TestCase):
+    def setUp(self):
+        self.model_path = os.path.join(DATA_PATH, "UFEmodel")
+        with open(os.path.join(DATA_PATH, "tree_file")) as f:
+            self.tree = f.read()
+
+    def test_reading(self):
+        model = read_ufe_model(self.model_path)
+        self.assertEqual(model.species, SPECIES)
+        self.assertEqual(model.values.shape, (3125, 3))
+        self.assertEqual(model.patterns[0], b"AAAAA")
+        np.testing.assert_allclose(
+            model.lookup("AAAAC"),
+            [7.6446174534e-03, 6.2229455068e-03, 8.1402968097e-01],
+        )
+        np.testing.assert_allclose(model.lookup("-----"), [1.0, 1.0, 1.0])
+        with self.assertRaises(KeyError):
+            model.lookup("NNNNN")
+
+    def test_cache(self):
+        cache_dir = os.path.join(OUTPUT_PATH, "ufe_cache")
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        ufe._models.clear()
+
+        model = load_ufe_model(self.model_path, cache_dir=cache_dir)
+        cache_path = ufe_cache_path(self.model_path, cache_dir)
+        self.assertTrue(os.path.exists(cache_path))
+
+        ufe._models.clear()
+        cached = ufe._read_cache(self.model_path, cache_path)
+        self.assertEqual(cached.species, model.species)
+        np.testing.assert_array_equal(cached.patterns, model.patterns)
+        np.testing.assert_array_equal(cached.values, model.values)
+        self.assertEqual(
+            load_ufe_model(self.model_path, cache_dir=cache_dir).species, SPECIES
+        )
+
+    def test_checking(self):
+        self.assertEqual(tree_species(self.tree), list(SPECIES))
+        check_ufe_model(self.model_path, self.tree, refspecies="danRer11")
+
+        with self.assertRaises(ValueError):
+            check_ufe_model(self.model_path, "(danRer11: 1.0);")
+        with self.assertRaises(ValueError):
+            check_ufe_model(self.model_path, self.tree, refspecies="hg38")
+
+        model = read_ufe_model(self.model_path)
+        truncated = model._replace(
+            patterns=model.patterns[:-1], values=model.values[:-1]
+        )
+        with self.assertRaises(ValueError):
+            check_ufe_model(truncated, self.tree)
+
+
+if __name__ == "__main__":
+    unittest.main()
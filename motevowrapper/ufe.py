@@ -0,0 +1,211 @@
+import io
+import os
+import re
+import hashlib
+import logging
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+from motevowrapper.cache import default_cache_directory, temporary_path
+from motevowrapper.sidecar import source_metadata
+
+
+logger = logging.getLogger(__name__)
+
+# Alignment column characters of UFE model patterns, in the order runUFE lists them
+UFE_ALPHABET = "ACGT-"
+
+# Models already loaded by this process, keyed by path, size and mtime
+_models = {}
+
+
+class UFEModel(namedtuple("UFEModel", ["species", "patterns", "values"])):
+    """
+    A UFE model made by `runUFE`: the `species` of its alignment columns, and for
+    each column pattern (one character of `UFE_ALPHABET` per species) a row of
+    three `values`. `patterns` is an array of fixed-width byte strings.
+    """
+
+    __slots__ = ()
+
+    @property
+    def species_set(self):
+        return frozenset(self.species)
+
+    def lookup(self, pattern):
+        """
+        Values of a column pattern, e.g. "AAAC-".
+        """
+        if isinstance(pattern, str):
+            pattern = pattern.encode("ascii")
+
+        # runUFE lists all patterns in order, which makes their position a
+        # base-5 number
+        if len(self.patterns) == len(UFE_ALPHABET) ** len(self.species):
+            index = 0
+            for character in pattern.decode("ascii"):
+                index = index * len(UFE_ALPHABET) + UFE_ALPHABET.find(character)
+            if 0 <= index < len(self.patterns) and self.patterns[index] == pattern:
+                return self.values[index]
+
+        index = np.flatnonzero(self.patterns == pattern)
+        if not len(index):
+            raise KeyError(pattern)
+        return self.values[index[0]]
+
+
+def read_ufe_model(path):
+    """
+    Parse a UFE model file: `>species` header lines followed by tab separated
+    rows of a column pattern and three values.
+    """
+    species = []
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.startswith(b">"):
+                break
+            species.append(line[1:].strip().decode("ascii"))
+        f.seek(0)
+        df = pd.read_csv(
+            f,
+            sep=r"\s+",
+            skiprows=len(species),
+            header=None,
+            names=["pattern", "a", "b", "c"],
+            dtype={"pattern": str, "a": np.float64, "b": np.float64, "c": np.float64},
+            na_filter=False,
+        )
+    return UFEModel(
+        species=tuple(species),
+        patterns=df["pattern"].to_numpy().astype("S"),
+        values=df[["a", "b", "c"]].to_numpy(),
+    )
+
+
+def ufe_cache_path(path, cache_dir=None):
+    """
+    Path of the binary cache of the UFE model file at `path`, in `cache_dir` (see
+    `default_cache_directory`).
+    """
+    key = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(
+        cache_dir or default_cache_directory(), "ufe_models", f"{key}.npz"
+    )
+
+
+def _read_cache(path, cache_path):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as data:
+            metadata = {
+                "size": int(data["size"]),
+                "mtime_ns": int(data["mtime_ns"]),
+                "kind": "ufe",
+            }
+            if metadata != source_metadata(path, "ufe"):
+                return None
+            return UFEModel(
+                species=tuple(str(name) for name in data["species"]),
+                patterns=data["patterns"],
+                values=data["values"],
+            )
+    except (OSError, ValueError, KeyError) as exp:
+        logger.error(f"Ignoring unreadable UFE model cache {cache_path}: {exp}")
+        return None
+
+
+def _write_cache(cache_path, model, metadata):
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        species=np.array(model.species, dtype=str),
+        patterns=model.patterns,
+        values=model.values,
+        size=metadata["size"],
+        mtime_ns=metadata["mtime_ns"],
+    )
+    tmp_path = temporary_path(cache_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, "xb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp_path, cache_path)
+    except OSError as exp:
+        logger.warning(f"Could not cache UFE model at {cache_path}: {exp}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_ufe_model(path, cache=True, cache_dir=None):
+    """
+    Load a UFE model, from its binary `.npz` cache in `cache_dir` (see
+    `ufe_cache_path`) when that is up to date with the model file. The cache is
+    written after parsing unless `cache` is False. Models are also remembered by
+    this process until the file changes.
+    """
+    metadata = source_metadata(path, "ufe")
+    memo_key = (os.path.abspath(path), metadata["size"], metadata["mtime_ns"])
+    if memo_key in _models:
+        return _models[memo_key]
+
+    cache_path = ufe_cache_path(path, cache_dir) if cache else None
+    model = _read_cache(path, cache_path) if cache else None
+    if model is None:
+        model = read_ufe_model(path)
+        if cache:
+            _write_cache(cache_path, model, metadata)
+    _models[memo_key] = model
+    return model
+
+
+def tree_species(tree):
+    """
+    Leaf names of a Newick tree string.
+    """
+    # Leaves follow an opening parenthesis or a comma; labels of inner nodes follow
+    # a closing parenthesis, and branch lengths a colon
+    return re.findall(r"[(,]\s*([^\s(),:;]+)", tree)
+
+
+def check_ufe_model(model, tree=None, refspecies=None, cache=True):
+    """
+    Check that a UFE model (a `UFEModel` or a model file path) is complete and
+    matches the species of the Newick `tree` and `refspecies`. Raises ValueError
+    describing the first mismatch. Model files are loaded with `load_ufe_model`,
+    which writes their binary cache unless `cache` is False.
+    """
+    if not isinstance(model, UFEModel):
+        model = load_ufe_model(model, cache=cache)
+
+    nr_of_species = len(model.species)
+    if not nr_of_species:
+        raise ValueError("UFE model lists no species")
+    if model.patterns.dtype.itemsize != nr_of_species:
+        raise ValueError(
+            f"UFE model patterns don't have one column per species "
+            f"({nr_of_species} species)"
+        )
+    if len(model.patterns) != len(UFE_ALPHABET) ** nr_of_species:
+        raise ValueError(
+            f"UFE model has {len(model.patterns)} patterns, expected "
+            f"{len(UFE_ALPHABET) ** nr_of_species} for {nr_of_species} species"
+        )
+    if not np.isfinite(model.values).all():
+        raise ValueError("UFE model has values that are not finite")
+
+    if tree is not None:
+        species = set(tree_species(tree))
+        if species != model.species_set:
+            raise ValueError(
+                f"UFE model species {sorted(model.species_set)} don't match the "
+                f"tree species {sorted(species)}"
+            )
+    if refspecies is not None and refspecies not in model.species_set:
+        raise ValueError(
+            f"Reference species {refspecies!r} is not in the UFE model species "
+            f"{sorted(model.species_set)}"
+        )
+    return model
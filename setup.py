@@ -1,6 +1,5 @@
 import os
-import setuptools
-from distutils.core import setup
+from setuptools import setup
 
 
 def get_motevo_files():
@@ -34,6 +33,7 @@ setup(
     download_url=f"https://github.com/brlauuu/motevowrapper/archive/v{version}.tar.gz",
     keywords=["MotEvo", "wrapper", "binding", "sites", "tfbs-discovery"],
     install_requires=["pandas",],
+    extras_require={"plot": ["seaborn", "matplotlib"], "arrow": ["pyarrow"],},
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Science/Research",
@@ -45,4 +45,5 @@ setup(
     long_description=README,
     include_package_data=True,
     package_data={"motevowrapper": get_motevo_files(),},
+    entry_points={"console_scripts": ["motevowrapper=motevowrapper.cli:main"]},
 )